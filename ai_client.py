@@ -1,11 +1,57 @@
 import os
-import requests
 import json
+import time
+import asyncio
+import logging
+import socket
+import threading
+from collections import deque
+
+import httpx
 from dotenv import load_dotenv
 
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS
+from tokens import count_message_tokens, count_tokens
+
+log = logging.getLogger(__name__)
+
 # Załaduj zmienne środowiskowe z pliku .env
 load_dotenv()
 
+# Znacznik ruchu awaryjnego - serwer zastępuje go ruchem silnika
+FALLBACK_MOVE = "AUTO"
+
+API_URL = os.environ.get("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+MODEL = os.environ.get("OPENROUTER_MODEL", "deepseek/deepseek-r1:free")
+
+# Całkowity limit czasu na odpowiedź AI (s) - po jego upływie ruch wybiera lokalny silnik
+AI_DEADLINE_S = float(os.environ.get("AI_DEADLINE_S", 60))
+# Limit czasu na nawiązanie połączenia (s)
+AI_CONNECT_TIMEOUT_S = float(os.environ.get("AI_CONNECT_TIMEOUT_S", 5))
+# Rozmiar puli połączeń keep-alive
+AI_POOL_SIZE = int(os.environ.get("AI_POOL_SIZE", 20))
+# Zapytania zabezpieczające (hedging): drugie zapytanie, gdy pierwsze przekroczy percentyl opóźnień
+AI_HEDGE_ENABLED = os.environ.get("AI_HEDGE_ENABLED", "0") == "1"
+AI_HEDGE_PERCENTILE = float(os.environ.get("AI_HEDGE_PERCENTILE", 95))
+AI_HEDGE_MIN_SAMPLES = int(os.environ.get("AI_HEDGE_MIN_SAMPLES", 20))
+# Limit tokenów wejściowych (komunikat systemowy + prompt) i maksymalna długość odpowiedzi
+AI_PROMPT_MAX_TOKENS = int(os.environ.get("AI_PROMPT_MAX_TOKENS", 6000))
+AI_MAX_TOKENS = int(os.environ.get("AI_MAX_TOKENS", 2000))
+# Maksymalna liczba jednoczesnych zapytań do AI w trybie asynchronicznym (asgi.py)
+AI_MAX_INFLIGHT = int(os.environ.get("AI_MAX_INFLIGHT", 64))
+
+SYSTEM_PROMPT = (
+    "Jesteś kółkiem (O) w grze w kółko i krzyżyk 10x10 (wygrywa 5 w rzędzie). Mówisz w pierwszej osobie do przeciwnika - gracza X.\n\n"
+    "STYL: komentarze zabawne, wulgarne i obraźliwe wobec X. Nawiązuj do polskiej polityki (Kaczyński, Tusk, Morawiecki, Hołownia, "
+    "Mentzen, Czarnek, Bodnar, Trzaskowski; PiS, PO, Konfederacja, Lewica), np. \"Jesteś tak beznadziejny jak debata w Sejmie o aborcji\".\n\n"
+    "STRATEGIA (w tej kolejności):\n"
+    "1. \"KRYTYCZNE ZAGROŻENIE\" lub \"MUSISZ zablokować\" w prompcie - bezwzględnie wykonaj ten ruch i skomentuj blokadę.\n"
+    "2. Wygraj w jednym ruchu, jeśli możesz.\n"
+    "3. Blokuj 4 X w rzędzie, trójki X z dwoma otwartymi końcami i luki we wzorcach X_XX / XX_X.\n"
+    "4. Buduj własne linie (także po przekątnych), najlepiej kilka zagrożeń naraz.\n\n"
+    "Na końcu odpowiedzi podaj ruch: 'RUCH:wiersz,kolumna', np. 'RUCH:3,4' (gdy nie możesz - 'RUCH:BRAK')."
+)
+
 # Globalna zmienna dla klienta
 api_key = None
 site_url = None
@@ -25,129 +71,623 @@ def initialize_api_settings():
         site_url = os.environ.get("YOUR_SITE_URL", "https://roleplayingtech.com")
         site_name = os.environ.get("YOUR_SITE_NAME", "RolePlayingTech")
         
-        print(f"\nKonfiguracja klienta AI dla OpenRouter")
-        print(f"Site URL: {site_url}")
-        print(f"Site Name: {site_name}")
-        
-        print("Ustawienia API zostały pomyślnie skonfigurowane")
+        log.info("Konfiguracja klienta AI dla OpenRouter: site_url=%s, site_name=%s", site_url, site_name)
         return True
     except Exception as e:
-        print(f"Błąd podczas konfiguracji ustawień API: {e}")
+        log.error("Błąd podczas konfiguracji ustawień API: %s", e)
         return False
 
 # Inicjalizacja ustawień API przy imporcie modułu
 api_initialized = initialize_api_settings()
 
-def get_ai_response(prompt):
-    """Pobiera odpowiedź od modelu AI używając bezpośrednich żądań HTTP"""
+
+class UpstreamError(Exception):
+    """Odpowiedź API z kodem innym niż 200."""
+
+    def __init__(self, status, text):
+        super().__init__(f"Błąd API: {status} - {text}")
+        self.status = status
+
+
+class DeadlineExceeded(Exception):
+    """Odpowiedź AI nie nadeszła przed upływem całkowitego limitu czasu."""
+
+
+class LatencyTracker:
+    """
+    Przechowuje czasy ostatnich udanych odpowiedzi i wyznacza opóźnienie,
+    po którym wysyłane jest zapytanie zabezpieczające.
+    """
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct):
+        with self.lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def hedge_delay(self):
+        """Zwraca opóźnienie zapytania zabezpieczającego albo None, gdy hedging jest wyłączony."""
+        if not AI_HEDGE_ENABLED or len(self.samples) < AI_HEDGE_MIN_SAMPLES:
+            return None
+        return self.percentile(AI_HEDGE_PERCENTILE)
+
+
+latency = LatencyTracker()
+
+
+class TokenUsage:
+    """Sumy tokenów wejściowych i wyjściowych zapytań do AI (do śledzenia kosztu i opóźnień)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.lock = threading.Lock()
+
+    def record(self, tokens_in, tokens_out):
+        with self.lock:
+            self.requests += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+
+    def stats(self):
+        with self.lock:
+            requests = self.requests
+            return {
+                'requests': requests,
+                'tokens_in': self.tokens_in,
+                'tokens_out': self.tokens_out,
+                'avg_tokens_in': round(self.tokens_in / requests, 1) if requests else 0,
+                'avg_tokens_out': round(self.tokens_out / requests, 1) if requests else 0,
+            }
+
+
+token_usage = TokenUsage()
+
+_limits = httpx.Limits(max_connections=AI_POOL_SIZE, max_keepalive_connections=AI_POOL_SIZE)
+# Klient asynchroniczny nie zajmuje wątków, więc połączeń może być tyle, ile zapytań w toku
+# (z zapasem na zapytania zabezpieczające)
+_async_limits = httpx.Limits(max_connections=AI_MAX_INFLIGHT * 2, max_keepalive_connections=AI_MAX_INFLIGHT)
+_client = None
+_client_lock = threading.Lock()
+_loop = None
+_async_clients = {}
+
+
+def get_http_client():
+    """Zwraca współdzielonego klienta HTTP z pulą połączeń keep-alive."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(limits=_limits)
+    return _client
+
+
+def get_async_http_client():
+    """Zwraca asynchronicznego klienta HTTP dla bieżącej pętli zdarzeń."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(limits=_async_limits)
+    return client
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+    loop.close()
+
+
+def _request_loop():
+    """
+    Zwraca pętlę zdarzeń wątku, w którym wykonywane są zapytania synchroniczne -
+    przegrane zapytania (hedging, limit czasu) można w niej anulować.
+    """
+    global _loop
+    if _loop is None:
+        with _client_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                # Pula połączeń jak dla klienta synchronicznego (AI_POOL_SIZE)
+                _async_clients[loop] = httpx.AsyncClient(limits=_limits)
+                threading.Thread(target=_run_loop, args=(loop,), name="ai-request", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def close_clients():
+    """Zamyka pule połączeń (np. przy zamykaniu serwera)."""
+    global _client, _loop
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _loop is not None:
+        asyncio.run_coroutine_threadsafe(aclose_clients(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop = None
+
+
+async def aclose_clients():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _build_request(prompt):
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": site_url,
+        "X-Title": site_name
+    }
+    
+    payload = {
+        "model": MODEL,
+        "messages": _messages(prompt),
+        "temperature": 0.7,
+        "max_tokens": AI_MAX_TOKENS
+    }
+    return headers, payload
+
+
+def _build_stream_request(prompt):
+    headers, payload = _build_request(prompt)
+    payload["stream"] = True
+    # Liczby tokenów przychodzą w ostatnim fragmencie strumienia
+    payload["stream_options"] = {"include_usage": True}
+    return headers, payload
+
+
+# Koniec strumienia odpowiedzi ("data: [DONE]")
+_STREAM_DONE = object()
+
+
+def _parse_stream_line(line):
+    """
+    Odczytuje linię strumienia SSE z API: zwraca (treść albo None, pole "usage" albo None),
+    None dla linii bez danych albo _STREAM_DONE na końcu strumienia.
+    """
+    # Linie bez "data:" to komentarze SSE (np. informacja o przetwarzaniu)
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return _STREAM_DONE
+    chunk = json.loads(data)
+    reported = chunk["usage"] if isinstance(chunk.get("usage"), dict) else None
+    choices = chunk.get("choices") or []
+    text = (choices[0].get("delta") or {}).get("content") if choices else None
+    return text, reported
+
+
+def _interrupt_stream(response):
+    """
+    Przerywa z innego wątku czytanie strumienia odpowiedzi: wyłączenie gniazda budzi
+    zablokowany odczyt, który kończy się błędem transportu.
+    """
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _stream_error_reply(e):
+    reply = _error_response(e)
+    # Szczegóły błędu zostają w logach - do przeglądarki trafia krótki komentarz
+    if "Błąd:" in reply:
+        reply = f"Coś się zjebało z API, ale i tak zagram! RUCH:{FALLBACK_MOVE}"
+    return "\n" + reply
+
+
+def _check_prompt(prompt):
+    """Zwraca (komunikat błędu albo None, liczba tokenów wejściowych zapytania)."""
     if not api_initialized or not api_key:
         error_msg = "Błąd: API nie zostało poprawnie zainicjalizowane"
-        print(error_msg)
-        return error_msg
+        log.error(error_msg)
+        return error_msg, 0
+    
+    tokens_in = count_message_tokens(_messages(prompt))
+    if tokens_in > AI_PROMPT_MAX_TOKENS:
+        return f"Błąd: Prompt jest zbyt długi ({tokens_in} tokenów). Maksymalny limit to {AI_PROMPT_MAX_TOKENS} tokenów.", tokens_in
+    return None, tokens_in
+
+
+def _record_usage(usage, tokens_in, content, reported=None):
+    """
+    Zapisuje liczby tokenów zapytania - z pola "usage" odpowiedzi API, a gdy go
+    nie ma, z lokalnego licznika - i uzupełnia nimi słownik usage (jeśli podany).
+    """
+    if reported and reported.get("prompt_tokens"):
+        tokens_in = reported["prompt_tokens"]
+        tokens_out = reported.get("completion_tokens") or 0
+        source = "api"
+    else:
+        tokens_out = count_tokens(content)
+        source = "local"
+    token_usage.record(tokens_in, tokens_out)
+    log.debug("Tokeny: wejście %d, wyjście %d (%s)", tokens_in, tokens_out, source)
+    if usage is not None:
+        usage.update(tokens_in=tokens_in, tokens_out=tokens_out, source=source)
+
+
+def _request_timeout(remaining):
+    return httpx.Timeout(max(remaining, 0.001), connect=min(AI_CONNECT_TIMEOUT_S, max(remaining, 0.001)))
+
+
+class UpstreamTimer:
+    """
+    Czasy etapów zapytania do AI z rozszerzenia "trace" httpx: nawiązanie
+    połączenia (tylko nowego - TCP i TLS), pierwszy bajt odpowiedzi (nagłówki),
+    pierwszy fragment treści (strumień) i całość - w histogramie ttt_stage_seconds.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect_started = None
+        self.connected = None
+        self.first_byte = None
+
+    def trace(self, event, info):
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connected = now
+        elif event.endswith("receive_response_headers.complete"):
+            self.first_byte = now
+
+    async def atrace(self, event, info):
+        # Klient asynchroniczny wymaga funkcji async
+        self.trace(event, info)
+
+    def first_token(self):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage="upstream_first_token")
+
+    def finish(self):
+        if self.connect_started is not None and self.connected is not None:
+            STAGE_SECONDS.observe(self.connected - self.connect_started, stage="upstream_connect")
+        if self.first_byte is not None:
+            STAGE_SECONDS.observe(self.first_byte - self.started, stage="upstream_first_byte")
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage="upstream_total")
+
+
+def _post_with_deadline(headers, payload):
+    """
+    Synchroniczny odpowiednik _apost_with_deadline: zapytanie jest wykonywane w pętli
+    zdarzeń _request_loop, a wywołujący wątek czeka na wynik.
+    """
+    return asyncio.run_coroutine_threadsafe(_apost_with_deadline(headers, payload), _request_loop()).result()
+
+
+async def _apost(client, headers, payload, deadline):
+    started = time.monotonic()
+    timer = UpstreamTimer()
+    response = await client.post(API_URL, headers=headers, json=payload,
+                                 timeout=_request_timeout(deadline - started),
+                                 extensions={"trace": timer.atrace})
+    timer.finish()
+    if response.status_code == 200:
+        latency.record(time.monotonic() - started)
+    return response
+
+
+async def _apost_with_deadline(headers, payload):
+    """
+    Wysyła zapytanie przez pulę połączeń pętli zdarzeń z całkowitym limitem czasu.
+
+    Jeśli hedging jest włączony i pierwsze zapytanie nie odpowie w czasie
+    wyznaczonym przez percentyl ostatnich opóźnień, wysyłane jest drugie -
+    wygrywa pierwsza udana odpowiedź, a pozostałe są anulowane.
+    """
+    client = get_async_http_client()
+    deadline = time.monotonic() + AI_DEADLINE_S
+    tasks = {asyncio.ensure_future(_apost(client, headers, payload, deadline))}
     
     try:
-        print("Wysyłanie zapytania do API OpenRouter...")
-        # Najpierw sprawdź przybliżoną liczbę tokenów
-        approx_tokens = len(prompt.split()) * 1.3  # Przybliżenie: 1 słowo ≈ 1.3 tokena
-        
-        if approx_tokens > 6000:  # Zostawiamy margines bezpieczeństwa
-            return f"Błąd: Prompt jest zbyt długi (około {int(approx_tokens)} tokenów). Maksymalny limit to 8000 tokenów."
-        
-        # Bezpośrednie żądanie HTTP do OpenRouter API
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "HTTP-Referer": site_url,
-            "X-Title": site_name
-        }
+        hedge_delay = latency.hedge_delay()
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=min(hedge_delay, max(deadline - time.monotonic(), 0)))
+            if not done and time.monotonic() < deadline:
+                log.info("Brak odpowiedzi po %.2fs - wysyłam zapytanie zabezpieczające", hedge_delay)
+                tasks.add(asyncio.ensure_future(_apost(client, headers, payload, deadline)))
         
-        payload = {
-            "model": "deepseek/deepseek-r1:free",
-            "messages": [
-                {"role": "system", "content": "Jesteś kółkiem (O) w grze w kółko i krzyżyk 10x10. Mówisz w pierwszej osobie jako przeciwnik gracza X. Twoje komentarze mają być zabawne, wulgarne i obraźliwe wobec gracza X (Twojego przeciwnika). Zawsze komentuj aktualny stan gry i obrażaj swojego przeciwnika.\n\nSTYL KOMENTARZY:\n1. Twoje komentarze powinny być wulgarne, zabawne i obraźliwe do przeciwnika.\n2. w swoich odpowiedziach możesz nawiązywac czasem do polskich polityków i polskiej sceny politycznej! Używaj nazwisk takich jak: Kaczyński, Tusk, Morawiecki, Hołownia, Mentzen, Czarnek, Bodnar, Trzaskowski, itp.\n3. Twórz porównania i metafory związane z polską polityką. Odnosź się konkretnie do aktualnych wydarzeń politycznych w Polsce, partii (PiS, PO, Konfederacja, Lewica), reform i kontrowersji.\n5. Twoje obelgi powinny zawierać polityczne porównania, np. \"Jesteś tak beznadziejny jak debata w Sejmie o aborcji\".\n\nSTRATEGIA:\n1. PRIORYTET: Jeśli w promptcie jest podane \"KRYTYCZNE ZAGROŻENIE\" lub \"MUSISZ zablokować\" - bezwzględnie wykonaj ten ruch!\n2. Zawsze PRIORYTETOWO szukaj ruchów wygrywających w jednym ruchu.\n3. Jeśli przeciwnik ma 4 znaki w rzędzie i może wygrać, MUSISZ go zablokować.\n4. Jeśli przeciwnik ma 3 znaki w rzędzie i dwa otwarte końce, MUSISZ zablokować jeden z końców.\n5. Jeśli przeciwnik ma wzorzec X_XX lub XX_X (gdzie _ to puste pole), MUSISZ zablokować pozycję _.\n6. Staraj się tworzyć swoje własne linie w pierwszej kolejności.\n7. Blokuj potencjalne strategie przeciwnika.\n8. Nie zapomnij o przekątnych i stwórz zagrożenia w wielu kierunkach.\n\nGdy zauważysz krytyczne zagrożenie, twój komentarz powinien odnosić się do blokowania tego zagrożenia (np. \"Ha! Próbujesz mnie wykiwać z 3 krzyżykami w rzędzie jak Morawiecki próbował wykiwać UE? Nie tym razem!\").\n\nNa końcu każdej odpowiedzi MUSISZ podać swój ruch w formacie: 'RUCH:[wiersz],[kolumna]', np. 'RUCH:3,4'. Jeśli nie możesz wykonać ruchu, napisz 'RUCH:BRAK'."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60  # Ustawiamy timeout na 60 sekund
-        )
+        last_error = None
+        while tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if response.status_code == 200 or not tasks:
+                    return response
+                last_error = UpstreamError(response.status_code, response.text)
         
-        if response.status_code == 200:
-            result = response.json()
-            print("Otrzymano odpowiedź od API OpenRouter")
-            
-            # Próba pobrania treści odpowiedzi z różnych formatów
-            content = None
-            
-            # Format 1: Standardowy format OpenRouter
+        if last_error is not None and not tasks:
+            raise last_error
+        raise DeadlineExceeded(f"Brak odpowiedzi AI w ciągu {AI_DEADLINE_S:g}s")
+    finally:
+        # Przegrane zapytania (hedging, limit czasu) są anulowane
+        for task in tasks:
+            task.cancel()
+
+
+def _extract_content(response):
+    """
+    Wyciąga treść odpowiedzi AI z odpowiedzi HTTP (lub zgłasza wyjątek przy błędzie API).
+    Zwraca (treść, pole "usage" odpowiedzi albo None).
+    """
+    if response.status_code != 200:
+        raise UpstreamError(response.status_code, response.text)
+    
+    result = response.json()
+    log.debug("Otrzymano odpowiedź od API OpenRouter")
+    reported = result.get("usage") if isinstance(result.get("usage"), dict) else None
+    
+    # Próba pobrania treści odpowiedzi z różnych formatów
+    content = None
+    
+    # Format 1: Standardowy format OpenRouter
+    try:
+        if "choices" in result and result["choices"] and "message" in result["choices"][0] and "content" in result["choices"][0]["message"]:
+            content = result["choices"][0]["message"]["content"]
+            log.debug("Znaleziono odpowiedź w standardowym formacie OpenRouter")
+    except Exception as content_error:
+        log.warning("Błąd podczas przetwarzania standardowego formatu: %s", content_error)
+    
+    # Format 2: Alternatywny format
+    if content is None:
+        try:
+            if "response" in result:
+                content = result["response"]
+                log.debug("Znaleziono odpowiedź w polu 'response'")
+        except Exception as content_error:
+            log.warning("Błąd podczas przetwarzania pola 'response': %s", content_error)
+    
+    # Format 3: Inny możliwy format
+    if content is None:
+        try:
+            if "output" in result:
+                content = result["output"]
+                log.debug("Znaleziono odpowiedź w polu 'output'")
+        except Exception as content_error:
+            log.warning("Błąd podczas przetwarzania pola 'output': %s", content_error)
+    
+    # Zabezpieczenie na przypadek pustej odpowiedzi
+    if content is None:
+        log.warning("Nie znaleziono treści odpowiedzi w żadnym ze znanych formatów. Odpowiedź: %s", result)
+        UPSTREAM_ERRORS.inc(error="bad_format")
+        return f"Nie rozumiem formatu odpowiedzi z API. RUCH:{FALLBACK_MOVE}", reported
+    
+    # Wyświetl i zwróć zawartość
+    log.debug("Treść odpowiedzi AI: %s", content)
+    return content, reported
+
+
+def _error_class(e):
+    """Rodzaj błędu komunikacji z AI - etykieta licznika ttt_upstream_errors_total."""
+    if isinstance(e, DeadlineExceeded):
+        return "deadline"
+    if isinstance(e, UpstreamError):
+        if e.status in (401, 403):
+            return "auth"
+        if e.status == 429:
+            return "rate_limit"
+        return f"http_{e.status // 100}xx"
+    if isinstance(e, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(e, httpx.TransportError):
+        return "connection"
+    if isinstance(e, (ValueError, KeyError, IndexError, TypeError)):
+        return "bad_response"
+    return "other"
+
+
+def _error_response(e):
+    """Zamienia wyjątek komunikacji z AI na komentarz z ruchem awaryjnym."""
+    error_class = _error_class(e)
+    UPSTREAM_ERRORS.inc(error=error_class)
+    if isinstance(e, DeadlineExceeded):
+        log.warning("Przekroczono limit czasu odpowiedzi AI: %s", e)
+        return f"Za długo myślałem nad ripostą, więc gram z głowy! RUCH:{FALLBACK_MOVE}"
+    
+    error_msg = str(e)
+    log.debug("Oryginalny błąd: %s", error_msg)
+    
+    # Sprawdź czy błąd dotyczy dostępu do pól w odpowiedzi
+    if "'" in error_msg and "'" in error_msg and len(error_msg) < 30:
+        # Prawdopodobnie brakuje pola w odpowiedzi
+        log.warning("Wykryto brak pola '%s' w odpowiedzi API", error_msg)
+        # Zwracamy awaryjny ruch i komentarz
+        return f"Cholera, API miało jakieś problemy, ale i tak zagram! RUCH:{FALLBACK_MOVE}"
+    
+    if "tokens_limit_reached" in error_msg:
+        return "Błąd: Prompt przekracza limit tokenów. Spróbuj skrócić tekst źródłowy."
+    
+    # Bardziej szczegółowe komunikaty błędów
+    if isinstance(e, httpx.TimeoutException) or "timeout" in error_msg.lower():
+        error_details = f"Błąd: Przekroczono czas oczekiwania na odpowiedź AI. Szczegóły: {error_msg}"
+    elif isinstance(e, httpx.TransportError) or "Connection" in error_msg or "connect" in error_msg.lower():
+        error_details = f"Błąd: Problem z połączeniem do serwera AI. Szczegóły: {error_msg}"
+    elif "authenticate" in error_msg.lower() or "authentication" in error_msg.lower() or "api key" in error_msg.lower():
+        error_details = f"Błąd: Problem z uwierzytelnieniem do API AI. Szczegóły: {error_msg}"
+    elif "rate limit" in error_msg.lower() or "quota" in error_msg.lower():
+        error_details = f"Błąd: Przekroczono limit zapytań do API AI. Szczegóły: {error_msg}"
+    else:
+        error_details = f"Błąd: Nie udało się uzyskać odpowiedzi od AI. Szczegóły: {error_msg}"
+    
+    log.warning("Błąd podczas komunikacji z AI: %s", error_details, extra={"error": error_class})
+    # Zwracamy awaryjny ruch z komentarzem o błędzie
+    return f"Kurwa, coś się zjebało z API! {error_details} RUCH:{FALLBACK_MOVE}"
+
+
+def get_ai_response(prompt, usage=None):
+    """
+    Pobiera odpowiedź od modelu AI przez współdzieloną pulę połączeń HTTP.
+    Do słownika usage (jeśli podany) trafiają liczby tokenów: tokens_in, tokens_out.
+    """
+    error_msg, tokens_in = _check_prompt(prompt)
+    if error_msg:
+        return error_msg
+    
+    try:
+        log.debug("Wysyłanie zapytania do API OpenRouter...")
+        headers, payload = _build_request(prompt)
+        response = _post_with_deadline(headers, payload)
+        content, reported = _extract_content(response)
+        _record_usage(usage, tokens_in, content, reported)
+        return content
+    except Exception as e:
+        return _error_response(e)
+
+
+async def get_ai_response_async(prompt, usage=None):
+    """Asynchroniczna wersja get_ai_response - oczekiwanie na AI nie blokuje wątku"""
+    error_msg, tokens_in = _check_prompt(prompt)
+    if error_msg:
+        return error_msg
+    
+    try:
+        log.debug("Wysyłanie zapytania do API OpenRouter...")
+        headers, payload = _build_request(prompt)
+        response = await _apost_with_deadline(headers, payload)
+        content, reported = _extract_content(response)
+        _record_usage(usage, tokens_in, content, reported)
+        return content
+    except Exception as e:
+        return _error_response(e)
+
+
+def stream_ai_response(prompt, usage=None):
+    """
+    Generator fragmentów odpowiedzi AI (tryb stream=True, Server-Sent Events z API).
+
+    Przekazuje tylko treść odpowiedzi (delta.content) zaraz po jej nadejściu.
+    Błąd lub przekroczenie limitu czasu kończy strumień krótkim komentarzem
+    z ruchem awaryjnym, tak jak w get_ai_response. Słownik usage jest
+    uzupełniany po zakończeniu strumienia.
+    """
+    error_msg, tokens_in = _check_prompt(prompt)
+    if error_msg:
+        yield error_msg
+        return
+    
+    headers, payload = _build_stream_request(prompt)
+    parts = []
+    reported = None
+    deadline = time.monotonic() + AI_DEADLINE_S
+    timer = UpstreamTimer()
+    try:
+        log.debug("Wysyłanie zapytania strumieniowego do API OpenRouter...")
+        with get_http_client().stream("POST", API_URL, headers=headers, json=payload,
+                                      timeout=_request_timeout(AI_DEADLINE_S),
+                                      extensions={"trace": timer.trace}) as response:
+            if response.status_code != 200:
+                response.read()
+                raise UpstreamError(response.status_code, response.text)
+            # API przysyłające pojedyncze bajty może trzymać odczyt jednej linii dowolnie długo,
+            # więc po upływie limitu strażnik przerywa połączenie
+            watchdog = threading.Timer(max(deadline - time.monotonic(), 0), _interrupt_stream, (response,))
+            watchdog.daemon = True
+            watchdog.start()
             try:
-                if "choices" in result and result["choices"] and "message" in result["choices"][0] and "content" in result["choices"][0]["message"]:
-                    content = result["choices"][0]["message"]["content"]
-                    print("Znaleziono odpowiedź w standardowym formacie OpenRouter")
-            except Exception as content_error:
-                print(f"Błąd podczas przetwarzania standardowego formatu: {content_error}")
-            
-            # Format 2: Alternatywny format
-            if content is None:
-                try:
-                    if "response" in result:
-                        content = result["response"]
-                        print("Znaleziono odpowiedź w polu 'response'")
-                except Exception as content_error:
-                    print(f"Błąd podczas przetwarzania pola 'response': {content_error}")
-            
-            # Format 3: Inny możliwy format
-            if content is None:
+                for line in response.iter_lines():
+                    if time.monotonic() > deadline:
+                        raise DeadlineExceeded(f"Brak pełnej odpowiedzi AI w ciągu {AI_DEADLINE_S:g}s")
+                    item = _parse_stream_line(line)
+                    if item is None:
+                        continue
+                    if item is _STREAM_DONE:
+                        break
+                    text, reported = item[0], item[1] or reported
+                    if text:
+                        if not parts:
+                            timer.first_token()
+                        parts.append(text)
+                        yield text
+            except httpx.TransportError:
+                if time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"Brak pełnej odpowiedzi AI w ciągu {AI_DEADLINE_S:g}s")
+                raise
+            finally:
+                watchdog.cancel()
+        timer.finish()
+        _record_usage(usage, tokens_in, "".join(parts), reported)
+    except Exception as e:
+        yield _stream_error_reply(e)
+
+
+async def astream_ai_response(prompt, usage=None):
+    """
+    Asynchroniczna wersja stream_ai_response (async generator) - oczekiwanie
+    na kolejne fragmenty nie blokuje wątku.
+    """
+    error_msg, tokens_in = _check_prompt(prompt)
+    if error_msg:
+        yield error_msg
+        return
+    
+    headers, payload = _build_stream_request(prompt)
+    parts = []
+    reported = None
+    deadline = time.monotonic() + AI_DEADLINE_S
+    timer = UpstreamTimer()
+    try:
+        log.debug("Wysyłanie zapytania strumieniowego do API OpenRouter...")
+        async with get_async_http_client().stream("POST", API_URL, headers=headers, json=payload,
+                                                  timeout=_request_timeout(AI_DEADLINE_S),
+                                                  extensions={"trace": timer.atrace}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise UpstreamError(response.status_code, response.text)
+            lines = response.aiter_lines()
+            while True:
+                # Każdy odczyt dostaje tylko pozostały czas - także gdy linia przychodzi po bajcie
                 try:
-                    if "output" in result:
-                        content = result["output"]
-                        print("Znaleziono odpowiedź w polu 'output'")
-                except Exception as content_error:
-                    print(f"Błąd podczas przetwarzania pola 'output': {content_error}")
-            
-            # Zabezpieczenie na przypadek pustej odpowiedzi
-            if content is None:
-                print(f"Nie znaleziono treści odpowiedzi w żadnym ze znanych formatów. Odpowiedź: {result}")
-                return "Nie rozumiem formatu odpowiedzi z API. RUCH:5,5"
-            
-            # Wyświetl i zwróć zawartość
-            print("Treść odpowiedzi AI:", content)
-            return content
-        else:
-            raise Exception(f"Błąd API: {response.status_code} - {response.text}")
-            
+                    line = await asyncio.wait_for(lines.__anext__(), max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Brak pełnej odpowiedzi AI w ciągu {AI_DEADLINE_S:g}s")
+                item = _parse_stream_line(line)
+                if item is None:
+                    continue
+                if item is _STREAM_DONE:
+                    break
+                text, reported = item[0], item[1] or reported
+                if text:
+                    if not parts:
+                        timer.first_token()
+                    parts.append(text)
+                    yield text
+        timer.finish()
+        _record_usage(usage, tokens_in, "".join(parts), reported)
     except Exception as e:
-        error_msg = str(e)
-        print(f"Oryginalny błąd: {error_msg}")
-        
-        # Sprawdź czy błąd dotyczy dostępu do pól w odpowiedzi
-        if "'" in error_msg and "'" in error_msg and len(error_msg) < 30:
-            # Prawdopodobnie brakuje pola w odpowiedzi
-            print(f"Wykryto brak pola '{error_msg}' w odpowiedzi API")
-            # Zwracamy awaryjny ruch i komentarz
-            return "Cholera, API miało jakieś problemy, ale i tak zagram! RUCH:5,5"
-        
-        if "tokens_limit_reached" in error_msg:
-            return "Błąd: Prompt przekracza limit tokenów. Spróbuj skrócić tekst źródłowy."
-        
-        # Bardziej szczegółowe komunikaty błędów
-        if "Connection" in error_msg or "connect" in error_msg.lower():
-            error_details = f"Błąd: Problem z połączeniem do serwera AI. Szczegóły: {error_msg}"
-        elif "timeout" in error_msg.lower():
-            error_details = f"Błąd: Przekroczono czas oczekiwania na odpowiedź AI. Szczegóły: {error_msg}"
-        elif "authenticate" in error_msg.lower() or "authentication" in error_msg.lower() or "api key" in error_msg.lower():
-            error_details = f"Błąd: Problem z uwierzytelnieniem do API AI. Szczegóły: {error_msg}"
-        elif "rate limit" in error_msg.lower() or "quota" in error_msg.lower():
-            error_details = f"Błąd: Przekroczono limit zapytań do API AI. Szczegóły: {error_msg}"
-        else:
-            error_details = f"Błąd: Nie udało się uzyskać odpowiedzi od AI. Szczegóły: {error_msg}"
-        
-        print(f"Błąd podczas komunikacji z AI: {error_details}")
-        # Zwracamy awaryjny ruch z komentarzem o błędzie
-        return f"Kurwa, coś się zjebało z API! {error_details} RUCH:5,5"
\ No newline at end of file
+        yield _stream_error_reply(e)
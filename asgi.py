@@ -0,0 +1,513 @@
+"""
+Produkcyjny tryb serwera: aplikacja ASGI uruchamiana przez uvicorn.
+
+    python asgi.py                 # albo: uvicorn asgi:app --host 0.0.0.0 --port 6000
+
+Zapytania do AI (/get-ai-commentary, /get-ai-commentary-stream i ruch w sesji)
+obsługuje pętla zdarzeń - oczekiwanie na model nie zajmuje wątku. Liczbę
+zapytań do AI w toku ogranicza AI_MAX_INFLIGHT, kolejne czekają w kolejce
+(do AI_QUEUE_SIZE zapytań, najdłużej AI_QUEUE_TIMEOUT_S). Gdy kolejka jest
+pełna albo czas oczekiwania minie, odpowiedź dostaje od razu ruch lokalnego
+silnika.
+
+Obliczenia (analiza planszy, silnik, plansze sesji) działają w puli wątków
+(ASGI_THREADS). Pozostałe trasy - pliki statyczne, /ai-move, statystyki -
+obsługuje aplikacja Flask z server.py przez prosty most WSGI w tej samej puli.
+
+Serwer działa w jednym procesie (sesje i cache pozycji są w pamięci), więc
+obliczenia skaluje pula przeszukiwania (SEARCH_WORKERS), a nie liczba procesów
+uvicorn. Po SIGTERM/SIGINT serwer przestaje przyjmować połączenia, nowe
+zapytania do AI dostają od razu ruch silnika, a zapytania w toku mają
+SHUTDOWN_GRACE_S sekund na zakończenie.
+"""
+
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from ai_client import AI_MAX_INFLIGHT, aclose_clients, astream_ai_response, close_clients, get_ai_response_async
+from metrics import registry, stage
+from parallel import get_search_pool
+from ponder import ponderer
+from prompts import build_prompt
+from server import (DEFAULT_INTRO, CommentaryEvents, apply_session_move, build_ai_request, cached_answer,
+                    fallback_move, final_commentary_body, final_commentary_events, finish_ai_answer,
+                    log_answer, ponder_after, prepare_ai_request)
+from server import app as flask_app
+from sessions import ACTIVE, HUMAN_PLAYER, sessions
+from streaming import aprefetch
+
+# Liczba zapytań czekających na miejsce (ponad AI_MAX_INFLIGHT) i maksymalny czas oczekiwania (s)
+AI_QUEUE_SIZE = int(os.getenv('AI_QUEUE_SIZE', 256))
+AI_QUEUE_TIMEOUT_S = float(os.getenv('AI_QUEUE_TIMEOUT_S', 5))
+# Limit czasu silnika (ms) dla ruchu, gdy na AI nie ma miejsca - przy przeciążeniu ruchy
+# awaryjne nie mogą zabierać całego CPU
+BUSY_MOVE_TIME_MS = int(os.getenv('BUSY_MOVE_TIME_MS', 50))
+# Wątki na obliczenia i trasy Flask
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+# Czas na dokończenie zapytań w toku przy zamykaniu serwera (s)
+SHUTDOWN_GRACE_S = float(os.getenv('SHUTDOWN_GRACE_S', 30))
+
+# Komentarz do ruchu silnika, gdy na AI nie ma miejsca
+BUSY_COMMENT = "Mam dziś więcej frajerów do ogrania niż Sejm posłów - na Ciebie wystarczy mi jedna szara komórka!"
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi-cpu')
+
+log = logging.getLogger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def aclosing(agen):
+    """Zamyka generator asynchroniczny po wyjściu z bloku (contextlib.aclosing jest dopiero od Pythona 3.10)."""
+    try:
+        yield agen
+    finally:
+        await agen.aclose()
+
+
+class ClientDisconnected(Exception):
+    """Klient zamknął połączenie, zanim wysłał całe zapytanie."""
+
+
+class UpstreamLimiter:
+    """
+    Ogranicza liczbę zapytań do AI w toku; nadmiarowe czekają w ograniczonej kolejce.
+
+    slot() zwraca True, gdy zapytanie może iść do AI, albo False - wtedy
+    odpowiedź dostaje ruch silnika (kolejka pełna, za długie oczekiwanie albo
+    zamykanie serwera).
+    """
+
+    def __init__(self, max_inflight=AI_MAX_INFLIGHT, queue_size=AI_QUEUE_SIZE, queue_timeout=AI_QUEUE_TIMEOUT_S):
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.draining = False
+        self._semaphore = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if not await self._acquire():
+            yield False
+            return
+        self.inflight += 1
+        try:
+            yield True
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+
+    async def _acquire(self):
+        # Semafor powstaje w pętli zdarzeń serwera
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        if self.draining or (self._semaphore.locked() and self.waiting >= self.queue_size):
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        return True
+
+    async def drain(self, timeout):
+        """Przestaje przyjmować zapytania i czeka (najdłużej timeout s) na zakończenie tych w toku."""
+        self.draining = True
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.inflight and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        return self.inflight == 0
+
+    def stats(self):
+        return {
+            'max_inflight': self.max_inflight,
+            'queue_size': self.queue_size,
+            'inflight': self.inflight,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'draining': self.draining,
+        }
+
+
+limiter = UpstreamLimiter()
+
+
+def collect_limiter_metrics():
+    """Stan limitu zapytań do AI dla /metrics."""
+    stats = limiter.stats()
+    yield ('ttt_upstream_inflight', 'gauge', 'Zapytania do AI w toku', [({}, stats['inflight'])])
+    yield ('ttt_upstream_waiting', 'gauge', 'Zapytania czekające w kolejce do AI', [({}, stats['waiting'])])
+    yield ('ttt_upstream_admissions_total', 'counter',
+           'Zapytania do kolejki AI według wyniku (rejected i timed_out dostają ruch silnika)',
+           [({'result': result}, stats[result]) for result in ('admitted', 'rejected', 'timed_out')])
+
+
+registry.add_collector(collect_limiter_metrics)
+# Praca w tle (przewidywanie odpowiedzi) ustępuje, gdy zapytania czekają na miejsce w kolejce do AI
+ponderer.busy = lambda: limiter.waiting > 0 or limiter.draining
+
+
+async def run_cpu(func, *args):
+    """Uruchamia obliczenia w puli wątków serwera, nie blokując pętli zdarzeń."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+def busy_request(ai_request):
+    """Zapytanie, dla którego nie ma miejsca w kolejce do AI - gotowa odpowiedź z ruchem silnika."""
+    log.warning("Brak miejsca w kolejce zapytań do AI - ruch wybiera silnik")
+    return ai_request._replace(cached=(BUSY_COMMENT, fallback_move(ai_request.board, BUSY_MOVE_TIME_MS)),
+                               source='engine')
+
+
+async def answer_ai_request(ai_request):
+    """Asynchroniczny odpowiednik server.answer_ai_request (z limitem zapytań do AI)."""
+    if ai_request.cached is not None:
+        return cached_answer(ai_request)
+    usage = {}
+    async with limiter.slot() as admitted:
+        if admitted:
+            commentary = await get_ai_response_async(ai_request.prompt, usage)
+    if not admitted:
+        return cached_answer(await run_cpu(busy_request, ai_request))
+    return await run_cpu(finish_ai_answer, ai_request, commentary, usage)
+
+
+async def commentary_events(ai_request, engine_first, on_move=None):
+    """Asynchroniczny odpowiednik server.generate_commentary_events (z limitem zapytań do AI)."""
+    if ai_request.cached is None:
+        async with limiter.slot() as admitted:
+            if admitted:
+                async for event in _stream_events(CommentaryEvents(ai_request, on_move), engine_first):
+                    yield event
+                return
+        ai_request = await run_cpu(busy_request, ai_request)
+    for event in await run_cpu(CommentaryEvents(ai_request, on_move).cached):
+        yield event
+
+
+async def _stream_events(events, engine_first):
+    ai_request = events.ai_request
+    try:
+        engine_first = engine_first and ai_request.board is not None
+        chunks = astream_ai_response(ai_request.prompt, events.usage)
+        # Tryb "engine_first": zapytanie do API startuje w tle, zanim silnik zacznie liczyć
+        if engine_first:
+            chunks = aprefetch(chunks)
+        async with aclosing(chunks):
+            if engine_first:
+                for event in await run_cpu(events.engine_move):
+                    yield event
+            async for chunk in chunks:
+                for event in events.feed(chunk):
+                    yield event
+                if events.move_pending:
+                    for event in await run_cpu(events.resolve_move):
+                        yield event
+        for event in await run_cpu(events.finish):
+            yield event
+    except Exception as e:
+        for event in events.error(e):
+            yield event
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def read_json(receive):
+    """Treść zapytania jako słownik JSON (pusta treść - pusty słownik); błędny JSON kończy się ValueError."""
+    body = await read_body(receive)
+    data = json.loads(body) if body.strip() else {}
+    if not isinstance(data, dict):
+        raise ValueError('Oczekiwano obiektu JSON')
+    return data
+
+
+async def send_json(send, body, status=200):
+    data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(data)).encode('ascii')),
+    ]})
+    await send({'type': 'http.response.body', 'body': data})
+
+
+async def send_events(receive, send, events):
+    """
+    Wysyła zdarzenia SSE z async generatora. Rozłączenie klienta zamyka generator,
+    a razem z nim zapytanie do AI i miejsce w limicie zapytań.
+    """
+    await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+
+    async def pump():
+        async with aclosing(events):
+            async for event in events:
+                await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    pump_task = asyncio.ensure_future(pump())
+    watch_task = asyncio.ensure_future(wait_disconnect())
+    try:
+        await asyncio.wait((pump_task, watch_task), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watch_task.cancel()
+        pump_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await pump_task
+    if not pump_task.cancelled() and pump_task.exception() is not None:
+        log.error("Błąd podczas wysyłania strumienia: %s", pump_task.exception(), exc_info=pump_task.exception())
+
+
+async def get_ai_commentary(receive, send):
+    started = time.perf_counter()
+    try:
+        try:
+            ai_request = await run_cpu(prepare_ai_request, await read_json(receive))
+        except ValueError as e:
+            return await send_json(send, {'error': str(e)}, 400)
+        body, status = await answer_ai_request(ai_request)
+        log_answer('/get-ai-commentary', body, status, started)
+        if status == 200:
+            ponder_after(ai_request.board, body['ai_move'])
+        await send_json(send, body, status)
+    except ClientDisconnected:
+        raise
+    except Exception as e:
+        error_details = f"Błąd podczas przetwarzania zapytania AI: {str(e)}"
+        log.exception(error_details)
+        await send_json(send, {'error': error_details}, 500)
+
+
+async def get_ai_commentary_stream(receive, send):
+    try:
+        data = await read_json(receive)
+        ai_request = await run_cpu(prepare_ai_request, data)
+    except ValueError as e:
+        return await send_json(send, {'error': str(e)}, 400)
+    await send_events(receive, send, commentary_events(ai_request, bool(data.get('engine_first'))))
+
+
+async def session_move(receive, send, session_id):
+    """Ruch gracza w sesji - jak /session/<id>/move w server.py."""
+    started = time.perf_counter()
+    try:
+        data = await read_json(receive)
+    except ValueError as e:
+        return await send_json(send, {'error': str(e)}, 400)
+    session = sessions.get(session_id)
+    if session is None:
+        return await send_json(send, {'error': 'Nie ma takiej sesji (mogła wygasnąć)'}, 404)
+    try:
+        row, col = int(data['row']), int(data['col'])
+    except (KeyError, TypeError, ValueError):
+        return await send_json(send, {'error': 'Brak lub nieprawidłowe pola row/col'}, 400)
+
+    # Jeden ruch naraz - blokada jest trzymana do końca odpowiedzi (także strumienia)
+    if not session.lock.acquire(blocking=False):
+        return await send_json(send, {'error': 'Poprzedni ruch w tej sesji jest jeszcze przetwarzany'}, 409)
+    response_started = False
+    try:
+        try:
+            await run_cpu(session.play, row, col, HUMAN_PLAYER)
+        except ValueError as e:
+            return await send_json(send, dict(session.state(), error=str(e)), 409)
+
+        with stage('prompt_build'):
+            prompt = build_prompt(data.get('prompt') or DEFAULT_INTRO, session.board)
+        if session.status != ACTIVE:
+            # Gra skończyła się ruchem gracza - AI już tylko komentuje (bez miejsca w limicie - krótki komentarz)
+            async with limiter.slot() as admitted:
+                reply = await get_ai_response_async(prompt) if admitted else "Koniec gry!"
+            body = final_commentary_body(session, reply)
+            if data.get('stream'):
+                response_started = True
+                return await send_events(receive, send, _iterate(final_commentary_events(body)))
+            return await send_json(send, body)
+
+        ai_request = await run_cpu(build_ai_request, prompt, session.board)
+        on_move = functools.partial(apply_session_move, session)
+        if data.get('stream'):
+            response_started = True
+            return await send_events(receive, send, commentary_events(ai_request, bool(data.get('engine_first')),
+                                                                      on_move))
+
+        body, status = await answer_ai_request(ai_request)
+        if status == 200:
+            ai_move, source, fields = await run_cpu(on_move, body['ai_move'], body['source'])
+            body.update(fields, ai_move=ai_move, source=source)
+        log_answer('/session/move', body, status, started)
+        await send_json(send, body, status)
+    except Exception as e:
+        error_details = f"Błąd podczas przetwarzania ruchu w sesji: {str(e)}"
+        log.exception(error_details)
+        if not response_started:
+            await send_json(send, {'error': error_details}, 500)
+    finally:
+        session.lock.release()
+
+
+async def _iterate(events):
+    for event in events:
+        yield event
+
+
+async def serving_stats(receive, send):
+    """Stan limitu zapytań do AI (w toku, w kolejce, odrzucone)."""
+    await send_json(send, limiter.stats())
+
+
+def _wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def _call_wsgi(environ):
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [status, headers]
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+    return response[0], response[1], body
+
+
+async def wsgi_bridge(scope, receive, send):
+    """Obsługuje zapytanie aplikacją Flask w puli wątków (odpowiedź jest buforowana w całości)."""
+    environ = _wsgi_environ(scope, await read_body(receive))
+    status, headers, body = await run_cpu(_call_wsgi, environ)
+    await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def shutdown():
+    """Czeka na zapytania do AI w toku i zamyka pule połączeń."""
+    if not await limiter.drain(SHUTDOWN_GRACE_S):
+        log.warning("Zamykanie serwera: %d zapytań do AI nie zakończyło się w %g s", limiter.inflight, SHUTDOWN_GRACE_S)
+    await aclose_clients()
+    close_clients()
+    _executor.shutdown(wait=False)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                # Procesy puli przeszukiwania startują przed pierwszym zapytaniem
+                await run_cpu(get_search_pool)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+ROUTES = (
+    ('POST', re.compile(r'/get-ai-commentary'), get_ai_commentary),
+    ('POST', re.compile(r'/get-ai-commentary-stream'), get_ai_commentary_stream),
+    ('POST', re.compile(r'/session/(?P<session_id>[^/]+)/move'), session_move),
+    ('GET', re.compile(r'/serving-stats'), serving_stats),
+)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    try:
+        for method, pattern, handler in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] == method:
+                return await handler(receive, send, **match.groupdict())
+        await wsgi_bridge(scope, receive, send)
+    except ClientDisconnected:
+        pass
+
+
+class GracefulServer(uvicorn.Server):
+    """Serwer uvicorn, który po sygnale zamknięcia od razu przestaje kierować zapytania do AI."""
+
+    def handle_exit(self, sig, frame):
+        limiter.draining = True
+        super().handle_exit(sig, frame)
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 6000))
+    config = uvicorn.Config(app, host='0.0.0.0', port=port, lifespan='on', access_log=False,
+                            timeout_graceful_shutdown=int(SHUTDOWN_GRACE_S))
+    GracefulServer(config).run()
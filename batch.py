@@ -0,0 +1,182 @@
+"""
+Wektorowa (NumPy) ocena wielu plansz naraz - do self-play, budowy księgi
+otwarć i analiz.
+
+Plansze to tablica (N, size, size) int8 z kodami pól z board.py (0 puste,
+1 krzyżyk, 2 kółko). Dla obu graczy i czterech kierunków liczone są
+przesuwnymi oknami (przesunięte widoki tablicy z ramką) długości sekwencji,
+otwarte końce, wzorce X_XX / XX_X, pola blokady, otwarte trójki i czwórki
+oraz ocena okien 5-polowych. Wyniki są zgodne z find_threats i Board.scores.
+
+NumPy jest potrzebny tylko tutaj - serwer gry z tego modułu nie korzysta.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from board import (BLOCKED, DIRECTIONS, EMPTY, GAP_PATTERN, GAP_PATTERNS, KOLKO, KRZYZYK, MAX_RUN, MIN_THREAT,
+                   SEQUENCE, WIN_LENGTH, WINDOW_WEIGHTS, PLAYER_CODES, threat_to_dict)
+
+# Kolejność graczy na osi 1 wyników
+BATCH_PLAYERS = (KRZYZYK, KOLKO)
+PAD = MAX_RUN - 1  # Szerokość ramki - największe przesunięcie to 4 pola
+
+# Wyniki dla partii plansz; tablice (N, 2, 4, size, size) mają osie: plansza, gracz, kierunek, wiersz, kolumna
+BatchThreats = namedtuple("BatchThreats", [
+    "counts",     # długość sekwencji gracza od pola w kierunku (0-5, jak w find_threats)
+    "forward",    # sekwencja 3+ z wolnym polem za nią
+    "backward",   # sekwencja 3+ z wolnym polem przed nią
+    "gap_x_xx",   # pole (puste) jest luką we wzorcu X_XX
+    "gap_xx_x",   # pole (puste) jest luką we wzorcu XX_X
+    "blocks",     # (N, 2, size, size): liczba zagrożeń gracza zamykanych ruchem na pole
+    "open_threes",  # (N, 2): sekwencje dokładnie 3 z obydwoma wolnymi końcami
+    "open_fours",   # (N, 2): sekwencje dokładnie 4 z obydwoma wolnymi końcami
+    "scores",     # (N, 2): ocena okien 5-polowych (jak Board.scores)
+])
+
+
+def boards_to_array(boards):
+    """Zamienia listę plansz (Board albo napis .XO) na tablicę (N, size, size) int8."""
+    from board import Board
+
+    rows = [board if isinstance(board, Board) else Board.from_string(board) for board in boards]
+    if not rows:
+        raise ValueError("Brak plansz")
+    size = rows[0].size
+    data = b"".join(bytes(board.cells) for board in rows)
+    return np.frombuffer(data, dtype=np.int8).reshape(len(rows), size, size).copy()
+
+
+def _check_boards(boards):
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim == 2:
+        boards = boards[np.newaxis]
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError(f"Oczekiwano tablicy (N, size, size), otrzymano {boards.shape}")
+    return boards
+
+
+def evaluate_batch(boards):
+    """
+    Ocenia partię plansz (N, size, size) int8 i zwraca BatchThreats.
+
+    Pola spoza planszy są traktowane jak zablokowane (ani puste, ani gracza).
+    """
+    boards = _check_boards(boards)
+    n, size, _ = boards.shape
+    # Wewnętrznie oś plansz jest ostatnia: (wiersz, kolumna, gracz, N) - przesunięte
+    # widoki obejmują wtedy długie ciągłe fragmenty pamięci
+    padded = np.pad(np.moveaxis(boards, 0, -1), ((PAD, PAD), (PAD, PAD), (0, 0)), constant_values=BLOCKED)
+    own = np.stack([padded == code for code in BATCH_PLAYERS], axis=2)
+    empty = (padded == EMPTY)[:, :, np.newaxis]
+    on_board = (padded != BLOCKED)[:, :, np.newaxis]
+
+    def at(array, d, k):
+        """Widok: wartość pola przesuniętego o k kroków w kierunku d dla każdego pola planszy."""
+        _, dr, dc = DIRECTIONS[d]
+        r, c = PAD + dr * k, PAD + dc * k
+        return array[r:r + size, c:c + size]
+
+    shape = (len(DIRECTIONS), size, size, 2, n)
+    counts = np.empty(shape, dtype=np.int8)
+    forward = np.empty(shape, dtype=bool)
+    backward = np.empty(shape, dtype=bool)
+    gap_x_xx = np.empty(shape, dtype=bool)
+    gap_xx_x = np.empty(shape, dtype=bool)
+    blocks = np.zeros((size + 2 * PAD, size + 2 * PAD, 2, n), dtype=np.int16)
+    open_threes = np.zeros((2, n), dtype=np.int32)
+    open_fours = np.zeros((2, n), dtype=np.int32)
+    scores = np.zeros((2, n), dtype=np.int32)
+    weights = np.array(WINDOW_WEIGHTS, dtype=np.int16)
+
+    for d in range(len(DIRECTIONS)):
+        _, dr, dc = DIRECTIONS[d]
+
+        def block_view(k):
+            # Widok do zapisu: pole przesunięte o k kroków od pola zagrożenia
+            r, c = PAD + dr * k, PAD + dc * k
+            return blocks[r:r + size, c:c + size]
+
+        # Długość sekwencji od pola w przód (maks. 5) oraz liczba znaków w oknie 5-polowym
+        run = at(own, d, 0).copy()
+        count = counts[d]
+        count[...] = run
+        window = count.copy()
+        for k in range(1, MAX_RUN):
+            step = at(own, d, k)
+            run &= step
+            count += run
+            window += step
+
+        seq = count >= MIN_THREAT
+        before = at(empty, d, -1)
+        after = forward[d]
+        after[...] = False
+        for k in range(MIN_THREAT, MAX_RUN):
+            ends = (count == k) & at(empty, d, k)
+            after |= ends
+            block_view(k)[...] += ends
+            # Wolne pole przed sekwencją oznacza, że to jej pierwsze pole
+            both_open = (ends & before).reshape(size * size, -1).sum(axis=0, dtype=np.int32).reshape(2, n)
+            if k == 3:
+                open_threes += both_open
+            else:
+                open_fours += both_open
+        np.logical_and(seq, before, out=backward[d])
+        block_view(-1)[...] += backward[d]
+
+        # Luki: X_XX i XX_X z pustym polem w miejscu "_"
+        middle = at(empty, d, 0) & at(own, d, -1) & at(own, d, 1)
+        np.logical_and(middle, at(own, d, 2), out=gap_x_xx[d])
+        np.logical_and(middle, at(own, d, -2), out=gap_xx_x[d])
+        block_view(0)[...] += gap_x_xx[d]
+        block_view(0)[...] += gap_xx_x[d]
+
+        # Okna 5-polowe: tylko w całości na planszy i bez znaków przeciwnika
+        valid = (at(on_board, d, 0) & at(on_board, d, WIN_LENGTH - 1)) & (window[:, :, ::-1] == 0)
+        window_scores = weights[window]
+        window_scores *= valid
+        scores += window_scores.reshape(size * size, -1).sum(axis=0, dtype=np.int32).reshape(2, n)
+
+    def boards_first(array):
+        # (kierunek, wiersz, kolumna, gracz, N) -> (N, gracz, kierunek, wiersz, kolumna)
+        return np.moveaxis(array, (0, 1, 2, 3, 4), (2, 3, 4, 1, 0))
+
+    return BatchThreats(
+        counts=boards_first(counts),
+        forward=boards_first(forward),
+        backward=boards_first(backward),
+        gap_x_xx=boards_first(gap_x_xx),
+        gap_xx_x=boards_first(gap_xx_x),
+        blocks=np.moveaxis(blocks[PAD:PAD + size, PAD:PAD + size], (0, 1, 2, 3), (2, 3, 1, 0)),
+        open_threes=open_threes.T,
+        open_fours=open_fours.T,
+        scores=scores.T,
+    )
+
+
+def batch_threats(result, index, player):
+    """Odtwarza listę zagrożeń w formacie find_threats dla jednej planszy z wyniku evaluate_batch."""
+    code = PLAYER_CODES.get(player, player)
+    p = BATCH_PLAYERS.index(code)
+    counts = result.counts[index, p]
+    size = counts.shape[-1]
+    found = []
+    for sub, mask in enumerate((result.forward[index, p], result.backward[index, p])):
+        for d, row, col in zip(*np.nonzero(mask)):
+            _, dr, dc = DIRECTIONS[d]
+            count = int(counts[d, row, col])
+            step = count if sub == 0 else -1
+            start = int(row) * size + int(col)
+            block = (int(row) + dr * step) * size + int(col) + dc * step
+            found.append((-count, SEQUENCE, start, int(d), sub, count, start, block, None))
+    for sub, mask in enumerate((result.gap_x_xx[index, p], result.gap_xx_x[index, p])):
+        for d, row, col in zip(*np.nonzero(mask)):
+            _, dr, dc = DIRECTIONS[d]
+            back = 1 if sub == 0 else 2
+            block = int(row) * size + int(col)
+            start = (int(row) - dr * back) * size + int(col) - dc * back
+            found.append((-3, GAP_PATTERN, block, int(d), sub, 3, start, block, GAP_PATTERNS[sub]))
+    found.sort()
+    return [threat_to_dict(threat, size) for threat in found]
@@ -0,0 +1,188 @@
+"""
+Test obciążeniowy trybu produkcyjnego (asgi.py) w porównaniu z serwerem wątkowym (werkzeug).
+
+Kilkaset gier naraz: każda gra wysyła po kolei --moves zapytań do
+/get-ai-commentary (różne pozycje z bezgłowych partii, więc bez trafień
+w cache), a lokalny serwer udający API odpowiada z opóźnieniem --latency-ms.
+Serwer udający API działa w osobnym procesie, więc liczba wątków procesu
+pomiarowego to wątki serwera gry.
+
+Mierzone są: przepustowość, opóźnienia, statusy, odpowiedzi z ruchem silnika
+z powodu pełnej kolejki (BUSY_COMMENT) i szczytowa liczba wątków.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    AI_MAX_INFLIGHT=64 AI_QUEUE_SIZE=256 python -m benchmarks.bench_async --games 300 --moves 5 \\
+        --latency-ms 1000 --output wyniki/async.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+os.environ["AI_CACHE_DB"] = ""  # Pomiary tylko na cache w pamięci
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # Bez wpisu w logu na każde zapytanie
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+import httpx
+
+import ai_client
+import asgi
+from benchmarks.common import ROOT, memory_usage, report, save_results, start_app, start_asgi, summarize
+from benchmarks.selfplay import sample_positions
+from server import app, position_cache
+
+MODES = ("threaded", "asgi")
+
+
+def start_stub_process(latency_ms):
+    """Uruchamia serwer udający API w osobnym procesie; zwraca (proces, URL endpointu)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_llm", "--port", str(port),
+                                "--latency-ms", str(latency_ms)], cwd=ROOT, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/api/v1/chat/completions"
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, url
+
+
+class ThreadSampler:
+    """Co 50 ms sprawdza liczbę wątków procesu; zapamiętuje maksimum."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="thread-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stop.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+
+
+async def play_games(base_url, games, positions, moves):
+    samples = []
+    statuses = {}
+    busy = [0]
+
+    async def game(index):
+        # Osobny klient (połączenie) na grę, jak osobne przeglądarki - wspólna pula httpx
+        # na setki połączeń zużywa więcej CPU niż mierzony serwer
+        # (bez TLS - verify=False pomija wczytywanie certyfikatów przy każdym kliencie)
+        async with httpx.AsyncClient(timeout=120, verify=False) as client:
+            await play(client, index)
+
+    async def play(client, index):
+        for move in range(moves):
+            board = positions[(index * moves + move) % len(positions)]
+            start = time.perf_counter()
+            response = await client.post(f"{base_url}/get-ai-commentary", json={"prompt": "Twój ruch!", "board": board})
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200 and response.json().get("commentary") == asgi.BUSY_COMMENT:
+                busy[0] += 1
+
+    await asyncio.gather(*(game(index) for index in range(games)))
+    return samples, statuses, busy[0]
+
+
+def run(mode, games=300, moves=5, url=None, seed=0):
+    """Rozgrywa games gier naraz na serwerze w trybie mode; zwraca (wyniki, próbki opóźnień w sekundach)."""
+    positions = sample_positions(games * moves, seed)
+    ai_client.API_URL = url
+    position_cache.store.clear()
+    if mode == "asgi":
+        server, thread, base_url = start_asgi(asgi.app)
+    else:
+        server, base_url = start_app(app)
+    before = asgi.limiter.stats()
+
+    try:
+        # Serwer wypisuje każde zapytanie - wyciszamy to na czas pomiaru
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()), \
+                ThreadSampler() as threads:
+            started = time.perf_counter()
+            samples, statuses, busy = asyncio.run(play_games(base_url, games, positions, moves))
+            elapsed = time.perf_counter() - started
+        after = asgi.limiter.stats()
+    finally:
+        if mode == "asgi":
+            server.should_exit = True
+            thread.join()
+        else:
+            server.shutdown()
+
+    result = {
+        "mode": mode,
+        "games": games,
+        "moves": moves,
+        "requests": len(samples),
+        "latency": summarize(samples, elapsed),
+        "requests_per_s": round(len(samples) / elapsed, 1),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "engine_failovers": busy,
+        "peak_threads": threads.peak,
+        "max_rss_mb": memory_usage(),
+    }
+    if mode == "asgi":
+        result["limiter"] = {key: after[key] - before[key] for key in ("admitted", "rejected", "timed_out")}
+        result["limiter"].update(max_inflight=after["max_inflight"], queue_size=after["queue_size"])
+    return result, samples
+
+
+def print_summary(result, samples):
+    report(f"{result['mode']}: {result['games']} gier x {result['moves']} ruchów", samples)
+    print(f"{'':40s} {result['requests_per_s']} zapytań/s, statusy: {result['statuses']}, "
+          f"ruchy silnika (pełna kolejka): {result['engine_failovers']}, "
+          f"szczytowo wątków: {result['peak_threads']}")
+    if "limiter" in result:
+        print(f"{'':40s} limit zapytań do AI: {result['limiter']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy trybu produkcyjnego (ASGI)")
+    parser.add_argument("--games", type=int, default=300, help="Liczba gier naraz")
+    parser.add_argument("--moves", type=int, default=5, help="Liczba ruchów w każdej grze")
+    parser.add_argument("--latency-ms", type=float, default=1000.0, help="Opóźnienie odpowiedzi modelu")
+    parser.add_argument("--mode", choices=MODES, action="append", help="Tryb serwera (domyślnie oba)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    stub, url = start_stub_process(args.latency_ms)
+    results = {}
+    try:
+        for mode in args.mode or MODES:
+            result, samples = run(mode, args.games, args.moves, url, args.seed)
+            print_summary(result, samples)
+            results[mode] = result
+    finally:
+        stub.terminate()
+        stub.wait()
+        ai_client.close_clients()
+    if args.output:
+        save_results(args.output, {"async": results, "stub_latency_ms": args.latency_ms})
+
+
+if __name__ == "__main__":
+    main()
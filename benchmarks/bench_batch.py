@@ -0,0 +1,71 @@
+"""
+Benchmark wektorowej oceny plansz (batch.evaluate_batch) kontra find_threats plansza po planszy.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_batch [liczba_pozycji]
+
+Przed pomiarem sprawdzana jest zgodność z find_threats (łącznie z kolejnością
+zagrożeń), ocenami Board.scores i polami blokady.
+"""
+
+import random
+import sys
+import time
+
+from batch import BATCH_PLAYERS, batch_threats, boards_to_array, evaluate_batch
+from board import PLAYER_NAMES, Board, find_threats
+from benchmarks.bench_threats import random_rows
+
+PLAYERS = [PLAYER_NAMES[code] for code in BATCH_PLAYERS]
+
+
+def check_equivalence(boards):
+    result = evaluate_batch(boards_to_array(boards))
+    for i, board in enumerate(boards):
+        for p, player in enumerate(PLAYERS):
+            threats = find_threats(board, player)
+            if batch_threats(result, i, player) != threats:
+                raise AssertionError(f"Niezgodne zagrożenia dla pozycji {board.to_string()}")
+            if int(result.scores[i, p]) != board.scores[BATCH_PLAYERS[p]]:
+                raise AssertionError(f"Niezgodna ocena dla pozycji {board.to_string()}")
+            blocks = [0] * (board.size * board.size)
+            for threat in threats:
+                blocks[threat["block_row"] * board.size + threat["block_col"]] += 1
+            if result.blocks[i, p].ravel().tolist() != blocks:
+                raise AssertionError(f"Niezgodne pola blokady dla pozycji {board.to_string()}")
+
+
+def best_time(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    boards = [Board.from_rows(random_rows(rng, rng.randint(0, 70))) for _ in range(count)]
+
+    check_equivalence(boards[:2000])
+    print("Zgodność z find_threats: OK (2000 pozycji)")
+
+    # Plansze dekodowane od nowa - zagrożenia Board są zapamiętywane między wywołaniami
+    sample = [board.to_string() for board in boards[:5000]]
+    elapsed = best_time(lambda: [find_threats(board, player) for text in sample
+                                 for board in (Board.from_string(text),) for player in PLAYERS], 3)
+    print(f"{'find_threats (plansza po planszy)':40s} {len(sample) / elapsed:10,.0f} plansz/s")
+
+    array = boards_to_array(boards)
+    for batch_size in (100, 1000, 10000, count):
+        batches = [array[i:i + batch_size] for i in range(0, count, batch_size)]
+        elapsed = best_time(lambda: [evaluate_batch(batch) for batch in batches], 3)
+        print(f"{'evaluate_batch, partie po ' + str(batch_size):40s} {count / elapsed:10,.0f} plansz/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Mikrobenchmark dekodowania planszy: parsowanie tekstu "Stan planszy" kontra
+kompaktowy zapis przesyłany w polu "board" / "moves".
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_board_payload [liczba_pozycji]
+"""
+
+import random
+import sys
+import timeit
+
+from board import BOARD_SIZE, Board
+from prompts import build_prompt
+from server import decode_board_payload, parse_board_from_prompt
+
+
+def random_moves(rng, stones):
+    return rng.sample(range(BOARD_SIZE * BOARD_SIZE), stones)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    rng = random.Random(1234)
+    move_lists = [random_moves(rng, rng.randint(4, 50)) for _ in range(count)]
+    boards = [Board.from_moves(moves) for moves in move_lists]
+    strings = [board.to_string() for board in boards]
+    prompts = [build_prompt("Twój ruch!", board) for board in boards]
+
+    # Wszystkie formaty muszą dawać tę samą planszę
+    for moves, text, prompt in zip(move_lists, strings, prompts):
+        expected = Board.from_moves(moves).to_string()
+        assert parse_board_from_prompt(prompt).to_string() == expected
+        assert decode_board_payload({"board": text}).to_string() == expected
+    print(f"Zgodność formatów: OK ({count} pozycji)")
+
+    cases = (
+        ("prompt tekstowy", lambda: [parse_board_from_prompt(p) for p in prompts]),
+        ("board (napis)", lambda: [decode_board_payload({"board": s}) for s in strings]),
+        ("moves (lista ruchów)", lambda: [decode_board_payload({"moves": m}) for m in move_lists]),
+    )
+    results = {}
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=5))
+        results[name] = best
+        print(f"{name:22s} {best * 1e6 / count:8.1f} µs/plansza")
+
+    base = results["prompt tekstowy"]
+    for name, value in results.items():
+        if name != "prompt tekstowy":
+            print(f"Przyspieszenie {name}: {base / value:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,93 @@
+"""
+Benchmark księgi otwarć: czas otwarcia pliku (mmap), czas wyszukiwania oraz
+pokrycie pozycji z partii self-play.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_book [plik_księgi] [--positions 3000] [--output wyniki.json]
+
+Bez podanego pliku budowana jest mała księga tymczasowa (build_book.BookBuilder).
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from board import BOARD_SIZE, EMPTY, Board
+from book import OpeningBook, write_book
+from build_book import BookBuilder
+from benchmarks.common import save_results, summarize
+from benchmarks.selfplay import sample_positions
+
+
+def build_temporary_book(path):
+    builder = BookBuilder(time_ms=30, max_depth=3)
+    builder.expand(Board(), 1)
+    rng = random.Random(0)
+    for _ in range(100):
+        builder.self_play(rng, 7)
+    write_book(path, builder.entries, BOARD_SIZE, builder.max_stones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pomiar księgi otwarć: otwarcie, wyszukiwanie, pokrycie")
+    parser.add_argument("path", nargs="?", help="Plik księgi (domyślnie mała księga tymczasowa)")
+    parser.add_argument("--positions", type=int, default=3000, help="Liczba pozycji z partii self-play")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    path = args.path
+    temporary = None
+    if path is None:
+        temporary = tempfile.NamedTemporaryFile(suffix=".bin", delete=False)
+        temporary.close()
+        path = temporary.name
+        build_temporary_book(path)
+    size = os.path.getsize(path)
+
+    try:
+        opened = []
+        for _ in range(20):
+            start = time.perf_counter()
+            book = OpeningBook(path)
+            opened.append(time.perf_counter() - start)
+            book.close()
+        print(f"{'otwarcie księgi (' + str(size) + ' B)':40s} "
+              f"mediana {statistics.median(opened) * 1e6:8.1f} µs")
+
+        book = OpeningBook(path)
+        positions = [Board.from_string(text) for text in sample_positions(args.positions, seed=args.seed)]
+        early = [board for board in positions if len(board.cells) - board.cells.count(EMPTY) <= book.max_stones]
+        canonical = [board.canonical() for board in early]
+
+        samples = []
+        found = 0
+        for board, key in zip(early, canonical):
+            start = time.perf_counter()
+            move = book.lookup(board, key)
+            samples.append(time.perf_counter() - start)
+            found += move is not None
+        print(f"{'wyszukiwanie (pozycja kanoniczna gotowa)':40s} mediana {statistics.median(samples) * 1e6:8.1f} µs, "
+              f"maks. {max(samples) * 1e6:.1f} µs")
+        print(f"Księga: {book.count} pozycji do {book.max_stones} znaków; pokrycie pozycji otwarcia z self-play: "
+              f"{found}/{len(early)} ({found / max(len(early), 1):.1%})")
+        results = {
+            "positions": book.count,
+            "open": summarize(opened),
+            "lookup": summarize(samples),
+            "coverage": round(found / max(len(early), 1), 4),
+        }
+        book.close()
+    finally:
+        if temporary is not None:
+            os.unlink(path)
+    if args.output:
+        save_results(args.output, {"book": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark klienta AI na lokalnym serwerze udającym API (benchmarks.stub_llm).
+
+Mierzy:
+- nowe połączenie na każde zapytanie kontra współdzielona pula keep-alive,
+- opóźnienia ogonowe bez i z zapytaniami zabezpieczającymi (hedging),
+- dotrzymanie całkowitego limitu czasu (ruch awaryjny),
+- równoległe zapytania w ścieżce asynchronicznej.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_client
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+import httpx
+
+import ai_client
+from benchmarks.common import report
+from benchmarks.stub_llm import StubConfig, start_stub_server
+
+
+def timed(fn, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_pooling(count=300):
+    server, url = start_stub_server(StubConfig(latency_ms=0))
+    ai_client.API_URL = url
+    headers, payload = ai_client._build_request("Twój ruch!")
+    try:
+        report("nowe połączenie na zapytanie", timed(lambda: httpx.post(url, headers=headers, json=payload), count))
+        report("pula keep-alive (get_ai_response)", timed(lambda: ai_client.get_ai_response("Twój ruch!"), count))
+    finally:
+        server.shutdown()
+
+
+def bench_hedging(count=300):
+    config = StubConfig(latency_ms=50, jitter_ms=20, slow_ratio=0.02, slow_ms=1500, seed=7)
+    server, url = start_stub_server(config)
+    ai_client.API_URL = url
+    try:
+        for enabled in (False, True):
+            ai_client.AI_HEDGE_ENABLED = enabled
+            ai_client.latency = ai_client.LatencyTracker()
+            # Rozgrzewka - zebranie próbek do wyznaczenia percentyla
+            timed(lambda: ai_client.get_ai_response("Twój ruch!"), ai_client.AI_HEDGE_MIN_SAMPLES)
+            samples = timed(lambda: ai_client.get_ai_response("Twój ruch!"), count)
+            report(f"ogony 2% x 1.5s, hedging={'tak' if enabled else 'nie'}", samples)
+    finally:
+        ai_client.AI_HEDGE_ENABLED = False
+        server.shutdown()
+
+
+def bench_deadline(count=10):
+    server, url = start_stub_server(StubConfig(latency_ms=5000))
+    ai_client.API_URL = url
+    deadline = ai_client.AI_DEADLINE_S
+    ai_client.AI_DEADLINE_S = 0.3
+    try:
+        replies = []
+        samples = timed(lambda: replies.append(ai_client.get_ai_response("Twój ruch!")), count)
+        report("limit czasu 300ms (odpowiedź po 5s)", samples)
+        assert all(f"RUCH:{ai_client.FALLBACK_MOVE}" in reply for reply in replies)
+    finally:
+        ai_client.AI_DEADLINE_S = deadline
+        server.shutdown()
+
+
+def bench_async(concurrency=100):
+    server, url = start_stub_server(StubConfig(latency_ms=200))
+    ai_client.API_URL = url
+
+    async def run():
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(ai_client.get_ai_response_async("Twój ruch!") for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        await ai_client.aclose_clients()
+        return replies, elapsed
+
+    try:
+        replies, elapsed = asyncio.run(run())
+        ok = sum("RUCH:" in reply and ai_client.FALLBACK_MOVE not in reply for reply in replies)
+        print(f"{'async: ' + str(concurrency) + ' równoległych zapytań (200ms)':40s} "
+              f"całość={elapsed * 1000:7.1f}ms  poprawnych={ok}/{concurrency}")
+    finally:
+        server.shutdown()
+
+
+def main():
+    bench_pooling()
+    bench_hedging()
+    bench_deadline()
+    bench_async()
+    ai_client.close_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Test obciążeniowy /get-ai-commentary od początku do końca na lokalnym serwerze udającym API.
+
+Serwer gry działa w tym samym procesie (werkzeug, wątki), a zapytania
+wysyła pula wątków z pozycjami z bezgłowych partii. Odpowiedzi modelu mają
+konfigurowalne opóźnienie i kształt - także brakujący lub zniekształcony
+marker RUCH: - a każdy zwrócony ruch jest sprawdzany pod kątem legalności.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_load --requests 500 --concurrency 16 \\
+        --latency-ms 100 --shapes "ok=0.7,malformed=0.1,missing=0.1,error=0.1" --output wyniki/load.json
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["AI_CACHE_DB"] = ""  # Pomiary tylko na cache w pamięci
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # Bez wpisu w logu na każde zapytanie
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+import httpx
+
+import ai_client
+from board import EMPTY, Board
+from benchmarks.common import memory_usage, report, save_results, start_app, summarize
+from benchmarks.selfplay import sample_positions
+from benchmarks.stub_llm import StubConfig, parse_shapes, start_stub_server
+from server import app, position_cache
+
+
+def run(requests=500, concurrency=16, config=None, distinct=None, seed=0):
+    """
+    Wysyła zapytania do /get-ai-commentary; zwraca (wyniki, próbki opóźnień w sekundach).
+
+    distinct - liczba różnych pozycji (mniej niż requests oznacza powtórki, czyli trafienia w cache).
+    """
+    config = config or StubConfig(latency_ms=100, seed=seed)
+    positions = sample_positions(distinct or requests, seed)
+    stub, url = start_stub_server(config)
+    ai_client.API_URL = url
+    game, base_url = start_app(app)
+    position_cache.store.clear()
+    before = position_cache.stats()
+    tokens_before = ai_client.token_usage.stats()
+
+    samples = []
+    statuses = {}
+    illegal = []
+    missing_move = [0]
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        board = positions[i % len(positions)]
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(timeout=60)
+        start = time.perf_counter()
+        response = local.client.post(f"{base_url}/get-ai-commentary", json={"prompt": "Twój ruch!", "board": board})
+        elapsed = time.perf_counter() - start
+        move = response.json().get("ai_move") if response.status_code == 200 else None
+        with lock:
+            samples.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200 and move is None:
+                missing_move[0] += 1
+            elif move is not None and Board.from_string(board).get(move["row"], move["col"]) != EMPTY:
+                illegal.append((board, move))
+
+    try:
+        # Serwer wypisuje każde zapytanie i błąd modelu - wyciszamy to na czas pomiaru
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, range(requests)))
+            elapsed = time.perf_counter() - started
+        after = position_cache.stats()
+        tokens_after = ai_client.token_usage.stats()
+    finally:
+        game.shutdown()
+        stub.shutdown()
+
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "distinct_positions": len(positions),
+        "stub": {"latency_ms": config.latency_ms, "jitter_ms": config.jitter_ms, "slow_ratio": config.slow_ratio,
+                 "slow_ms": config.slow_ms, "shapes": config.shapes},
+        "latency": summarize(samples, elapsed),
+        "requests_per_s": round(requests / elapsed, 1),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "illegal_moves": len(illegal),
+        "missing_moves": missing_move[0],
+        "cache_hit_rate": _hit_rate(before, after),
+        "tokens": _token_averages(tokens_before, tokens_after),
+        "max_rss_mb": memory_usage(),
+    }
+    return result, samples
+
+
+def _hit_rate(before, after):
+    """Odsetek trafień w cache pozycji w trakcie pomiaru (liczniki są globalne dla procesu)."""
+    hits = after["hits"] + after["disk_hits"] - before["hits"] - before["disk_hits"]
+    lookups = hits + after["misses"] - before["misses"]
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+def _token_averages(before, after):
+    """Średnie tokeny wejściowe/wyjściowe zapytań do AI w trakcie pomiaru."""
+    requests = after["requests"] - before["requests"]
+    if not requests:
+        return {"ai_requests": 0, "avg_tokens_in": 0, "avg_tokens_out": 0}
+    return {
+        "ai_requests": requests,
+        "avg_tokens_in": round((after["tokens_in"] - before["tokens_in"]) / requests, 1),
+        "avg_tokens_out": round((after["tokens_out"] - before["tokens_out"]) / requests, 1),
+    }
+
+
+def print_summary(result, samples):
+    report(f"/get-ai-commentary x{result['requests']} (c={result['concurrency']})", samples)
+    print(f"{'':40s} {result['requests_per_s']} zapytań/s, statusy: {result['statuses']}, "
+          f"nielegalne ruchy: {result['illegal_moves']}, bez ruchu: {result['missing_moves']}")
+    print(f"{'':40s} trafienia w cache: {result['cache_hit_rate']:.1%}, "
+          f"szczytowa pamięć procesu: {result['max_rss_mb']} MB")
+    tokens = result["tokens"]
+    print(f"{'':40s} zapytania do AI: {tokens['ai_requests']}, średnio tokenów: "
+          f"wejście {tokens['avg_tokens_in']}, wyjście {tokens['avg_tokens_out']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy /get-ai-commentary")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct", type=int, default=None, help="Liczba różnych pozycji (domyślnie = requests)")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--shapes", default="ok=0.7,malformed=0.1,missing=0.1,error=0.1",
+                        help='Np. "ok=0.8,malformed=0.1,missing=0.1"')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.slow_ratio, args.slow_ms,
+                        parse_shapes(args.shapes), args.seed)
+    try:
+        result, samples = run(args.requests, args.concurrency, config, args.distinct, args.seed)
+    finally:
+        ai_client.close_clients()
+    print_summary(result, samples)
+    if args.output:
+        save_results(args.output, {"load": result})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark przeszukiwania na puli procesów (parallel.SearchPool) dla 1/2/4/8 procesów.
+
+Mierzy:
+- czas przeszukiwania do stałej głębokości (podział ruchów korzenia) i przyspieszenie
+  względem engine.find_best_move w jednym procesie,
+- głębokość osiąganą w limicie czasu serwera (AI_MOVE_TIME_MS),
+- przepustowość analizy zagrożeń (find_threats obu graczy) przy wielu wątkach serwera.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_parallel --positions 20 --depth 4 [--workers 1,2,4,8] [--output wyniki.json]
+
+Przyspieszenie zależy od liczby rdzeni - wypisywana jest liczba dostępnych CPU.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from board import Board, find_threats
+from benchmarks.common import save_results, summarize
+from benchmarks.selfplay import sample_positions
+from engine import TranspositionTable, find_best_move
+from parallel import SearchPool
+
+WORKER_COUNTS = "1,2,4,8"
+ANALYSIS_THREADS = 16
+
+
+def fixed_depth(search, positions, depth):
+    times, results = [], []
+    for text in positions:
+        start = time.perf_counter()
+        results.append(search(Board.from_string(text), depth))
+        times.append(time.perf_counter() - start)
+    return times, results
+
+
+def analysis_rate(analyse, positions):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ANALYSIS_THREADS) as threads:
+        list(threads.map(analyse, [Board.from_string(text) for text in positions]))
+    return len(positions) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pomiar przeszukiwania na puli procesów (parallel.SearchPool)")
+    parser.add_argument("--positions", type=int, default=20, help="Liczba pozycji z partii self-play")
+    parser.add_argument("--depth", type=int, default=4, help="Stała głębokość przeszukiwania")
+    parser.add_argument("--workers", default=WORKER_COUNTS, help="Liczby procesów w puli, po przecinku")
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    count, depth = args.positions, args.depth
+    worker_counts = [int(workers) for workers in args.workers.split(",")]
+    time_ms = int(os.getenv("AI_MOVE_TIME_MS", 300))
+    positions = sample_positions(count * 3, seed=5)[count:count * 2]
+    analysis_positions = sample_positions(2000, seed=6)
+    print(f"Dostępne CPU: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}, "
+          f"{len(positions)} pozycji, głębokość {depth}, limit czasu {time_ms} ms")
+
+    serial_times, serial_results = fixed_depth(
+        lambda board, d: find_best_move(board, "kółko", time_limit_ms=10 ** 7, max_depth=d,
+                                        table=TranspositionTable()), positions, depth)
+    serial_time = statistics.mean(serial_times)
+    serial_depth = statistics.mean(find_best_move(Board.from_string(text), "kółko", time_limit_ms=time_ms).depth
+                                   for text in positions)
+    serial_rate = analysis_rate(lambda board: (find_threats(board, "krzyżyk"), find_threats(board, "kółko")),
+                                analysis_positions)
+    print(f"{'1 proces (bez puli)':22s} głębokość {depth}: {serial_time * 1000:8.1f} ms/ruch, "
+          f"w {time_ms} ms: głębokość {serial_depth:4.2f}, analiza: {serial_rate:8,.0f} plansz/s")
+    results = {"serial": {"search": summarize(serial_times), "depth": round(serial_depth, 2),
+                          "analysis": {"per_s": round(serial_rate, 1)}}}
+
+    for workers in worker_counts:
+        pool = SearchPool(workers)
+        started = time.perf_counter()
+        pool.warm_up()
+        warm = time.perf_counter() - started
+        try:
+            pool_times, pool_results = fixed_depth(
+                lambda board, d: pool.find_best_move(board, "kółko", time_limit_ms=10 ** 7, max_depth=d),
+                positions, depth)
+            pool_depth = statistics.mean(pool.find_best_move(Board.from_string(text), "kółko", time_ms).depth
+                                         for text in positions)
+            rate = analysis_rate(lambda board: pool.analyse(board, 3), analysis_positions)
+        finally:
+            pool.shutdown()
+        pool_time = statistics.mean(pool_times)
+        same = sum(a.row == b.row and a.col == b.col for a, b in zip(pool_results, serial_results))
+        print(f"{str(workers) + ' proc. w puli':22s} głębokość {depth}: {pool_time * 1000:8.1f} ms/ruch "
+              f"(x{serial_time / pool_time:4.2f}), w {time_ms} ms: głębokość {pool_depth:4.2f}, "
+              f"analiza: {rate:8,.0f} plansz/s; start puli {warm * 1000:.0f} ms, "
+              f"ten sam ruch: {same}/{len(positions)}")
+        results[f"workers_{workers}"] = {
+            "search": summarize(pool_times),
+            "speedup": round(serial_time / pool_time, 2),
+            "depth": round(pool_depth, 2),
+            "analysis": {"per_s": round(rate, 1)},
+            "warm_up": summarize([warm]),
+            "same_move": same,
+        }
+
+    if args.output:
+        save_results(args.output, {"parallel": results, "search_depth": depth, "time_ms": time_ms})
+
+
+if __name__ == "__main__":
+    main()
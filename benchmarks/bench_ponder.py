@@ -0,0 +1,162 @@
+"""
+Pomiar przewidywania odpowiedzi gracza (ponder.py) w grach przez sesje.
+
+Gry toczą się naraz przez /session/<id>/move: gracz (krzyżyk - "greedy" albo
+"random" z benchmarks.selfplay) po każdej odpowiedzi AI "myśli" --think-ms,
+a lokalny serwer udający API odpowiada z opóźnieniem --latency-ms. Te same
+gry (to samo ziarno) są rozgrywane bez przewidywania (PONDER_TOP_K=0)
+i z przewidywaniem top --top-k odpowiedzi.
+
+Mierzone są: opóźnienia ruchu AI (wszystkie oraz osobno trafienia
+przewidywania i pozostałe), odsetek trafień, oszczędność opóźnienia na
+trafieniu (mediana pozostałych minus mediana trafień), czas liczenia
+przeniesiony w tło oraz pozycje policzone, anulowane i pominięte.
+
+Silnik przewidywania najlepiej uruchamiać w puli procesów (SEARCH_WORKERS),
+inaczej przeszukiwanie w wątku zabiera GIL obsłudze zapytań.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    SEARCH_WORKERS=1 python -m benchmarks.bench_ponder --games 16 --top-k 3 --think-ms 1500 --latency-ms 1000 \\
+        --output wyniki/ponder.json
+"""
+
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["AI_CACHE_DB"] = ""  # Pomiary tylko na cache w pamięci
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # Bez wpisu w logu na każde zapytanie
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+import httpx
+
+import ai_client
+from board import BOARD_SIZE, KOLKO, KRZYZYK, Board
+from benchmarks.common import memory_usage, report, save_results, start_app, summarize
+from benchmarks.selfplay import PLAYER_KINDS, PLAYERS
+from benchmarks.stub_llm import StubConfig, start_stub_server
+from ponder import ponderer
+from server import app, position_cache
+
+COUNTERS = ("scheduled", "computed", "cancelled", "skipped", "hits", "late", "misses")
+
+
+def play_game(base_url, human, seed, think_s, max_moves):
+    """Rozgrywa jedną grę w sesji; zwraca listę (opóźnienie ruchu AI w sekundach, źródło ruchu)."""
+    rng = random.Random(seed)
+    board = Board()
+    samples = []
+    with httpx.Client(timeout=120) as client:
+        session_id = client.post(f"{base_url}/session", json={}).json()["session_id"]
+        for _ in range(max_moves):
+            if board.moves:
+                idx = PLAYERS[human](board, KRZYZYK, rng)
+            else:
+                # Pierwszy ruch losowy w środkowej części planszy, żeby partie się różniły
+                quarter = BOARD_SIZE // 4
+                idx = rng.randrange(quarter, BOARD_SIZE - quarter) * BOARD_SIZE + rng.randrange(quarter, BOARD_SIZE - quarter)
+            row, col = divmod(idx, BOARD_SIZE)
+            board.apply(row, col, KRZYZYK)
+            time.sleep(think_s)
+            start = time.perf_counter()
+            body = client.post(f"{base_url}/session/{session_id}/move", json={"row": row, "col": col}).json()
+            samples.append((time.perf_counter() - start, body.get("source")))
+            if body.get("status") != "active" or body.get("ai_move") is None:
+                break
+            board.apply(body["ai_move"]["row"], body["ai_move"]["col"], KOLKO)
+        client.delete(f"{base_url}/session/{session_id}")
+    return samples
+
+
+def run(top_k, base_url, games=16, human="greedy", think_ms=1500, max_moves=15, seed=0):
+    """Rozgrywa games gier naraz z PONDER_TOP_K=top_k; zwraca (wyniki, próbki trafień, próbki pozostałych)."""
+    ponderer.top_k = top_k
+    position_cache.store.clear()
+    before = ponderer.stats()
+    results = []
+    lock = threading.Lock()
+
+    def one(index):
+        samples = play_game(base_url, human, seed + index, think_ms / 1000, max_moves)
+        with lock:
+            results.extend(samples)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=games) as pool:
+        list(pool.map(one, range(games)))
+    elapsed = time.perf_counter() - started
+    after = ponderer.stats()
+
+    hits = [latency for latency, source in results if source == "ponder"]
+    others = [latency for latency, source in results if source != "ponder"]
+    delta = {key: after[key] - before[key] for key in COUNTERS}
+    lookups = delta["hits"] + delta["late"] + delta["misses"]
+    result = {
+        "top_k": top_k,
+        "games": games,
+        "human": human,
+        "think_ms": think_ms,
+        "ai_moves": len(results),
+        "latency": summarize([latency for latency, _ in results], elapsed),
+        "latency_ponder_hits": summarize(hits) if hits else None,
+        "latency_other": summarize(others) if others else None,
+        "saving_per_hit_ms": round((statistics.median(others) - statistics.median(hits)) * 1000, 1)
+        if hits and others else None,
+        "ponder": dict(delta, hit_rate=round(delta["hits"] / lookups, 4) if lookups else 0.0,
+                       saved_ms=round(after["saved_ms"] - before["saved_ms"], 1)),
+        "max_rss_mb": memory_usage(),
+    }
+    return result, [latency for latency, _ in results], hits
+
+
+def print_summary(result, samples, hits):
+    report(f"top_k={result['top_k']}: {result['ai_moves']} ruchów AI", samples)
+    if hits:
+        report(f"top_k={result['top_k']}: trafienia przewidywania", hits)
+    ponder = result["ponder"]
+    if result["top_k"]:
+        print(f"{'':40s} trafienia: {ponder['hits']}/{ponder['hits'] + ponder['late'] + ponder['misses']} "
+              f"({ponder['hit_rate']:.1%}), jeszcze liczone: {ponder['late']}, "
+              f"oszczędność na trafieniu: {result['saving_per_hit_ms']} ms, "
+              f"czas liczenia w tle: {ponder['saved_ms'] / 1000:.1f} s")
+        print(f"{'':40s} pozycje: policzone {ponder['computed']}, anulowane {ponder['cancelled']}, "
+              f"pominięte {ponder['skipped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pomiar przewidywania odpowiedzi gracza (ponder)")
+    parser.add_argument("--games", type=int, default=16, help="Liczba gier naraz")
+    parser.add_argument("--top-k", type=int, default=3, help="Liczba przewidywanych odpowiedzi gracza")
+    parser.add_argument("--human", choices=PLAYER_KINDS, default="greedy", help="Strategia gracza (krzyżyk)")
+    parser.add_argument("--think-ms", type=float, default=1500.0, help="Czas namysłu gracza przed ruchem")
+    parser.add_argument("--latency-ms", type=float, default=1000.0, help="Opóźnienie odpowiedzi modelu")
+    parser.add_argument("--max-moves", type=int, default=15, help="Maksymalna liczba ruchów gracza w grze")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    stub, url = start_stub_server(StubConfig(latency_ms=args.latency_ms, seed=args.seed))
+    ai_client.API_URL = url
+    game, base_url = start_app(app)
+    results = {}
+    try:
+        for top_k in (0, args.top_k):
+            result, samples, hits = run(top_k, base_url, args.games, args.human, args.think_ms, args.max_moves,
+                                        args.seed)
+            print_summary(result, samples, hits)
+            results[f"top_k_{top_k}"] = result
+    finally:
+        game.shutdown()
+        stub.shutdown()
+        ai_client.close_clients()
+    if args.output:
+        save_results(args.output, {"ponder": results, "stub_latency_ms": args.latency_ms})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Rozmiar promptu: pierwotny format (plansza słowami, lista wolnych pól, pełne
+instrukcje) kontra zwięzły zapis z prompts.py, w tokenach liczonych tak jak
+w ai_client (komunikat systemowy + prompt).
+
+Przed pomiarem sprawdzane jest, że analiza zagrożeń do promptu (analyse_board,
+z cache pozycji) we wszystkich 8 orientacjach każdej pozycji - liczona i odczytana
+z cache - jest taka sama jak find_threats na tej planszy.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_prompt [liczba_pozycji]
+"""
+
+import statistics
+import sys
+
+from ai_client import SYSTEM_PROMPT
+from board import BOARD_CHARS, Board, find_threats, get_symmetries
+from benchmarks.reference import SYSTEM_PROMPT_REFERENCE, build_prompt_reference
+from benchmarks.selfplay import sample_positions
+from prompts import build_prompt
+from server import PROMPT_TOP_THREATS, analyse_board, enhance_prompt_with_strategy, parse_board_from_prompt
+from tokens import EXACT, count_message_tokens
+
+
+def message_tokens(system, prompt):
+    return count_message_tokens([{"role": "system", "content": system}, {"role": "user", "content": prompt}])
+
+
+def check_analysis(positions):
+    """Analiza z analyse_board (liczona i z cache) w każdej orientacji pozycji = find_threats na tej planszy."""
+    for text in positions:
+        board = Board.from_string(text)
+        for _, _, getter in get_symmetries(board.size):
+            variant = Board.from_string("".join(BOARD_CHARS[code] for code in getter(board.cells)))
+            expected = (find_threats(variant, "krzyżyk")[:PROMPT_TOP_THREATS],
+                        find_threats(variant, "kółko")[:PROMPT_TOP_THREATS])
+            for _ in range(2):
+                if tuple(analyse_board(variant)) != expected:
+                    raise AssertionError(f"Analiza z cache różni się od find_threats: {variant.to_string()}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    positions = sample_positions(count, seed=7)
+    check_analysis(positions)
+    print("Zgodność analizy z find_threats (8 orientacji, z cache i bez): OK")
+    old, new = [], []
+    for text in positions:
+        board = Board.from_string(text)
+        threats, opportunities = analyse_board(board)
+        old.append(message_tokens(SYSTEM_PROMPT_REFERENCE,
+                                  build_prompt_reference("Twój ruch!", board, threats, opportunities)))
+        prompt = build_prompt("Twój ruch!", board)
+        assert parse_board_from_prompt(prompt).to_string() == text
+        new.append(message_tokens(SYSTEM_PROMPT, enhance_prompt_with_strategy(prompt, board)))
+
+    print(f"Licznik tokenów: {'tiktoken' if EXACT else 'lokalny (przybliżony)'}, {len(positions)} pozycji")
+    for name, values in (("pierwotny prompt", old), ("zwięzły prompt", new)):
+        print(f"{name:20s} średnio {statistics.mean(values):7.1f} tokenów, "
+              f"min {min(values):5d}, max {max(values):5d}")
+    print(f"Oszczędność: {1 - statistics.mean(new) / statistics.mean(old):.1%} tokenów wejściowych na zapytanie")
+
+
+if __name__ == "__main__":
+    main()
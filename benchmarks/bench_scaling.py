@@ -0,0 +1,215 @@
+"""
+Skalowanie analizy planszy z rozmiarem planszy (10/15/19/25) przy tej samej liczbie znaków.
+
+Dla każdego rozmiaru i liczby znaków (--stones) powstają pozycje z losowych
+partii (znaki stawiane w pobliżu istniejących, jak gracz "random"
+z benchmarks.selfplay). Mierzone są na pozycję:
+
+- decode - Board.from_string z napisu .XO (jak dane zapytania),
+- threats - find_threats obu graczy na świeżo zdekodowanej planszy (zimna analiza),
+- incremental - ruch, zagrożenia i pola wygrywające obu graczy, cofnięcie ruchu
+  (typowy krok silnika i sesji),
+- reference - pierwotne skanowanie pole po polu (tylko dla 5 w rzędzie),
+- engine - przeszukiwanie silnika na stałą głębokość (--depth) w pozycjach
+  bez wygranej w jednym ruchu (inaczej silnik zwraca ruch wymuszony bez szukania).
+
+Przed pomiarem sprawdzana jest zgodność: wyniki z referencją (5 w rzędzie)
+oraz zagrożenia po apply/undo z pełnym przeliczeniem planszy.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_scaling --sizes 10,15,19,25 --stones 20,60 --win-length 5 \\
+        --output wyniki/scaling.json
+"""
+
+import argparse
+import random
+import timeit
+
+from board import EMPTY, KOLKO, KRZYZYK, WIN_LENGTH, Board, find_threats
+from benchmarks.common import save_results
+from benchmarks.reference import find_threats_reference
+from engine import TranspositionTable, find_best_move
+
+PLAYERS = ("krzyżyk", "kółko")
+ENGINE_POSITIONS = 20
+QUIET_ATTEMPTS = 200
+
+
+def random_position(rng, size, stones, win_length, quiet=False, attempts=None):
+    """
+    Pozycja z zadaną liczbą znaków (na przemian X i O) z losowej partii w pobliżu środka.
+
+    Pola kończące partię są pomijane; z quiet=True także pola, po których któryś
+    gracz wygrywa w jednym ruchu (przy małym k losowe partie szybko by się kończyły).
+    Po attempts nieudanych partiach zwraca None.
+    """
+    while attempts is None or attempts > 0:
+        if attempts is not None:
+            attempts -= 1
+        board = Board(size, win_length)
+        board.apply(size // 2, size // 2, KRZYZYK)
+        while len(board.moves) < stones:
+            # Kolejny znak w pobliżu losowego z dotychczasowych
+            anchor = rng.choice(board.moves)
+            row, col = divmod(anchor, size)
+            near = [r * size + c
+                    for r in range(max(0, row - 2), min(size, row + 3))
+                    for c in range(max(0, col - 2), min(size, col + 3))
+                    if board.cells[r * size + c] == EMPTY]
+            rng.shuffle(near)
+            code = KOLKO if len(board.moves) % 2 else KRZYZYK
+            for idx in near:
+                board.apply(idx // size, idx % size, code)
+                if not board.is_win_at(idx // size, idx % size) and not (
+                        quiet and (board.winning_moves(KRZYZYK) or board.winning_moves(KOLKO))):
+                    break
+                board.undo()
+            else:
+                # Brak dobrego pola przy tym znaku - po kilku nieudanych próbach partia zaczyna się od nowa
+                if rng.random() < 0.05:
+                    break
+        else:
+            return board.to_string()
+    return None
+
+
+def quiet_position(rng, size, stones, win_length):
+    """Pozycja jak random_position, w której żaden gracz nie wygrywa w jednym ruchu, albo None (np. 60 znaków przy k = 4)."""
+    return random_position(rng, size, stones, win_length, quiet=True, attempts=QUIET_ATTEMPTS)
+
+
+def check_consistency(rng, texts, size, win_length):
+    for text in texts:
+        board = Board.from_string(text, win_length)
+        if win_length == WIN_LENGTH:
+            rows = board.to_rows()
+            for player in PLAYERS:
+                if find_threats(board, player) != find_threats_reference(rows, player):
+                    raise AssertionError(f"Niezgodne zagrożenia z referencją ({size}x{size})")
+        # Ruch i cofnięcie nie mogą zmienić wyniku względem pełnego przeliczenia
+        empties = [i for i, v in enumerate(board.cells) if v == EMPTY]
+        for idx in rng.sample(empties, min(5, len(empties))):
+            board.apply(idx // size, idx % size, KRZYZYK)
+            fresh = Board.from_string(board.to_string(), win_length)
+            for player in PLAYERS:
+                if (board.threats(player) != fresh.threats(player)
+                        or board.winning_moves(player) != fresh.winning_moves(player)):
+                    raise AssertionError(f"Niezgodne zagrożenia po apply ({size}x{size})")
+            if board.scores != fresh.scores or board.winner() != fresh.winner():
+                raise AssertionError(f"Niezgodna ocena po apply ({size}x{size})")
+            board.undo()
+
+
+def measure(fn, count):
+    """Najlepszy z 5 pomiarów w µs na pozycję."""
+    return round(min(timeit.repeat(fn, number=1, repeat=5)) * 1e6 / count, 1)
+
+
+def run_size(size, stones, win_length=WIN_LENGTH, positions=200, depth=2, seed=0):
+    rng = random.Random(seed * 1000 + size * 100 + stones)
+    texts = [random_position(rng, size, stones, win_length) for _ in range(positions)]
+    check_consistency(rng, texts[:50], size, win_length)
+
+    boards = [Board.from_string(text, win_length) for text in texts]
+    moves = [next(i for i in range(size * size) if board.cells[i] == EMPTY) for board in boards]
+
+    def decode():
+        for text in texts:
+            Board.from_string(text, win_length)
+
+    def threats():
+        for text in texts:
+            board = Board.from_string(text, win_length)
+            find_threats(board, "krzyżyk")
+            find_threats(board, "kółko")
+
+    def incremental():
+        for board, idx in zip(boards, moves):
+            board.apply(idx // size, idx % size, "kółko")
+            find_threats(board, "krzyżyk")
+            find_threats(board, "kółko")
+            board.winning_moves(KRZYZYK)
+            board.winning_moves(KOLKO)
+            board.undo()
+
+    result = {
+        "size": size,
+        "stones": stones,
+        "win_length": win_length,
+        "decode_us": measure(decode, len(texts)),
+        "threats_us": measure(threats, len(texts)),
+        "incremental_us": measure(incremental, len(texts)),
+    }
+    if win_length == WIN_LENGTH:
+        rows = [board.to_rows() for board in boards]
+
+        def reference():
+            for board_rows in rows:
+                find_threats_reference(board_rows, "krzyżyk")
+                find_threats_reference(board_rows, "kółko")
+
+        result["reference_us"] = measure(reference, len(texts))
+
+    # Silnik: stała głębokość, więc czas zależy od kosztu węzła, a nie od limitu czasu
+    nodes = elapsed = 0
+    quiet = [quiet_position(rng, size, stones, win_length) for _ in range(ENGINE_POSITIONS)]
+    if None in quiet:
+        # Nie da się ułożyć tylu znaków bez wygranej w jednym ruchu - silnik nie jest mierzony
+        result["engine_ms"] = result["engine_nodes_per_s"] = None
+        return result
+    for text in quiet:
+        found = find_best_move(Board.from_string(text, win_length), "kółko", time_limit_ms=60000,
+                               max_depth=depth, table=TranspositionTable(1 << 12))
+        nodes += found.nodes
+        elapsed += found.elapsed_ms
+    result["engine_ms"] = round(elapsed / len(quiet), 2)
+    result["engine_nodes_per_s"] = round(nodes / elapsed * 1000) if elapsed else 0
+    return result
+
+
+def print_summary(results):
+    print(f"{'plansza':>8s} {'znaki':>6s} {'decode':>9s} {'threats':>9s} {'increm.':>9s} "
+          f"{'referencja':>11s} {'silnik':>9s} {'węzły/s':>8s}")
+    for r in results:
+        reference = f"{r['reference_us']:9.1f}µs" if "reference_us" in r else f"{'-':>11s}"
+        engine = (f"{r['engine_ms']:7.2f}ms {r['engine_nodes_per_s']:>8d}" if r["engine_ms"] is not None
+                  else f"{'-':>9s} {'-':>8s}")
+        print(f"{r['size']:>5d}x{r['size']:<2d} {r['stones']:>6d} {r['decode_us']:7.1f}µs {r['threats_us']:7.1f}µs "
+              f"{r['incremental_us']:7.1f}µs {reference} {engine}")
+    # Wzrost kosztu od najmniejszej do największej planszy przy tej samej liczbie znaków
+    for stones in sorted({r["stones"] for r in results}):
+        rows = [r for r in results if r["stones"] == stones]
+        small, large = rows[0], rows[-1]
+        if small is large:
+            continue
+        growth = ", ".join(f"{key[:-3]} {large[key] / small[key]:.2f}x"
+                           for key in ("decode_us", "threats_us", "incremental_us", "reference_us", "engine_ms")
+                           if small.get(key) and large.get(key))
+        print(f"{stones} znaków, {small['size']}x{small['size']} -> {large['size']}x{large['size']} "
+              f"(pola x{(large['size'] / small['size']) ** 2:.1f}): {growth}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skalowanie analizy planszy z rozmiarem planszy")
+    parser.add_argument("--sizes", default="10,15,19,25", help="Rozmiary planszy, np. 10,15,19,25")
+    parser.add_argument("--stones", default="20,60", help="Liczby znaków na planszy, np. 20,60")
+    parser.add_argument("--win-length", type=int, default=WIN_LENGTH, help="Liczba znaków w rzędzie do wygranej")
+    parser.add_argument("--positions", type=int, default=200, help="Liczba pozycji na rozmiar")
+    parser.add_argument("--depth", type=int, default=2, help="Głębokość przeszukiwania silnika")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    results = []
+    for stones in (int(value) for value in args.stones.split(",")):
+        for size in (int(value) for value in args.sizes.split(",")):
+            results.append(run_size(size, stones, args.win_length, args.positions, args.depth, args.seed))
+    print(f"Zgodność wyników: OK (k={args.win_length})")
+    print_summary(results)
+    if args.output:
+        save_results(args.output, {"scaling": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark strumieniowania komentarza AI (SSE) na lokalnym serwerze udającym API.
+
+Porównuje endpoint blokujący /get-ai-commentary ze strumieniowym
+/get-ai-commentary-stream (także w trybie engine_first):
+- czas do pierwszego fragmentu komentarza (TTFT),
+- czas do poznania ruchu AI,
+- czas całej odpowiedzi.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_stream
+"""
+
+import contextlib
+import io
+import json
+import os
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # Bez wpisu w logu na każde zapytanie
+
+import httpx
+
+import ai_client
+from benchmarks.common import report, start_app
+from benchmarks.stub_llm import StubConfig, start_stub_server
+from cache import position_cache
+from server import app
+
+BOARD = "." * 44 + "X" + "." * 10 + "O" + "." * 44
+
+
+def timed_blocking(client, base_url):
+    start = time.perf_counter()
+    response = client.post(f"{base_url}/get-ai-commentary", json={"prompt": "Twój ruch!", "board": BOARD})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    # W wersji blokującej komentarz i ruch przychodzą razem z całą odpowiedzią
+    return elapsed, elapsed, elapsed
+
+
+def timed_stream(client, base_url, engine_first=False):
+    start = time.perf_counter()
+    first_token = move = None
+    payload = {"prompt": "Twój ruch!", "board": BOARD, "engine_first": engine_first}
+    with client.stream("POST", f"{base_url}/get-ai-commentary-stream", json=payload) as response:
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                now = time.perf_counter() - start
+                if event == "token" and first_token is None and json.loads(line[len("data:"):])["text"].strip():
+                    first_token = now
+                elif event == "move" and move is None:
+                    move = now
+                elif event == "error":
+                    raise RuntimeError(line)
+    return first_token, move, time.perf_counter() - start
+
+
+def run(name, fn, count):
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            # Cache odpowiedzi zafałszowałby pomiar - każde zapytanie idzie do "modelu"
+            position_cache.store.clear()
+            samples.append(fn())
+    for label, values in zip(("pierwszy token", "ruch", "całość"), zip(*samples)):
+        report(f"{name}: {label}", values)
+
+
+def main(count=30):
+    # 400ms do pierwszego tokenu, potem ~25 tokenów po 30ms - ruch jest na końcu odpowiedzi
+    stub, url = start_stub_server(StubConfig(latency_ms=400, token_ms=30, seed=3))
+    ai_client.API_URL = url
+    game, base_url = start_app(app)
+    try:
+        with httpx.Client(timeout=30) as client:
+            run("blokujący", lambda: timed_blocking(client, base_url), count)
+            run("SSE", lambda: timed_stream(client, base_url), count)
+            run("SSE engine_first", lambda: timed_stream(client, base_url, engine_first=True), count)
+    finally:
+        game.shutdown()
+        stub.shutdown()
+        ai_client.close_clients()
+
+
+if __name__ == "__main__":
+    main()
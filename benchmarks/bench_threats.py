@@ -0,0 +1,103 @@
+"""
+Mikrobenchmark find_threats: pierwotne skanowanie pole po polu kontra bitboardy.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.bench_threats [liczba_pozycji]
+
+Przed pomiarem sprawdzana jest zgodność wyników obu implementacji.
+"""
+
+import random
+import sys
+import timeit
+
+from board import BOARD_SIZE, Board, find_threats
+from benchmarks.reference import find_threats_reference
+
+PLAYERS = ("krzyżyk", "kółko")
+
+
+def random_rows(rng, stones, size=BOARD_SIZE):
+    """Losowa pozycja z zadaną liczbą znaków (na przemian X i O)."""
+    rows = [[None] * size for _ in range(size)]
+    cells = rng.sample(range(size * size), stones)
+    for i, idx in enumerate(cells):
+        rows[idx // size][idx % size] = PLAYERS[i % 2]
+    return rows
+
+
+def check_equivalence(positions):
+    for rows in positions:
+        board = Board.from_rows(rows)
+        for player in PLAYERS:
+            expected = find_threats_reference(rows, player)
+            if find_threats(rows, player) != expected or find_threats(board, player) != expected:
+                raise AssertionError(f"Niezgodne wyniki find_threats dla pozycji {rows}")
+
+
+def check_incremental(rng, games=200):
+    """Sprawdza, że zagrożenia po apply/undo zgadzają się z pełnym skanem."""
+    for _ in range(games):
+        board = Board()
+        order = rng.sample(range(BOARD_SIZE * BOARD_SIZE), rng.randint(5, 60))
+        for i, idx in enumerate(order):
+            board.apply(idx // BOARD_SIZE, idx % BOARD_SIZE, PLAYERS[i % 2])
+            rows = board.to_rows()
+            for player in PLAYERS:
+                if find_threats(board, player) != find_threats_reference(rows, player):
+                    raise AssertionError("Niezgodne zagrożenia po apply")
+        for _ in range(rng.randint(1, len(order))):
+            board.undo()
+        rows = board.to_rows()
+        for player in PLAYERS:
+            if find_threats(board, player) != find_threats_reference(rows, player):
+                raise AssertionError("Niezgodne zagrożenia po undo")
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    rng = random.Random(1234)
+    positions = [random_rows(rng, rng.randint(4, 50)) for _ in range(count)]
+
+    check_equivalence(positions)
+    check_incremental(rng)
+    print(f"Zgodność wyników: OK ({count} pozycji, apply/undo)")
+
+    def run_reference():
+        for rows in positions:
+            find_threats_reference(rows, "krzyżyk")
+            find_threats_reference(rows, "kółko")
+
+    def run_rows():
+        for rows in positions:
+            board = Board.from_rows(rows)
+            find_threats(board, "krzyżyk")
+            find_threats(board, "kółko")
+
+    boards = [Board.from_rows(rows) for rows in positions]
+
+    def run_incremental():
+        # Typowy przypadek w grze: jeden ruch, analiza, cofnięcie ruchu
+        for board in boards:
+            idx = board.cells.find(0)
+            board.apply(idx // BOARD_SIZE, idx % BOARD_SIZE, "krzyżyk")
+            find_threats(board, "krzyżyk")
+            find_threats(board, "kółko")
+            board.undo()
+
+    results = {}
+    for name, fn in (("reference", run_reference), ("bitboard (z listy wierszy)", run_rows),
+                     ("bitboard (przyrostowo)", run_incremental)):
+        best = min(timeit.repeat(fn, number=1, repeat=5))
+        results[name] = best
+        print(f"{name:28s} {best * 1e6 / count:8.1f} µs/pozycja")
+
+    base = results["reference"]
+    for name, value in results.items():
+        if name != "reference":
+            print(f"Przyspieszenie {name}: {base / value:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,120 @@
+"""
+Wspólne narzędzia benchmarków: statystyki opóźnień, zużycie pamięci,
+uruchamianie serwera gry w wątku oraz zapis wyników do JSON.
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": ordered[-1]}
+
+
+def report(name, samples):
+    stats = percentiles(samples)
+    print(f"{name:40s} " + "  ".join(f"{key}={value * 1000:7.1f}ms" for key, value in stats.items()))
+
+
+def summarize(samples, elapsed=None):
+    """Statystyki próbek (w sekundach) w milisekundach; z elapsed także przepustowość."""
+    stats = {key: round(value * 1000, 3) for key, value in percentiles(samples).items()}
+    stats["mean"] = round(sum(samples) / len(samples) * 1000, 3)
+    stats["count"] = len(samples)
+    if elapsed:
+        stats["per_s"] = round(len(samples) / elapsed, 1)
+    return stats
+
+
+def memory_usage():
+    """Szczytowe zużycie pamięci procesu (RSS) w MB albo None, jeśli niedostępne."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje kilobajty, macOS bajty
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / scale, 1)
+
+
+def start_app(app):
+    """Uruchamia aplikację Flask w wątku w tle; zwraca (serwer, bazowy URL)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, name="game-server", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_asgi(app):
+    """Uruchamia aplikację ASGI (uvicorn) w wątku w tle; zwraca (serwer, wątek, bazowy URL)."""
+    import socket
+    import time
+
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    # Długi keep-alive: przy setkach gier naraz połączenie zamykane po 5 s bezczynności
+    # (domyślnie) może zostać zamknięte w chwili wysyłania kolejnego zapytania
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on",
+                                           timeout_keep_alive=75, backlog=4096))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, name="asgi-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def git_commit():
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def save_results(path, results):
+    """Zapisuje wyniki z metadanymi (commit, czas, wersja Pythona) do pliku JSON."""
+    document = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    print(f"Wyniki zapisane w {path}")
+    return document
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,183 @@
+"""
+Referencyjne (pierwotne) implementacje do porównań w benchmarkach:
+
+- find_threats skanujące planszę pole po polu - wynik szybkiej wersji
+  z board.py musi być z nim identyczny,
+- pierwotny format promptu (plansza słowami, lista wolnych pól, pełne
+  instrukcje i analiza) - do porównania liczby tokenów z prompts.py.
+"""
+
+
+# Funkcja do znajdowania zagrożeń na planszy
+def find_threats_reference(board, player):
+    threats = []
+    directions = [
+        {"name": "poziomo", "dr": 0, "dc": 1},
+        {"name": "pionowo", "dr": 1, "dc": 0},
+        {"name": "ukośnie ↗", "dr": -1, "dc": 1},
+        {"name": "ukośnie ↘", "dr": 1, "dc": 1}
+    ]
+    
+    board_size = len(board)
+    min_threat = 3  # Minimalna liczba znaków w rzędzie, aby uznać za zagrożenie
+    
+    # 1. Sprawdź sekwencje znaków w rzędzie
+    for row in range(board_size):
+        for col in range(board_size):
+            if board[row][col] == player:
+                for direction in directions:
+                    # Sprawdź sekwencję w tym kierunku
+                    count = 1
+                    r, c = row, col
+                    
+                    # Sprawdź w przód
+                    for i in range(1, 5):  # Sprawdź do 5 kroków w przód
+                        r += direction["dr"]
+                        c += direction["dc"]
+                        if 0 <= r < board_size and 0 <= c < board_size and board[r][c] == player:
+                            count += 1
+                        else:
+                            break
+                    
+                    # Jeśli znaleziono wystarczająco dużo znaków, sprawdź czy jest otwarte miejsce do kontynuacji
+                    if count >= min_threat:
+                        # Sprawdź miejsce do blokady
+                        block_row = r
+                        block_col = c
+                        
+                        if 0 <= block_row < board_size and 0 <= block_col < board_size and board[block_row][block_col] is None:
+                            threats.append({
+                                "count": count,
+                                "direction": direction["name"],
+                                "start_row": row,
+                                "start_col": col,
+                                "block_row": block_row,
+                                "block_col": block_col,
+                                "type": "sequence"
+                            })
+                        
+                        # Sprawdź przeciwny koniec linii
+                        block_row = row - direction["dr"]
+                        block_col = col - direction["dc"]
+                        
+                        if 0 <= block_row < board_size and 0 <= block_col < board_size and board[block_row][block_col] is None:
+                            threats.append({
+                                "count": count,
+                                "direction": direction["name"],
+                                "start_row": row,
+                                "start_col": col,
+                                "block_row": block_row,
+                                "block_col": block_col,
+                                "type": "sequence"
+                            })
+    
+    # 2. Sprawdź wzorce z przerwami (X_XX lub XX_X)
+    for row in range(board_size):
+        for col in range(board_size):
+            if board[row][col] is None:  # Sprawdź tylko puste pola jako potencjalne przerwy
+                for direction in directions:
+                    # Sprawdź wzorzec X_XX (gdzie _ to aktualna pozycja)
+                    prev_r = row - direction["dr"]
+                    prev_c = col - direction["dc"]
+                    next1_r = row + direction["dr"]
+                    next1_c = col + direction["dc"]
+                    next2_r = row + direction["dr"] * 2
+                    next2_c = col + direction["dc"] * 2
+                    
+                    # Sprawdź, czy mamy X przed przerwą i XX po przerwie
+                    if (0 <= prev_r < board_size and 0 <= prev_c < board_size and board[prev_r][prev_c] == player and
+                        0 <= next1_r < board_size and 0 <= next1_c < board_size and board[next1_r][next1_c] == player and
+                        0 <= next2_r < board_size and 0 <= next2_c < board_size and board[next2_r][next2_c] == player):
+                        
+                        threats.append({
+                            "count": 3,  # 3 znaki z przerwą
+                            "direction": direction["name"],
+                            "start_row": prev_r,
+                            "start_col": prev_c,
+                            "block_row": row,
+                            "block_col": col,
+                            "type": "gap_pattern",
+                            "pattern": "X_XX"
+                        })
+                    
+                    # Sprawdź wzorzec XX_X (gdzie _ to aktualna pozycja)
+                    prev2_r = row - direction["dr"] * 2
+                    prev2_c = col - direction["dc"] * 2
+                    
+                    # Sprawdź, czy mamy XX przed przerwą i X po przerwie
+                    if (0 <= prev2_r < board_size and 0 <= prev2_c < board_size and board[prev2_r][prev2_c] == player and
+                        0 <= prev_r < board_size and 0 <= prev_c < board_size and board[prev_r][prev_c] == player and
+                        0 <= next1_r < board_size and 0 <= next1_c < board_size and board[next1_r][next1_c] == player):
+                        
+                        threats.append({
+                            "count": 3,  # 3 znaki z przerwą
+                            "direction": direction["name"],
+                            "start_row": prev2_r,
+                            "start_col": prev2_c,
+                            "block_row": row,
+                            "block_col": col,
+                            "type": "gap_pattern",
+                            "pattern": "XX_X"
+                        })
+    
+    # Sortuj zagrożenia - większa liczba znaków to większe zagrożenie
+    threats.sort(key=lambda x: (x["count"], 0 if x["type"] == "sequence" else -1), reverse=True)
+    
+    return threats
+
+
+SYSTEM_PROMPT_REFERENCE = "Jesteś kółkiem (O) w grze w kółko i krzyżyk 10x10. Mówisz w pierwszej osobie jako przeciwnik gracza X. Twoje komentarze mają być zabawne, wulgarne i obraźliwe wobec gracza X (Twojego przeciwnika). Zawsze komentuj aktualny stan gry i obrażaj swojego przeciwnika.\n\nSTYL KOMENTARZY:\n1. Twoje komentarze powinny być wulgarne, zabawne i obraźliwe do przeciwnika.\n2. w swoich odpowiedziach możesz nawiązywac czasem do polskich polityków i polskiej sceny politycznej! Używaj nazwisk takich jak: Kaczyński, Tusk, Morawiecki, Hołownia, Mentzen, Czarnek, Bodnar, Trzaskowski, itp.\n3. Twórz porównania i metafory związane z polską polityką. Odnosź się konkretnie do aktualnych wydarzeń politycznych w Polsce, partii (PiS, PO, Konfederacja, Lewica), reform i kontrowersji.\n5. Twoje obelgi powinny zawierać polityczne porównania, np. \"Jesteś tak beznadziejny jak debata w Sejmie o aborcji\".\n\nSTRATEGIA:\n1. PRIORYTET: Jeśli w promptcie jest podane \"KRYTYCZNE ZAGROŻENIE\" lub \"MUSISZ zablokować\" - bezwzględnie wykonaj ten ruch!\n2. Zawsze PRIORYTETOWO szukaj ruchów wygrywających w jednym ruchu.\n3. Jeśli przeciwnik ma 4 znaki w rzędzie i może wygrać, MUSISZ go zablokować.\n4. Jeśli przeciwnik ma 3 znaki w rzędzie i dwa otwarte końce, MUSISZ zablokować jeden z końców.\n5. Jeśli przeciwnik ma wzorzec X_XX lub XX_X (gdzie _ to puste pole), MUSISZ zablokować pozycję _.\n6. Staraj się tworzyć swoje własne linie w pierwszej kolejności.\n7. Blokuj potencjalne strategie przeciwnika.\n8. Nie zapomnij o przekątnych i stwórz zagrożenia w wielu kierunkach.\n\nGdy zauważysz krytyczne zagrożenie, twój komentarz powinien odnosić się do blokowania tego zagrożenia (np. \"Ha! Próbujesz mnie wykiwać z 3 krzyżykami w rzędzie jak Morawiecki próbował wykiwać UE? Nie tym razem!\").\n\nNa końcu każdej odpowiedzi MUSISZ podać swój ruch w formacie: 'RUCH:[wiersz],[kolumna]', np. 'RUCH:3,4'. Jeśli nie możesz wykonać ruchu, napisz 'RUCH:BRAK'."
+
+MOVE_INSTRUCTIONS_REFERENCE = (
+    "\n\nPodaj swój ruch w formacie RUCH:[wiersz],[kolumna], np. RUCH:1,2"
+    "\nPamiętaj, że mówisz jako kółko (KÓŁKO) i obrażasz swojego przeciwnika (KRZYŻYK). Twój komentarz ma być zabawny, wulgarny i obraźliwy wobec gracza KRZYŻYK."
+    "\nPAMIĘTAJ: Nawiąż w swoim komentarzu do polskich polityków i aktualnych wydarzeń politycznych w Polsce! Twórz porównania z politykami i partiami."
+)
+
+
+def build_prompt_reference(intro, board, threats, opportunities):
+    """Pierwotny prompt: plansza "Stan planszy", dostępne ruchy, instrukcje i analiza strategiczna."""
+    symbols = (".", "krzyżyk", "kółko", "?")
+    size = board.size
+    cells = board.cells
+    lines = ["Stan planszy (KRZYŻYK - przeciwnik, KÓŁKO - Ty (kółko), . - puste pole):",
+             "  " + " ".join(str(col) for col in range(size))]
+    available = []
+    for row in range(size):
+        base = row * size
+        lines.append(f"{row} " + " ".join(symbols[code] for code in cells[base:base + size]))
+        available.extend(f"{row},{col}" for col in range(size) if not cells[base + col])
+    lines.append("")
+    lines.append("Dostępne ruchy (wiersz,kolumna):")
+    lines.append(" | ".join(available))
+    board_text = "\n".join(lines)
+    prompt = f"{intro} {board_text}{MOVE_INSTRUCTIONS_REFERENCE}"
+
+    strategy_info = "\n\nANALIZA STRATEGICZNA:"
+    
+    if threats:
+        strategy_info += "\nZAGROŻENIA (wymagają blokady):"
+        for threat in threats[:3]:  # Ogranicz do top 3 zagrożeń
+            if threat["type"] == "sequence":
+                strategy_info += f"\n- PRIORYTET! Przeciwnik ma {threat['count']} znaków w rzędzie w kierunku {threat['direction']} zaczynając od ({threat['start_row']},{threat['start_col']}). MUSISZ zablokować ruch na ({threat['block_row']},{threat['block_col']})."
+            else:  # gap_pattern
+                strategy_info += f"\n- NIEBEZPIECZEŃSTWO! Przeciwnik ma wzorzec {threat['pattern']} w kierunku {threat['direction']} zaczynając od ({threat['start_row']},{threat['start_col']}). MUSISZ zablokować lukę na ({threat['block_row']},{threat['block_col']})."
+    
+    if opportunities:
+        strategy_info += "\nMOŻLIWOŚCI (rozważ te ruchy):"
+        for opp in opportunities[:3]:  # Ogranicz do top 3 możliwości
+            if opp["type"] == "sequence":
+                strategy_info += f"\n- Masz {opp['count']} znaków w rzędzie w kierunku {opp['direction']} zaczynając od ({opp['start_row']},{opp['start_col']}). Rozważ kontynuowanie na ({opp['block_row']},{opp['block_col']})."
+            else:  # gap_pattern
+                strategy_info += f"\n- Masz wzorzec {opp['pattern']} w kierunku {opp['direction']}. Możesz uzupełnić lukę na ({opp['block_row']},{opp['block_col']})."
+    
+    # Dodaj ogólną poradę z naciskiem na blokowanie zagrożeń
+    strategy_info += "\nOGÓLNA STRATEGIA: NAJPIERW zablokuj wszelkie zagrożenia przeciwnika, POTEM twórz własne linie. Szukaj ruchów, które tworzą wiele zagrożeń jednocześnie."
+    
+    # Jeśli istnieje krytyczne zagrożenie (3+ w rzędzie), dodaj mocne ostrzeżenie
+    critical_threats = [t for t in threats if t["count"] >= 3]
+    if critical_threats:
+        strategy_info += "\n\nUWAGA! KRYTYCZNE ZAGROŻENIE WYKRYTE! MUSISZ natychmiast zablokować pozycję na współrzędnych " + \
+                        f"({critical_threats[0]['block_row']},{critical_threats[0]['block_col']}), " + \
+                        "inaczej przegrasz w następnym ruchu!"
+    return prompt + strategy_info
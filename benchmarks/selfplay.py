@@ -0,0 +1,185 @@
+"""
+Bezgłowe rozgrywki (self-play) do pomiaru logiki zagrożeń serwera.
+
+Gracz "greedy" korzysta z tej samej analizy co serwer (find_threats):
+wygrywa, gdy może, blokuje wygraną przeciwnika, a poza tym gra w pola
+blokady/kontynuacji najgroźniejszych linii. Gracz "random" stawia znak
+losowo w pobliżu istniejących znaków.
+
+W każdej pozycji mierzone są:
+- find_threats dla obu graczy na planszy zdekodowanej z danych zapytania,
+- enhance_prompt_with_strategy bez cache (zimna analiza) i z cache.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.selfplay --games 2000 --output wyniki/selfplay.json
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ["AI_CACHE_DB"] = ""  # Pomiary tylko na cache w pamięci
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # Bez wpisu w logu na każde zapytanie
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+from board import BOARD_SIZE, EMPTY, KOLKO, KRZYZYK, PLAYER_NAMES, Board, find_threats
+from benchmarks.common import memory_usage, report, save_results, summarize
+from prompts import build_prompt
+from server import enhance_prompt_with_strategy, position_cache
+
+PLAYER_KINDS = ("greedy", "random")
+
+
+def random_player(board, code, rng):
+    candidates = _near_stones(board) or [i for i, v in enumerate(board.cells) if v == EMPTY]
+    return rng.choice(candidates)
+
+
+def greedy_player(board, code, rng):
+    other = KRZYZYK if code == KOLKO else KOLKO
+    wins = board.winning_moves(code)
+    if wins:
+        return wins[0]
+    blocks = board.winning_moves(other)
+    if blocks:
+        return blocks[0]
+    # Najdłuższa linia (własna albo przeciwnika) wyznacza ruch - własne wygrywają remisy
+    best = None
+    for threat in find_threats(board, PLAYER_NAMES[code]) + find_threats(board, PLAYER_NAMES[other]):
+        if best is None or threat["count"] > best["count"]:
+            best = threat
+    if best is not None:
+        return best["block_row"] * board.size + best["block_col"]
+    return random_player(board, code, rng)
+
+
+PLAYERS = {"greedy": greedy_player, "random": random_player}
+
+
+def _near_stones(board):
+    size = board.size
+    cells = board.cells
+    found = []
+    for idx, value in enumerate(cells):
+        if value != EMPTY:
+            continue
+        row, col = divmod(idx, size)
+        for r in range(max(0, row - 1), min(size, row + 2)):
+            if any(cells[r * size + max(0, col - 1):r * size + min(size, col + 2)]):
+                found.append(idx)
+                break
+    return found
+
+
+def play_game(rng, crosses="random", noughts="greedy", size=BOARD_SIZE, on_position=None):
+    """
+    Rozgrywa jedną partię; zwraca (zwycięzca albo None, liczba ruchów).
+
+    on_position(board) jest wołane przed każdym ruchem kółka - tak jak serwer
+    dostaje pozycję, w której ruch należy do AI.
+    """
+    board = Board(size)
+    strategies = {KRZYZYK: PLAYERS[crosses], KOLKO: PLAYERS[noughts]}
+    code = KRZYZYK
+    # Pierwszy ruch losowy w środkowej części planszy, żeby partie się różniły
+    first = rng.randrange(size // 4, size - size // 4) * size + rng.randrange(size // 4, size - size // 4)
+    idx = first
+    while True:
+        if idx is None:
+            if code == KOLKO and on_position is not None:
+                on_position(board)
+            idx = strategies[code](board, code, rng)
+        row, col = divmod(idx, size)
+        board.apply(row, col, code)
+        if board.is_win_at(row, col):
+            return code, len(board.moves)
+        if board.is_full():
+            return None, len(board.moves)
+        code = KRZYZYK if code == KOLKO else KOLKO
+        idx = None
+
+
+def sample_positions(count, seed=0, crosses="random", noughts="greedy"):
+    """Zbiera pozycje z ruchem kółka (jako napisy .XO) z kolejnych partii."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        play_game(rng, crosses, noughts, on_position=lambda board: positions.append(board.to_string()))
+    return positions[:count]
+
+
+def run(games=1000, seed=0, crosses="random", noughts="greedy"):
+    rng = random.Random(seed)
+    threat_samples = []
+    cold_samples = []
+    warm_samples = []
+    results = {"krzyżyk": 0, "kółko": 0, "remis": 0}
+    moves = 0
+
+    def measure(board):
+        payload = board.to_string()
+        start = time.perf_counter()
+        decoded = Board.from_string(payload)
+        find_threats(decoded, "krzyżyk")
+        find_threats(decoded, "kółko")
+        threat_samples.append(time.perf_counter() - start)
+
+        prompt = build_prompt("Twój ruch!", decoded)
+        position_cache.store.clear()
+        start = time.perf_counter()
+        enhance_prompt_with_strategy(prompt, Board.from_string(payload))
+        cold_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        enhance_prompt_with_strategy(prompt, Board.from_string(payload))
+        warm_samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    for _ in range(games):
+        winner, length = play_game(rng, crosses, noughts, on_position=measure)
+        results[PLAYER_NAMES[winner] if winner else "remis"] += 1
+        moves += length
+    elapsed = time.perf_counter() - started
+
+    return {
+        "games": games,
+        "players": {"krzyżyk": crosses, "kółko": noughts},
+        "results": results,
+        "avg_moves": round(moves / games, 1),
+        "elapsed_s": round(elapsed, 2),
+        "games_per_s": round(games / elapsed, 1),
+        "find_threats": summarize(threat_samples, sum(threat_samples)),
+        "enhance_prompt_cold": summarize(cold_samples, sum(cold_samples)),
+        "enhance_prompt_cached": summarize(warm_samples, sum(warm_samples)),
+        "max_rss_mb": memory_usage(),
+    }, (threat_samples, cold_samples, warm_samples)
+
+
+def print_summary(result, samples):
+    print(f"Partie: {result['games']} ({result['games_per_s']}/s), średnio {result['avg_moves']} ruchów, "
+          f"wyniki: {result['results']}")
+    for name, values in zip(("find_threats (dekodowanie + 2 graczy)", "enhance_prompt (bez cache)",
+                             "enhance_prompt (z cache)"), samples):
+        report(name, values)
+        print(f"{'':40s} {len(values) / sum(values):,.0f} pozycji/s")
+    print(f"Szczytowa pamięć procesu: {result['max_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bezgłowe partie i pomiar analizy zagrożeń")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--crosses", choices=PLAYER_KINDS, default="random", help="Strategia krzyżyka")
+    parser.add_argument("--noughts", choices=PLAYER_KINDS, default="greedy", help="Strategia kółka")
+    parser.add_argument("--output", help="Plik JSON na wyniki")
+    args = parser.parse_args()
+
+    result, samples = run(args.games, args.seed, args.crosses, args.noughts)
+    print_summary(result, samples)
+    if args.output:
+        save_results(args.output, {"selfplay": result})
+
+
+if __name__ == "__main__":
+    main()
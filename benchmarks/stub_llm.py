@@ -0,0 +1,232 @@
+"""
+Lokalny serwer udający endpoint chat-completions OpenRouter.
+
+Pozwala mierzyć klienta AI i serwer gry bez prawdziwego modelu: opóźnienie
+odpowiedzi (stałe, losowy rozrzut i rzadkie "ogony") oraz kształt odpowiedzi
+są konfigurowalne. Poprawne odpowiedzi ("ok") zawierają ruch na wolne pole
+planszy opisanej w prompcie (jeśli jej nie ma - losowe pole).
+
+Zapytania z "stream": true dostają odpowiedź w formacie SSE (fragmenty
+"delta"), jak w prawdziwym API - pierwszy fragment po latency_ms, kolejne co
+token_ms. Pole "usage" (liczby tokenów) jest liczone lokalnym licznikiem
+z tokens.py - w strumieniu trafia do ostatniego fragmentu, gdy zapytanie
+zawiera "stream_options": {"include_usage": true}.
+
+Uruchomienie samodzielne:
+
+    python -m benchmarks.stub_llm --port 8900 --latency-ms 200 --slow-ratio 0.05 --slow-ms 3000
+
+Następnie w serwerze gry ustaw OPENROUTER_API_URL=http://127.0.0.1:8900/api/v1/chat/completions
+oraz dowolny OPENROUTER_API_KEY.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from board import EMPTY
+from prompts import parse_board_state
+from tokens import count_message_tokens, count_tokens
+
+# Kształty odpowiedzi: poprawny ruch, brak markera RUCH:, zniekształcony ruch,
+# odpowiedź w polu "response" oraz błąd HTTP 500
+REPLY_SHAPES = ("ok", "missing", "malformed", "alt", "error")
+
+COMMENTARY = "Grasz jak opozycja na posiedzeniu Sejmu - dużo hałasu, zero efektów!"
+
+
+class StubConfig:
+    def __init__(self, latency_ms=200.0, jitter_ms=0.0, slow_ratio=0.0, slow_ms=0.0, shapes=None, seed=None,
+                 token_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_ratio = slow_ratio
+        self.slow_ms = slow_ms
+        self.token_ms = token_ms  # Odstęp między fragmentami odpowiedzi strumieniowej
+        # Słownik kształt -> waga losowania
+        self.shapes = shapes or {"ok": 1.0}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def next_reply(self, free=None):
+        """Losuje opóźnienie (s), kształt odpowiedzi i ruch (z wolnych pól free, jeśli są znane)."""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+            if self.slow_ratio and self.rng.random() < self.slow_ratio:
+                delay = self.slow_ms
+            names = list(self.shapes)
+            shape = self.rng.choices(names, weights=[self.shapes[n] for n in names])[0]
+            move = self.rng.choice(free) if free else (self.rng.randrange(10), self.rng.randrange(10))
+        return delay / 1000.0, shape, move
+
+
+def parse_shapes(text):
+    """Parsuje opis kształtów w formacie "ok=0.8,malformed=0.1,missing=0.1"."""
+    shapes = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REPLY_SHAPES:
+            raise ValueError(f"Nieznany kształt odpowiedzi: {name}")
+        shapes[name] = float(weight) if weight else 1.0
+    return shapes
+
+
+def render_content(shape, move):
+    if shape == "missing":
+        return COMMENTARY
+    if shape == "malformed":
+        return f"{COMMENTARY}\nRUCH:{move[0]};{move[1]}?"
+    return f"{COMMENTARY}\nRUCH:{move[0]},{move[1]}"
+
+
+def free_cells(body):
+    """Wolne pola planszy opisanej w prompcie (zwięzły zapis z prompts.py) albo None."""
+    messages = body.get("messages") or []
+    try:
+        board = parse_board_state(messages[-1].get("content") or "") if messages else None
+    except (ValueError, AttributeError):
+        return None
+    if board is None:
+        return None
+    return [divmod(idx, board.size) for idx, value in enumerate(board.cells) if value == EMPTY]
+
+
+def split_tokens(content):
+    """Dzieli treść na fragmenty wielkości "tokenów" (słowa ze spacją)."""
+    return [part for part in re.split(r"(?<=\s)", content) if part]
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, jak prawdziwe API
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # Klient zrezygnował (limit czasu, przegrane zapytanie zabezpieczające)
+                self.close_connection = True
+
+        def _send_stream(self, content, usage=None):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for index, token in enumerate(split_tokens(content)):
+                    if index and config.token_ms:
+                        time.sleep(config.token_ms / 1000.0)
+                    self._write_chunk({"choices": [{"index": 0, "delta": {"content": token}}]})
+                if usage is not None:
+                    self._write_chunk({"choices": [], "usage": usage})
+                self._write_chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def _write_chunk(self, body):
+            data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid json"})
+                return
+
+            # Jak prawdziwy model - ruch "ok" trafia w wolne pole planszy z promptu
+            delay, shape, move = config.next_reply(free_cells(body))
+            time.sleep(delay)
+
+            if shape == "error":
+                self._send_json(500, {"error": {"message": "stub upstream error"}})
+                return
+            content = render_content("ok" if shape == "alt" else shape, move)
+            usage = {"prompt_tokens": count_message_tokens(body.get("messages") or []),
+                     "completion_tokens": count_tokens(content)}
+            if body.get("stream"):
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                self._send_stream(content, usage if include_usage else None)
+                return
+            # Odpowiedź bez strumienia przychodzi dopiero po "wygenerowaniu" wszystkich tokenów
+            time.sleep(config.token_ms * (len(split_tokens(content)) - 1) / 1000.0)
+            if shape == "alt":
+                self._send_json(200, {"response": content})
+            else:
+                self._send_json(200, {
+                    "id": f"stub-{config.requests}",
+                    "object": "chat.completion",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    # Kolejka połączeń na setki klientów naraz (domyślnie 5)
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """Uruchamia serwer w wątku w tle; zwraca (serwer, URL endpointu chat-completions)."""
+    config = config or StubConfig()
+    server = StubServer((host, port), make_handler(config))
+    thread = threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True)
+    thread.start()
+    url = f"http://{host}:{server.server_address[1]}/api/v1/chat/completions"
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalny serwer udający API chat-completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="Odsetek bardzo wolnych odpowiedzi")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Opóźnienie wolnych odpowiedzi")
+    parser.add_argument("--shapes", default="ok", help='Np. "ok=0.8,malformed=0.1,missing=0.1"')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Odstęp między fragmentami strumienia")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.slow_ratio, args.slow_ms,
+                        parse_shapes(args.shapes), args.seed, args.token_ms)
+    server = StubServer((args.host, args.port), make_handler(config))
+    print(f"Stub LLM nasłuchuje na http://{args.host}:{args.port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Zestaw benchmarków do porównywania wydajności między commitami.
+
+Uruchamia bezgłowe partie (benchmarks.selfplay) i test obciążeniowy
+(benchmarks.bench_load), a wyniki zapisuje do JSON. Dwa takie pliki można
+potem porównać - zmiany gorsze niż próg są oznaczane jako regresje.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python -m benchmarks.suite run --output wyniki/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite compare wyniki/stary.json wyniki/nowy.json --threshold 20
+"""
+
+import argparse
+import sys
+
+from benchmarks.common import load_results, save_results
+
+# Metryki, w których mniejsza wartość jest lepsza; pozostałe (przepustowość) - większa
+LOWER_IS_BETTER = ("p50", "p95", "p99", "max", "mean", "max_rss_mb", "illegal_moves", "missing_moves",
+                   "avg_tokens_in", "avg_tokens_out")
+
+
+def run_suite(games, requests, concurrency, latency_ms, shapes, seed):
+    from benchmarks import bench_load, selfplay
+    from benchmarks.stub_llm import StubConfig, parse_shapes
+
+    print("== Bezgłowe partie ==")
+    selfplay_result, samples = selfplay.run(games, seed)
+    selfplay.print_summary(selfplay_result, samples)
+
+    print("\n== Test obciążeniowy /get-ai-commentary ==")
+    config = StubConfig(latency_ms=latency_ms, shapes=parse_shapes(shapes), seed=seed)
+    load_result, samples = bench_load.run(requests, concurrency, config, seed=seed)
+    bench_load.print_summary(load_result, samples)
+    return {"selfplay": selfplay_result, "load": load_result}
+
+
+def flatten(results, prefix=""):
+    """Spłaszcza zagnieżdżone wyniki do {"load.latency.p95": 12.3, ...} (tylko liczby)."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new, threshold):
+    """Wypisuje zmiany metryk; zwraca listę regresji większych niż threshold (%)."""
+    before, after = flatten(old["results"]), flatten(new["results"])
+    print(f"Porównanie {old.get('commit')} ({old.get('timestamp')}) -> {new.get('commit')} ({new.get('timestamp')})")
+    regressions = []
+    for name in sorted(before.keys() & after.keys()):
+        a, b = before[name], after[name]
+        if a == b:
+            continue
+        change = (b - a) / abs(a) * 100 if a else float("inf")
+        lower_better = name.rsplit(".", 1)[-1] in LOWER_IS_BETTER
+        worse = change > threshold if lower_better else change < -threshold
+        if worse:
+            regressions.append(name)
+        print(f"{'REGRESJA ' if worse else '         '}{name:45s} {a:>12} -> {b:>12}  ({change:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zestaw benchmarków z zapisem wyników do JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Uruchom benchmarki")
+    run_parser.add_argument("--games", type=int, default=1000)
+    run_parser.add_argument("--requests", type=int, default=500)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--latency-ms", type=float, default=100.0)
+    run_parser.add_argument("--shapes", default="ok=0.7,malformed=0.1,missing=0.1,error=0.1")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="benchmark-results.json", help="Plik JSON na wyniki")
+
+    compare_parser = commands.add_parser("compare", help="Porównaj dwa pliki z wynikami")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=20.0, help="Próg regresji w procentach")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        results = run_suite(args.games, args.requests, args.concurrency, args.latency_ms, args.shapes, args.seed)
+        save_results(args.output, results)
+    else:
+        regressions = compare(load_results(args.old), load_results(args.new), args.threshold)
+        if regressions:
+            print(f"\nRegresje: {len(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,610 @@
+"""
+Kompaktowy model planszy do gry w kółko i krzyżyk NxN (k w rzędzie; domyślnie 10x10 i 5).
+
+Plansza trzymana jest jako płaska tablica bajtów oraz bitboardy (liczby
+całkowite) dla każdego gracza. Geometria linii (wiersze, kolumny, przekątne)
+jest liczona raz dla danego rozmiaru planszy, a reguły zależne od k (wagi
+okien, próg zagrożenia, wzorce z luką) - raz dla danej długości wygranej.
+Zagrożenia są cache'owane per linia - po wykonaniu lub cofnięciu ruchu
+przeliczane są tylko 4 linie przechodzące przez zmienione pole - a analiza
+odwiedza tylko linie z co najmniej progiem znaków gracza, więc jej koszt
+zależy od liczby znaków na planszy, a nie od jej powierzchni.
+"""
+
+import random
+from collections import namedtuple
+from operator import itemgetter
+
+BOARD_SIZE = 10
+
+# Kody pól na planszy
+EMPTY = 0
+KRZYZYK = 1
+KOLKO = 2
+BLOCKED = 3  # Pole zajęte przez nieznany znak (nie należy do żadnego gracza)
+
+PLAYER_CODES = {
+    "krzyżyk": KRZYZYK,
+    "kółko": KOLKO,
+}
+PLAYER_NAMES = {code: name for name, code in PLAYER_CODES.items()}
+
+# Kompaktowy zapis planszy: jeden znak na pole, wierszami
+BOARD_CHARS = ".XO"
+_DECODE_CHARS = str.maketrans({".": "\x00", "X": "\x01", "O": "\x02"})
+
+# Kierunki w tej samej kolejności co w oryginalnym skanowaniu find_threats
+DIRECTIONS = (
+    ("poziomo", 0, 1),
+    ("pionowo", 1, 0),
+    ("ukośnie ↗", -1, 1),
+    ("ukośnie ↘", 1, 1),
+)
+
+MAX_RUN = 5  # Skanowanie sekwencji obejmuje maksymalnie 5 pól
+WIN_LENGTH = 5  # Liczba znaków w rzędzie potrzebna do wygranej
+MIN_THREAT = 3  # Minimalna liczba znaków w rzędzie, aby uznać za zagrożenie
+# Powyższe wartości dotyczą domyślnych reguł; dla innej długości wygranej k
+# odpowiedniki wylicza get_rules(k): MAX_RUN = k, MIN_THREAT = max(2, k - 2)
+MIN_WIN_LENGTH = 3
+
+# Rodzaje zagrożeń (kolejność = priorytet przy równej liczbie znaków)
+SEQUENCE = 0
+GAP_PATTERN = 1
+GAP_PATTERNS = ("X_XX", "XX_X")
+
+# Cache zależne od rozmiaru planszy i długości wygranej mają klucze z zapytań, więc są
+# ograniczone - po przekroczeniu limitu cache jest czyszczony (jak cache analizy linii)
+_RULES_CACHE_LIMIT = 64
+
+_GEOMETRY = {}
+
+
+def _remember(cache, key, value, limit=_RULES_CACHE_LIMIT):
+    """Zapisuje wartość w cache, czyszcząc go po osiągnięciu limitu wpisów; zwraca wartość."""
+    if len(cache) >= limit:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def _build_geometry(size):
+    """Wylicza wszystkie linie planszy oraz przynależność pól do linii."""
+    lines = []  # (indeks kierunku, krotka indeksów pól w kolejności "w przód")
+    slices = []
+    cell_lines = [[] for _ in range(size * size)]
+    for d, (_, dr, dc) in enumerate(DIRECTIONS):
+        for row in range(size):
+            for col in range(size):
+                # Linia zaczyna się w polu, którego poprzednik leży poza planszą
+                pr, pc = row - dr, col - dc
+                if 0 <= pr < size and 0 <= pc < size:
+                    continue
+                cells = []
+                r, c = row, col
+                while 0 <= r < size and 0 <= c < size:
+                    cells.append(r * size + c)
+                    r += dr
+                    c += dc
+                line_id = len(lines)
+                lines.append((d, tuple(cells)))
+                slices.append(_line_slice(cells))
+                for idx in cells:
+                    cell_lines[idx].append(line_id)
+    # Klucze Zobrista dla każdej pary (pole, kod) - deterministyczne, aby hash był stabilny
+    rng = random.Random(size)
+    zobrist = tuple(rng.getrandbits(64) for _ in range(size * size * 4))
+    return tuple(lines), tuple(tuple(ids) for ids in cell_lines), tuple(slices), zobrist
+
+
+def _line_slice(cells):
+    """Wycinek płaskiej tablicy odpowiadający linii (szybkie pobranie zawartości)."""
+    step = cells[1] - cells[0] if len(cells) > 1 else 1
+    stop = cells[-1] + step
+    return slice(cells[0], stop if stop >= 0 else None, step)
+
+
+def get_geometry(size):
+    """Zwraca (z cache) geometrię linii, wycinki i klucze Zobrista dla danego rozmiaru."""
+    geometry = _GEOMETRY.get(size)
+    if geometry is None:
+        geometry = _remember(_GEOMETRY, size, _build_geometry(size))
+    return geometry
+
+
+# Liczba symetrii kwadratowej planszy (obroty i odbicia - grupa dihedralna D4)
+SYMMETRY_COUNT = 8
+
+_SYMMETRIES = {}
+
+
+def transform_point(t, row, col, size):
+    """Przekształca współrzędne symetrią t (0-3: obroty o 90°, 4-7: te same obroty po transpozycji)."""
+    if t >= 4:
+        row, col = col, row
+    for _ in range(t % 4):
+        row, col = col, size - 1 - row
+    return row, col
+
+
+def get_symmetries(size):
+    """
+    Zwraca dla każdej symetrii krotkę (forward, inverse, pobieracz):
+    forward[idx] - indeks pola po przekształceniu, inverse - odwrotność,
+    pobieracz - itemgetter budujący przekształconą zawartość planszy.
+    """
+    symmetries = _SYMMETRIES.get(size)
+    if symmetries is None:
+        symmetries = []
+        for t in range(SYMMETRY_COUNT):
+            forward = [0] * (size * size)
+            for idx in range(size * size):
+                row, col = transform_point(t, idx // size, idx % size, size)
+                forward[idx] = row * size + col
+            inverse = [0] * (size * size)
+            for idx, target in enumerate(forward):
+                inverse[target] = idx
+            symmetries.append((tuple(forward), tuple(inverse), itemgetter(*inverse)))
+        symmetries = _remember(_SYMMETRIES, size, tuple(symmetries))
+    return symmetries
+
+
+# Wagi okien 5-polowych zawierających znaki tylko jednego gracza (indeks = liczba znaków)
+WINDOW_WEIGHTS = (0, 1, 8, 64, 512, 0)
+
+# Reguły zależne od długości wygranej:
+# window_weights - wagi okien k-polowych (okno z k - 1 znakami zawsze waży 512, jak przy k = 5,
+#                  więc skala oceny - i jej odległość od wygranej w silniku - nie zależy od k),
+# gaps - wzorce z luką dla każdego gracza: (znaki przed luką, zawartość okna, nazwa), od X_XX
+Rules = namedtuple("Rules", "win_length max_run min_threat window_weights gaps")
+
+_RULES = {}
+
+
+def get_rules(win_length=WIN_LENGTH):
+    """Zwraca (z cache) reguły dla długości wygranej win_length; za krótka kończy się ValueError."""
+    rules = _RULES.get(win_length)
+    if rules is None:
+        if not isinstance(win_length, int) or win_length < MIN_WIN_LENGTH:
+            raise ValueError(f"Długość wygranej musi być liczbą całkowitą >= {MIN_WIN_LENGTH}")
+        weights = (0,) + tuple(8 ** (count + 4 - win_length) if count + 4 >= win_length else 0
+                               for count in range(1, win_length)) + (0,)
+        # Wzorce z luką: k - 2 znaki w oknie k - 1 pól z jednym pustym polem wewnątrz (dla k = 5: X_XX, XX_X)
+        span = win_length - 1
+        gaps = {}
+        for code in (KRZYZYK, KOLKO):
+            gaps[code] = tuple(
+                (before, bytes([code] * before + [EMPTY] + [code] * (span - 1 - before)),
+                 "X" * before + "_" + "X" * (span - 1 - before))
+                for before in range(1, span - 1))
+        rules = _remember(_RULES, win_length, Rules(win_length, win_length, max(2, win_length - 2), weights, gaps))
+    return rules
+
+
+_LINE_ANALYSIS = {}
+_LINE_ANALYSIS_LIMIT = 200000
+
+
+def analyse_line(vals, win_length=WIN_LENGTH):
+    """
+    Analizuje zawartość linii (bytes) i zwraca krotkę:
+    (ocena X, ocena O, pozycje wygrywające X, pozycje wygrywające O, wygrana X, wygrana O).
+
+    Wynik zależy wyłącznie od zawartości linii (i długości wygranej), więc jest zapamiętywany.
+    """
+    cache = _LINE_ANALYSIS.get(win_length)
+    if cache is None:
+        cache = _remember(_LINE_ANALYSIS, win_length, {})
+    info = cache.get(vals)
+    if info is not None:
+        return info
+    # Okna z samych pustych pól nic nie wnoszą - liczony jest tylko fragment od k - 1 pól
+    # przed pierwszym do k - 1 pól za ostatnim znakiem, więc koszt zależy od liczby znaków,
+    # a nie od długości linii, i rzadkie linie dużych plansz dzielą wpisy cache
+    n = len(vals)
+    lead = n - len(vals.lstrip(b"\x00"))
+    if lead == n:
+        return _EMPTY_LINE_INFO
+    lo = max(0, lead - win_length + 1)
+    hi = min(n, len(vals.rstrip(b"\x00")) + win_length - 1)
+    if lo or hi < n:
+        info = analyse_line(vals[lo:hi], win_length)
+        if lo and (info[2] or info[3]):
+            info = info[:2] + (tuple(pos + lo for pos in info[2]), tuple(pos + lo for pos in info[3])) + info[4:]
+        return _remember(cache, vals, info, _LINE_ANALYSIS_LIMIT)
+    weights = get_rules(win_length).window_weights
+    score = [0, 0, 0]
+    wins = (None, set(), set())
+    five = [False, False, False]
+    for start in range(len(vals) - win_length + 1):
+        window = vals[start:start + win_length]
+        x = window.count(KRZYZYK)
+        o = window.count(KOLKO)
+        if window.count(BLOCKED) or (x and o):
+            continue
+        code, count = (KRZYZYK, x) if x else (KOLKO, o)
+        if count == win_length:
+            five[code] = True
+        elif count == win_length - 1:
+            wins[code].add(start + window.index(EMPTY))
+        score[code] += weights[count]
+    info = (score[KRZYZYK], score[KOLKO], tuple(sorted(wins[KRZYZYK])), tuple(sorted(wins[KOLKO])),
+            five[KRZYZYK], five[KOLKO])
+    return _remember(cache, vals, info, _LINE_ANALYSIS_LIMIT)
+
+
+def _scan_line(vals, line, d, player, rules):
+    """Zwraca zagrożenia gracza na jednej linii jako krotki z kluczem sortowania."""
+    n = len(vals)
+    max_run = rules.max_run
+    min_threat = rules.min_threat
+    gaps = rules.gaps[player]
+    found = []
+    for i in range(n):
+        v = vals[i]
+        if v == player:
+            count = 1
+            while count < max_run and i + count < n and vals[i + count] == player:
+                count += 1
+            if count < min_threat:
+                continue
+            start = line[i]
+            # Miejsce do blokady za sekwencją (przy k znakach nie istnieje)
+            if count < max_run and i + count < n and vals[i + count] == EMPTY:
+                found.append((-count, SEQUENCE, start, d, 0, count, start, line[i + count], None))
+            # Przeciwny koniec linii
+            if i > 0 and vals[i - 1] == EMPTY:
+                found.append((-count, SEQUENCE, start, d, 1, count, start, line[i - 1], None))
+        elif v == EMPTY and 0 < i < n - 1 and vals[i - 1] == player and vals[i + 1] == player:
+            # Każdy wzorzec ma znak gracza tuż przed i tuż za luką
+            block = line[i]
+            for sub, (before, window, pattern) in enumerate(gaps):
+                if before <= i and vals[i - before:i - before + len(window)] == window:
+                    count = len(window) - 1
+                    found.append((-count, GAP_PATTERN, block, d, sub, count, line[i - before], block, pattern))
+    return found
+
+
+def bit_indices(mask):
+    """Indeksy ustawionych bitów maski (rosnąco) - liczba kroków zależy od liczby bitów, nie od planszy."""
+    found = []
+    while mask:
+        low = mask & -mask
+        found.append(low.bit_length() - 1)
+        mask ^= low
+    return found
+
+
+# Analiza linii bez znaków - zerowe oceny i brak pól wygrywających przy każdym k
+_EMPTY_LINE_INFO = (0, 0, (), (), False, False)
+
+_BASE_HASHES = {}
+
+
+def _base_hash(size, win_length):
+    """
+    Hash pustej planszy: 0 dla domyślnych reguł, dla innych - stała zależna od rozmiaru
+    i długości wygranej, żeby ta sama zawartość przy innych regułach była inną pozycją
+    (np. w tablicy transpozycji silnika).
+    """
+    if size == BOARD_SIZE and win_length == WIN_LENGTH:
+        return 0
+    key = _BASE_HASHES.get((size, win_length))
+    if key is None:
+        key = _remember(_BASE_HASHES, (size, win_length), random.Random(f"{size}/{win_length}").getrandbits(64))
+    return key
+
+
+class Board:
+    """
+    Plansza z bitboardami i przyrostowym śledzeniem zagrożeń.
+
+    Pola indeksowane są jako row * size + col. Zagrożenia dla każdej linii
+    są trzymane w cache i unieważniane tylko dla linii dotkniętych ruchem.
+    Hash Zobrista, ocena okien k-polowych i pola wygrywające są aktualizowane
+    przyrostowo przy każdym ruchu, a zbiór linii z co najmniej progiem
+    zagrożenia znaków każdego gracza ogranicza analizę do linii ze znakami.
+    """
+
+    __slots__ = ("size", "win_length", "cells", "bits", "moves", "hash", "scores", "_rules", "_lines",
+                 "_cell_lines", "_slices", "_zobrist", "_line_counts", "_hot_lines", "_line_threats", "_line_info")
+
+    def __init__(self, size=BOARD_SIZE, win_length=WIN_LENGTH):
+        self._rules = get_rules(win_length)
+        self.size = size
+        self.win_length = win_length
+        self.cells = bytearray(size * size)
+        self.bits = [0, 0, 0, 0]  # Bitboard dla każdego kodu pola
+        self.moves = []
+        self.hash = _base_hash(size, win_length)
+        self.scores = [0, 0, 0]  # Suma ocen okien dla każdego gracza
+        self._lines, self._cell_lines, self._slices, self._zobrist = get_geometry(size)
+        # Liczba znaków gracza na każdej linii - pozwala pominąć linie bez szans na zagrożenie
+        self._line_counts = {KRZYZYK: [0] * len(self._lines), KOLKO: [0] * len(self._lines)}
+        # Linie z co najmniej min_threat znakami gracza - tylko na nich są zagrożenia i wygrane
+        self._hot_lines = {KRZYZYK: set(), KOLKO: set()}
+        self._line_threats = {KRZYZYK: {}, KOLKO: {}}
+        self._line_info = [_EMPTY_LINE_INFO] * len(self._lines)
+
+    @classmethod
+    def from_rows(cls, rows, win_length=WIN_LENGTH):
+        """Buduje planszę z listy wierszy (None - puste pole, nazwy graczy jako napisy)."""
+        size = len(rows)
+        board = cls(size, win_length)
+        for row in range(size):
+            cells = rows[row]
+            if len(cells) < size:
+                raise ValueError(f"Wiersz {row} ma {len(cells)} pól zamiast {size}")
+            for col in range(size):
+                value = cells[col]
+                if value is not None:
+                    board._place(row * size + col, PLAYER_CODES.get(value, BLOCKED))
+        board._rebuild_lines()
+        return board
+
+    @classmethod
+    def from_string(cls, text, win_length=WIN_LENGTH):
+        """
+        Buduje planszę z kompaktowego zapisu (size*size znaków '.', 'X', 'O').
+
+        Dekodowanie całego napisu odbywa się w C, a w Pythonie tylko
+        ustawianie znaków - czas zależy od liczby znaków, nie pól;
+        nieprawidłowy zapis kończy się ValueError.
+        """
+        if not isinstance(text, str):
+            raise ValueError("Plansza musi być napisem")
+        size = int(round(len(text) ** 0.5))
+        if size == 0 or size * size != len(text):
+            raise ValueError(f"Długość planszy ({len(text)}) nie jest kwadratem liczby naturalnej")
+        if not set(text) <= set(BOARD_CHARS):
+            raise ValueError("Plansza może zawierać tylko znaki '.', 'X' i 'O'")
+        board = cls(size, win_length)
+        codes = text.translate(_DECODE_CHARS).encode("ascii")
+        place = board._place
+        for code in (KRZYZYK, KOLKO):
+            marker = bytes((code,))
+            idx = codes.find(marker)
+            while idx != -1:
+                place(idx, code)
+                idx = codes.find(marker, idx + 1)
+        board._rebuild_lines()
+        return board
+
+    @classmethod
+    def from_moves(cls, moves, size=BOARD_SIZE, win_length=WIN_LENGTH):
+        """Buduje planszę z listy indeksów pól (row * size + col) - na przemian X i O, zaczyna X."""
+        board = cls(size, win_length)
+        for i, idx in enumerate(moves):
+            if not isinstance(idx, int) or not 0 <= idx < size * size:
+                raise ValueError(f"Nieprawidłowe pole ruchu: {idx!r}")
+            if board.cells[idx] != EMPTY:
+                raise ValueError(f"Pole {idx} zostało zajęte dwukrotnie")
+            board._place(idx, KRZYZYK if i % 2 == 0 else KOLKO)
+            board.moves.append(idx)
+        board._rebuild_lines()
+        return board
+
+    def canonical(self):
+        """
+        Zwraca (klucz, t): zawartość planszy w kanonicznej orientacji (najmniejszą
+        leksykograficznie spośród 8 symetrii) oraz symetrię t, która do niej prowadzi.
+        Pole idx planszy odpowiada polu forward[idx] w orientacji kanonicznej.
+        """
+        best_key, best_t = None, 0
+        cells = self.cells
+        for t, (_, _, getter) in enumerate(get_symmetries(self.size)):
+            key = bytes(getter(cells)) if len(cells) > 1 else bytes(cells)
+            if best_key is None or key < best_key:
+                best_key, best_t = key, t
+        return best_key, best_t
+
+    def to_string(self):
+        """Zwraca kompaktowy zapis planszy (odwrotność from_string)."""
+        return "".join(BOARD_CHARS[code] if code < len(BOARD_CHARS) else "#" for code in self.cells)
+
+    def copy(self):
+        other = Board(self.size, self.win_length)
+        other.cells[:] = self.cells
+        other.bits = list(self.bits)
+        other.moves = list(self.moves)
+        other.hash = self.hash
+        other.scores = list(self.scores)
+        other._line_counts = {p: list(c) for p, c in self._line_counts.items()}
+        other._hot_lines = {p: set(h) for p, h in self._hot_lines.items()}
+        other._line_threats = {p: dict(t) for p, t in self._line_threats.items()}
+        other._line_info = list(self._line_info)
+        return other
+
+    def get(self, row, col):
+        return self.cells[row * self.size + col]
+
+    def is_empty(self, row, col):
+        return self.cells[row * self.size + col] == EMPTY
+
+    def is_full(self):
+        return EMPTY not in self.cells
+
+    def occupied(self):
+        """Maska bitowa zajętych pól (bit idx - pole row * size + col)."""
+        bits = self.bits
+        return bits[KRZYZYK] | bits[KOLKO] | bits[BLOCKED]
+
+    def to_rows(self):
+        """Zwraca planszę w formacie list wierszy używanym przez serwer."""
+        size = self.size
+        return [
+            [PLAYER_NAMES.get(self.cells[row * size + col]) for col in range(size)]
+            for row in range(size)
+        ]
+
+    def _place(self, idx, code):
+        # Ustawienie pola bez aktualizacji linii - do budowania całej planszy naraz
+        self.cells[idx] = code
+        self.bits[code] |= 1 << idx
+        self.hash ^= self._zobrist[idx * 4 + code]
+        counts = self._line_counts.get(code)
+        if counts is not None:
+            hot = self._hot_lines[code]
+            min_threat = self._rules.min_threat
+            for line_id in self._cell_lines[idx]:
+                counts[line_id] += 1
+                if counts[line_id] == min_threat:
+                    hot.add(line_id)
+
+    def _rebuild_lines(self):
+        cells = self.cells
+        slices = self._slices
+        info = self._line_info
+        win_length = self.win_length
+        cell_lines = self._cell_lines
+        touched = set()
+        for idx in bit_indices(self.occupied()):
+            touched.update(cell_lines[idx])
+        for line_id in touched:
+            info[line_id] = analyse_line(bytes(cells[slices[line_id]]), win_length)
+        # Linie bez znaków mają zerowe oceny - wystarczy zsumować linie dotknięte
+        self.scores = [0, sum(info[line_id][0] for line_id in touched), sum(info[line_id][1] for line_id in touched)]
+        for threats in self._line_threats.values():
+            threats.clear()
+
+    def _update_lines(self, idx, code):
+        counts = self._line_counts.get(code)
+        hot = self._hot_lines.get(code)
+        min_threat = self._rules.min_threat
+        delta = 1 if self.cells[idx] == code else -1
+        cells = self.cells
+        scores = self.scores
+        win_length = self.win_length
+        for line_id in self._cell_lines[idx]:
+            if counts is not None:
+                count = counts[line_id] = counts[line_id] + delta
+                # Linia wchodzi do zbioru (albo z niego wypada) przy przekroczeniu progu
+                if delta > 0 and count == min_threat:
+                    hot.add(line_id)
+                elif delta < 0 and count == min_threat - 1:
+                    hot.discard(line_id)
+            for threats in self._line_threats.values():
+                threats.pop(line_id, None)
+            old = self._line_info[line_id]
+            new = self._line_info[line_id] = analyse_line(bytes(cells[self._slices[line_id]]), win_length)
+            scores[KRZYZYK] += new[0] - old[0]
+            scores[KOLKO] += new[1] - old[1]
+
+    def _set(self, idx, code):
+        self.cells[idx] = code
+        self.bits[code] |= 1 << idx
+        self.hash ^= self._zobrist[idx * 4 + code]
+        self._update_lines(idx, code)
+
+    def _clear(self, idx):
+        code = self.cells[idx]
+        self.cells[idx] = EMPTY
+        self.bits[code] &= ~(1 << idx)
+        self.hash ^= self._zobrist[idx * 4 + code]
+        self._update_lines(idx, code)
+
+    def apply(self, row, col, player):
+        """Wykonuje ruch gracza (nazwa lub kod) i aktualizuje zagrożenia."""
+        idx = row * self.size + col
+        if self.cells[idx] != EMPTY:
+            raise ValueError(f"Pole ({row},{col}) jest już zajęte")
+        self._set(idx, PLAYER_CODES.get(player, player))
+        self.moves.append(idx)
+
+    def undo(self):
+        """Cofa ostatni ruch i zwraca jego współrzędne."""
+        idx = self.moves.pop()
+        self._clear(idx)
+        return divmod(idx, self.size)
+
+    def winning_moves(self, player):
+        """Zwraca posortowane indeksy pól, na których gracz od razu ułoży k w rzędzie."""
+        code = PLAYER_CODES.get(player, player)
+        counts = self._line_counts[code]
+        slot = 2 if code == KRZYZYK else 3
+        lines = self._lines
+        line_info = self._line_info
+        needed = self.win_length - 1
+        found = set()
+        for line_id in self._hot_lines[code]:
+            if counts[line_id] >= needed:
+                positions = line_info[line_id][slot]
+                if positions:
+                    line = lines[line_id][1]
+                    found.update(line[pos] for pos in positions)
+        return sorted(found)
+
+    def is_win_at(self, row, col):
+        """Sprawdza, czy znak na polu (row, col) jest częścią k w rzędzie."""
+        idx = row * self.size + col
+        code = self.cells[idx]
+        if code not in (KRZYZYK, KOLKO):
+            return False
+        slot = 4 if code == KRZYZYK else 5
+        return any(self._line_info[line_id][slot] for line_id in self._cell_lines[idx])
+
+    def winner(self):
+        """Zwraca nazwę zwycięzcy albo None."""
+        line_info = self._line_info
+        for code, slot in ((KRZYZYK, 4), (KOLKO, 5)):
+            if any(line_info[line_id][slot] for line_id in self._hot_lines[code]):
+                return PLAYER_NAMES[code]
+        return None
+
+    def threats(self, player):
+        """
+        Zwraca posortowane zagrożenia gracza jako krotki:
+        (klucz sortowania..., count, start_idx, block_idx, pattern).
+        """
+        code = PLAYER_CODES.get(player, player)
+        cache = self._line_threats.get(code)
+        if cache is None:
+            return []
+        lines = self._lines
+        slices = self._slices
+        cells = self.cells
+        rules = self._rules
+        found = []
+        for line_id in self._hot_lines[code]:
+            line_threats = cache.get(line_id)
+            if line_threats is None:
+                d, line = lines[line_id]
+                line_threats = cache[line_id] = _scan_line(cells[slices[line_id]], line, d, code, rules)
+            found.extend(line_threats)
+        # Klucz sortowania odtwarza kolejność oryginalnego skanowania pole po polu
+        found.sort()
+        return found
+
+
+def threat_to_dict(threat, size):
+    """Zamienia krotkę zagrożenia na słownik w formacie zwracanym przez find_threats."""
+    _, kind, _, d, _, count, start, block, pattern = threat
+    start_row, start_col = divmod(start, size)
+    block_row, block_col = divmod(block, size)
+    result = {
+        "count": count,
+        "direction": DIRECTIONS[d][0],
+        "start_row": start_row,
+        "start_col": start_col,
+        "block_row": block_row,
+        "block_col": block_col,
+        "type": "sequence" if kind == SEQUENCE else "gap_pattern",
+    }
+    if pattern is not None:
+        result["pattern"] = pattern
+    return result
+
+
+# Funkcja do znajdowania zagrożeń na planszy
+def find_threats(board, player):
+    """
+    Znajduje sekwencje 3+ znaków z wolnym końcem oraz wzorce X_XX / XX_X
+    (przy innej długości wygranej k: k-2+ znaków i wzorce k-2 znaków z luką).
+
+    Przyjmuje obiekt Board albo listę wierszy (jak dotychczas). Wynik jest
+    identyczny z dawnym skanowaniem pole po polu, łącznie z kolejnością.
+    """
+    if not isinstance(board, Board):
+        board = Board.from_rows(board)
+    size = board.size
+    return [threat_to_dict(t, size) for t in board.threats(player)]
@@ -0,0 +1,146 @@
+"""
+Księga otwarć: gotowe odpowiedzi kółka w pozycjach początkowych.
+
+Księgę buduje offline build_book.py (self-play z oceną silnika), a serwer
+otwiera ją przez mmap - start nie wymaga wczytywania pliku, a wyszukiwanie to
+wyszukiwanie binarne po hashu pozycji. Pozycje są zapisywane w orientacji
+kanonicznej (8 symetrii planszy dzieli jeden wpis), a ruch jest przekształcany
+z powrotem do orientacji pytającej planszy.
+
+Format pliku (little-endian):
+
+    nagłówek: magic "TTTBOOK1", rozmiar planszy (u8), maks. liczba znaków (u8), liczba wpisów (u32)
+    wpisy posortowane po hashu: hash (u64), pole ruchu w orientacji kanonicznej (u16), ocena (i32)
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from board import EMPTY, WIN_LENGTH, get_symmetries
+
+log = logging.getLogger(__name__)
+
+OPENING_BOOK = os.getenv('OPENING_BOOK', 'opening_book.bin')
+
+MAGIC = b'TTTBOOK1'
+HEADER = struct.Struct('<8sBBI')
+RECORD = struct.Struct('<QHi')
+_HASH = struct.Struct('<Q')
+
+BookMove = namedtuple('BookMove', 'row col score')
+
+# Komentarze do ruchów z księgi - odpowiedź bez zapytania do AI
+BOOK_COMMENTS = (
+    "Otwarcie mam wykute na blachę, jak Kaczyński przemówienie o Smoleńsku. Twój ruch niczego nie zmienia!",
+    "Ten ruch znam z podręcznika - Ty chyba grasz z instrukcji obsługi pralki.",
+    "Klasyka! Gram z księgi, a Ty z czapy, jak Hołownia na konferencji prasowej.",
+    "Tak zaczynają tylko amatorzy i posłowie Konfederacji. Mam na to gotową odpowiedź!",
+    "Nawet nie muszę myśleć - na takie otwarcie odpowiadam szybciej niż Tusk zmienia zdanie.",
+)
+
+
+def position_hash(canonical_key):
+    """Stabilny (niezależny od procesu) 64-bitowy hash kanonicznej zawartości planszy."""
+    return _HASH.unpack(hashlib.blake2b(canonical_key, digest_size=8).digest())[0]
+
+
+def book_comment(canonical_key):
+    """Komentarz do ruchu z księgi - stały dla danej pozycji (i jej symetrii)."""
+    return BOOK_COMMENTS[position_hash(canonical_key) % len(BOOK_COMMENTS)]
+
+
+def write_book(path, entries, size, max_stones):
+    """Zapisuje księgę: entries to {hash pozycji: (pole ruchu w orientacji kanonicznej, ocena)}."""
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, size, max_stones, len(entries)))
+        for key in sorted(entries):
+            move, score = entries[key]
+            f.write(RECORD.pack(key, move, max(-2 ** 31, min(2 ** 31 - 1, int(score)))))
+
+
+class OpeningBook:
+    """Księga otwarć otwarta przez mmap (tylko do odczytu)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.size, self.max_stones, self.count = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or len(self._map) != HEADER.size + self.count * RECORD.size:
+                raise ValueError(f"Nieprawidłowy plik księgi otwarć: {path}")
+        except Exception:
+            self._file.close()
+            raise
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            found = _HASH.unpack_from(self._map, offset)[0]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return RECORD.unpack_from(self._map, offset)
+        return None
+
+    def lookup(self, board, canonical=None):
+        """Zwraca BookMove w orientacji planszy albo None, jeśli pozycji nie ma w księdze."""
+        # Pozycje spoza zakresu księgi (także innych reguł - księga jest liczona dla 5 w rzędzie)
+        # odpadają bez liczenia postaci kanonicznej
+        if (board.size != self.size or board.win_length != WIN_LENGTH
+                or len(board.cells) - board.cells.count(EMPTY) > self.max_stones):
+            return None
+        key, t = canonical or board.canonical()
+        record = self._find(position_hash(key))
+        move = None
+        if record is not None:
+            idx = get_symmetries(board.size)[t][1][record[1]]
+            # Kolizja hasha nie może dać ruchu na zajęte pole
+            if board.cells[idx] == EMPTY:
+                move = BookMove(idx // board.size, idx % board.size, record[2])
+        with self.lock:
+            if move is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return move
+
+    def stats(self):
+        with self.lock:
+            return {'path': self.path, 'positions': self.count, 'max_stones': self.max_stones,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def load_book(path=OPENING_BOOK):
+    """Otwiera księgę otwarć; brak pliku (albo błędny plik) wyłącza księgę."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        book = OpeningBook(path)
+    except (OSError, ValueError, struct.error) as e:
+        log.warning("Nie udało się otworzyć księgi otwarć: %s", e)
+        return None
+    log.info("Księga otwarć: %d pozycji (do %d znaków) z %s", book.count, book.max_stones, path)
+    return book
+
+
+opening_book = load_book()
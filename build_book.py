@@ -0,0 +1,131 @@
+"""
+Budowa księgi otwarć (book.py) offline.
+
+Pozycje z kółkiem na ruchu są zbierane na dwa sposoby:
+- pełne drzewo pierwszych --full-depth ruchów krzyżyka (pierwszy ruch w dowolne
+  pole, kolejne obok istniejących znaków), z kółkiem odpowiadającym ruchem z księgi,
+- partie self-play: krzyżyk gra losowo w pobliżu znaków, kółko ruchami z księgi,
+  aż do --max-stones znaków na planszy.
+
+Każda pozycja (po redukcji symetrii) jest oceniana silnikiem serwera
+(find_best_move), a najlepszy ruch i jego ocena trafiają do księgi.
+
+Uruchomienie (z katalogu głównego repozytorium):
+
+    python build_book.py --full-depth 2 --games 300 --max-stones 9 --output opening_book.bin
+"""
+
+import argparse
+import random
+import time
+
+from board import BOARD_SIZE, EMPTY, Board, get_symmetries
+from book import OPENING_BOOK, position_hash, write_book
+from engine import WIN_SCORE, find_best_move
+
+
+def near_stones(board, radius=1):
+    """Wolne pola w odległości (w metryce króla) co najwyżej radius od znaków; pusta plansza - wszystkie pola."""
+    size = board.size
+    cells = board.cells
+    if not any(cells):
+        return list(range(size * size))
+    found = []
+    for idx, value in enumerate(cells):
+        if value != EMPTY:
+            continue
+        row, col = divmod(idx, size)
+        left, right = max(0, col - radius), min(size, col + radius + 1)
+        for r in range(max(0, row - radius), min(size, row + radius + 1)):
+            if any(cells[r * size + left:r * size + right]):
+                found.append(idx)
+                break
+    return found
+
+
+class BookBuilder:
+    """Zbiera pozycje i ich najlepsze odpowiedzi (w orientacji kanonicznej, kluczowane hashem pozycji)."""
+
+    def __init__(self, time_ms, max_depth):
+        self.time_ms = time_ms
+        self.max_depth = max_depth
+        self.entries = {}
+        self.max_stones = 0
+        self.search_ms = 0.0
+
+    def reply(self, board):
+        """Zwraca ruch kółka (indeks pola) w pozycji - z księgi albo z nowego przeszukiwania."""
+        key, t = board.canonical()
+        forward, inverse, _ = get_symmetries(board.size)[t]
+        h = position_hash(key)
+        entry = self.entries.get(h)
+        if entry is None:
+            result = find_best_move(board, 'kółko', time_limit_ms=self.time_ms, max_depth=self.max_depth)
+            self.search_ms += result.elapsed_ms
+            entry = self.entries[h] = (forward[result.row * board.size + result.col], result.score)
+            self.max_stones = max(self.max_stones, len(board.moves))
+        return inverse[entry[0]]
+
+    def expand(self, board, depth):
+        """Pełne drzewo: każdy ruch krzyżyka (bez symetrycznych powtórzeń) i odpowiedź kółka z księgi."""
+        if depth == 0:
+            return
+        seen = set()
+        for idx in near_stones(board):
+            board.apply(idx // board.size, idx % board.size, 'krzyżyk')
+            try:
+                key, _ = board.canonical()
+                if key in seen or board.is_win_at(idx // board.size, idx % board.size):
+                    continue
+                seen.add(key)
+                move = self.reply(board)
+                board.apply(move // board.size, move % board.size, 'kółko')
+                try:
+                    if not board.is_win_at(move // board.size, move % board.size):
+                        self.expand(board, depth - 1)
+                finally:
+                    board.undo()
+            finally:
+                board.undo()
+
+    def self_play(self, rng, max_stones, size=BOARD_SIZE):
+        board = Board(size)
+        while len(board.moves) < max_stones and not board.is_full():
+            idx = rng.choice(near_stones(board, radius=2))
+            board.apply(idx // size, idx % size, 'krzyżyk')
+            if board.is_win_at(idx // size, idx % size) or len(board.moves) > max_stones:
+                return
+            move = self.reply(board)
+            board.apply(move // size, move % size, 'kółko')
+            if board.is_win_at(move // size, move % size):
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budowa księgi otwarć przez self-play")
+    parser.add_argument("--full-depth", type=int, default=2, help="Liczba ruchów krzyżyka w pełnym drzewie")
+    parser.add_argument("--games", type=int, default=300, help="Liczba partii self-play")
+    parser.add_argument("--max-stones", type=int, default=9, help="Maksymalna liczba znaków w pozycjach księgi")
+    parser.add_argument("--time-ms", type=int, default=200, help="Limit czasu silnika na pozycję")
+    parser.add_argument("--max-depth", type=int, default=4, help="Maksymalna głębokość przeszukiwania")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=OPENING_BOOK)
+    args = parser.parse_args()
+
+    builder = BookBuilder(args.time_ms, args.max_depth)
+    started = time.perf_counter()
+    builder.expand(Board(), args.full_depth)
+    print(f"Pełne drzewo (ruchy krzyżyka: {args.full_depth}): {len(builder.entries)} pozycji")
+    rng = random.Random(args.seed)
+    for _ in range(args.games):
+        builder.self_play(rng, args.max_stones)
+    print(f"Po {args.games} partiach self-play: {len(builder.entries)} pozycji")
+
+    write_book(args.output, builder.entries, BOARD_SIZE, builder.max_stones)
+    wins = sum(1 for _, score in builder.entries.values() if score >= WIN_SCORE)
+    print(f"Zapisano {args.output}: {len(builder.entries)} pozycji, wygranych kółka: {wins}, "
+          f"czas {time.perf_counter() - started:.1f} s (silnik {builder.search_ms / 1000:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Cache odpowiedzi AI i analiz pozycji kluczowany kanoniczną (symetryczną) postacią planszy.
+
+Plansza 10x10 ma 8 symetrii, więc odpowiedzi AI dla pozycji różniących się
+obrotem lub odbiciem trafiają do tego samego wpisu - ruch jest zapisany
+w orientacji kanonicznej i przy odczycie przekształcany z powrotem do
+orientacji planszy. Analiza zagrożeń jest trzymana osobno dla każdej orientacji.
+
+Pamięć jest ograniczona (LRU + TTL), a opcjonalna warstwa sqlite pozwala
+zachować cache między restartami serwera.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from board import WIN_LENGTH, get_symmetries
+
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', 10000))
+AI_CACHE_TTL_S = float(os.getenv('AI_CACHE_TTL_S', 3600))
+AI_CACHE_DB = os.getenv('AI_CACHE_DB', '')
+
+
+class DiskTier:
+    """Trwała warstwa cache w sqlite (klucz -> JSON z czasem wygaśnięcia)."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+    def get(self, key, now):
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.delete(key)
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, value, expires):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                              (key, json.dumps(value), expires))
+            self.conn.commit()
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def purge_expired(self, now):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class LRUCache:
+    """
+    Cache w pamięci z ograniczoną liczbą wpisów (LRU) i czasem życia (TTL),
+    z licznikami trafień/chybień oraz opcjonalną warstwą dyskową.
+    """
+
+    def __init__(self, max_entries=AI_CACHE_SIZE, ttl=AI_CACHE_TTL_S, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # klucz -> (wartość, czas wygaśnięcia)
+        self.lock = threading.Lock()
+        self.disk = DiskTier(db_path) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk is not None:
+            self.disk.purge_expired(time.time())
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None:
+                if item[1] >= now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return item[0]
+                del self.entries[key]
+        if self.disk is not None:
+            stored = self.disk.get(key, now)
+            if stored is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._store(key, stored[0], stored[1])
+                return stored[0]
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self._store(key, value, expires)
+        if self.disk is not None:
+            self.disk.put(key, value, expires)
+
+    def _store(self, key, value, expires):
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'disk': self.disk is not None,
+            }
+
+
+# Rodzaj wpisu z analizą zagrożeń. find_threats nie daje tych samych zagrożeń dla symetrycznych
+# wariantów pozycji (sekwencje są skanowane w jednym zwrocie linii), więc analiza jest zapisywana
+# dla każdej orientacji osobno, w jej własnych współrzędnych. Wcześniejsze wpisy "analysis"
+# w pliku AI_CACHE_DB (przekształcane symetriami) nie są już odczytywane.
+ANALYSIS_KIND = 'analysis3'
+
+
+class PositionCache:
+    """
+    Cache analiz strategicznych i odpowiedzi AI dla pozycji.
+
+    Klucz to kanoniczna zawartość planszy, więc pozycja i jej 7 symetrycznych
+    odpowiedników dzielą jeden wpis odpowiedzi. Wpis analizy ma w kluczu także
+    symetrię t prowadzącą do postaci kanonicznej (razem wyznaczają planszę
+    jednoznacznie). Rozmiar planszy wynika z długości klucza, a inna niż
+    domyślna długość wygranej trafia do prefiksu klucza.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def _key(kind, canonical_key, win_length=WIN_LENGTH):
+        if win_length != WIN_LENGTH:
+            kind = f'{kind}/k{win_length}'
+        return kind.encode('ascii') + b':' + canonical_key
+
+    def get_analysis(self, board, canonical=None):
+        """Zwraca (zagrożenia, możliwości) dla planszy w jej orientacji albo None."""
+        key, t = canonical or board.canonical()
+        cached = self.store.get(self._key(f'{ANALYSIS_KIND}/t{t}', key, board.win_length))
+        if cached is None:
+            return None
+        return tuple(cached)
+
+    def put_analysis(self, board, threats, opportunities, canonical=None):
+        key, t = canonical or board.canonical()
+        self.store.put(self._key(f'{ANALYSIS_KIND}/t{t}', key, board.win_length), [threats, opportunities])
+
+    def get_reply(self, board, canonical=None):
+        """Zwraca (komentarz, ruch) z ruchem przekształconym do orientacji planszy albo None."""
+        key, t = canonical or board.canonical()
+        cached = self.store.get(self._key('reply', key, board.win_length))
+        if cached is None:
+            return None
+        commentary, move = cached
+        if move is not None:
+            idx = get_symmetries(board.size)[t][1][move]
+            move = {'row': idx // board.size, 'col': idx % board.size}
+        return commentary, move
+
+    def put_reply(self, board, commentary, move, canonical=None):
+        key, t = canonical or board.canonical()
+        canonical_move = None
+        if move is not None:
+            canonical_move = get_symmetries(board.size)[t][0][move['row'] * board.size + move['col']]
+        self.store.put(self._key('reply', key, board.win_length), [commentary, canonical_move])
+
+    def stats(self):
+        return self.store.stats()
+
+
+position_cache = PositionCache(LRUCache(db_path=AI_CACHE_DB or None))
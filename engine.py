@@ -0,0 +1,302 @@
+"""
+Serwerowy silnik ruchów: alpha-beta z iteracyjnym pogłębianiem w limicie czasu.
+
+Kolejność ruchów wyznaczają zagrożenia z find_threats (pola blokady/kontynuacji),
+wymuszone ruchy (wygrana w jednym ruchu, blokada wygranej przeciwnika) są
+rozpatrywane przed pełnym przeszukiwaniem, a pozycje trafiają do tablicy
+transpozycji opartej na hashu Zobrista.
+"""
+
+import time
+from collections import namedtuple
+
+from board import EMPTY, KOLKO, KRZYZYK, PLAYER_CODES, Board, bit_indices
+
+WIN_SCORE = 1000000
+DEFENCE_WEIGHT = 1.2  # Zagrożenia przeciwnika ważą nieco więcej niż własne (gra się kółkiem)
+DEFAULT_TIME_MS = 300
+DEFAULT_MAX_DEPTH = 10
+MAX_BRANCHING = 12  # Maksymalna liczba rozważanych ruchów w węźle (poza korzeniem)
+CHECK_EVERY = 64  # Co ile węzłów sprawdzany jest limit czasu
+
+# Flagi wpisów w tablicy transpozycji
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Klucze strony na ruchu - ta sama pozycja z innym graczem na ruchu to inny wpis w tablicy
+SIDE_KEYS = {KRZYZYK: 0x9E3779B97F4A7C15, KOLKO: 0x632BE59BD9B4E019}
+
+SearchResult = namedtuple("SearchResult", "row col score depth nodes elapsed_ms")
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """
+    Tablica transpozycji o stałym rozmiarze indeksowana hashem Zobrista.
+
+    Wpis jest zastępowany, gdy nowy wynik pochodzi z głębszego przeszukiwania
+    albo stary wpis pochodzi z wcześniejszego wyszukiwania (starzenie).
+    """
+
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self.entries = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        slot = key % self.size
+        entry = self.entries[slot]
+        if entry is None or entry[0] == key or depth >= entry[1] or entry[5] != self.generation:
+            self.entries[slot] = (key, depth, score, flag, move, self.generation)
+
+    def clear(self):
+        self.entries = [None] * self.size
+
+
+# Wspólna tablica transpozycji - pozycje powtarzają się między zapytaniami
+default_table = TranspositionTable()
+
+
+_NEAR_MASKS = {}
+_NEAR_MASKS_LIMIT = 64  # Rozmiary plansz pochodzą z zapytań - cache jest czyszczony po przepełnieniu
+
+
+def _near_masks(size, radius):
+    """Dla każdego pola maska bitowa pól w odległości <= radius (liczona raz dla rozmiaru planszy)."""
+    masks = _NEAR_MASKS.get((size, radius))
+    if masks is None:
+        masks = []
+        for idx in range(size * size):
+            row, col = divmod(idx, size)
+            mask = 0
+            for r in range(max(0, row - radius), min(size, row + radius + 1)):
+                for c in range(max(0, col - radius), min(size, col + radius + 1)):
+                    mask |= 1 << (r * size + c)
+            masks.append(mask)
+        if len(_NEAR_MASKS) >= _NEAR_MASKS_LIMIT:
+            _NEAR_MASKS.clear()
+        masks = _NEAR_MASKS[size, radius] = tuple(masks)
+    return masks
+
+
+def _neighbourhood(board, radius=2):
+    """Zwraca listę (rosnąco) pustych pól w odległości <= radius od dowolnego znaku."""
+    masks = _near_masks(board.size, radius)
+    occupied = board.occupied()
+    near = 0
+    for idx in bit_indices(occupied):
+        near |= masks[idx]
+    return bit_indices(near & ~occupied)
+
+
+class Searcher:
+    def __init__(self, board, player, deadline, table, max_branching=MAX_BRANCHING):
+        self.board = board
+        self.root_player = player
+        self.deadline = deadline
+        self.table = table
+        self.max_branching = max_branching
+        self.nodes = 0
+        self.history = {}
+
+    def evaluate(self, player):
+        scores = self.board.scores
+        other = KRZYZYK if player == KOLKO else KOLKO
+        return int(scores[player] - scores[other] * DEFENCE_WEIGHT)
+
+    def ordered_moves(self, player, tt_move):
+        board = self.board
+        other = KRZYZYK if player == KOLKO else KOLKO
+        candidates = _neighbourhood(board)
+        if not candidates:
+            empties = [i for i, v in enumerate(board.cells) if v == EMPTY]
+            centre = (board.size // 2) * board.size + board.size // 2
+            return sorted(empties, key=lambda i: i != centre)[:1]
+        # Priorytety z detektora zagrożeń: własne kontynuacje i blokady przeciwnika
+        bonus = {}
+        for threat in board.threats(player):
+            block = threat[7]
+            bonus[block] = bonus.get(block, 0) + 12 * threat[5] ** 2
+        for threat in board.threats(other):
+            block = threat[7]
+            bonus[block] = bonus.get(block, 0) + 10 * threat[5] ** 2
+        history = self.history
+        candidates.sort(key=lambda i: (i != tt_move, -(bonus.get(i, 0) + history.get(i, 0))))
+        return candidates
+
+    def negamax(self, depth, alpha, beta, player, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        board = self.board
+        other = KRZYZYK if player == KOLKO else KOLKO
+
+        # Wygrana w jednym ruchu kończy przeszukiwanie
+        if board.winning_moves(player):
+            return WIN_SCORE - ply
+        if board.is_full():
+            return 0
+
+        alpha_orig = alpha
+        key = board.hash ^ SIDE_KEYS[player]
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, flag = entry[2], entry[3]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                elif flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        forced = board.winning_moves(other)
+        if forced:
+            # Ruch wymuszony - blokujemy (przedłużenie bez zmniejszania głębokości)
+            moves = forced[:1] if len(forced) == 1 else forced
+            next_depth = depth if ply < 2 * DEFAULT_MAX_DEPTH else depth - 1
+        else:
+            if depth <= 0:
+                return self.evaluate(player)
+            moves = self.ordered_moves(player, tt_move)[:self.max_branching]
+            next_depth = depth - 1
+
+        best_score = -WIN_SCORE - 1
+        best_move = moves[0]
+        size = board.size
+        for idx in moves:
+            board.apply(idx // size, idx % size, player)
+            try:
+                score = -self.negamax(next_depth, -beta, -alpha, other, ply + 1)
+            finally:
+                board.undo()
+            if score > best_score:
+                best_score = score
+                best_move = idx
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[idx] = self.history.get(idx, 0) + depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    def search_root(self, depth, moves):
+        board = self.board
+        player = self.root_player
+        other = KRZYZYK if player == KOLKO else KOLKO
+        size = board.size
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move, best_score = moves[0], -WIN_SCORE - 1
+        scored = []
+        for idx in moves:
+            board.apply(idx // size, idx % size, player)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, other, 1)
+            finally:
+                board.undo()
+            scored.append((score, idx))
+            if score > best_score:
+                best_score, best_move = score, idx
+            alpha = max(alpha, score)
+        self.table.store(board.hash ^ SIDE_KEYS[player], depth, best_score, EXACT, best_move)
+        return best_move, best_score, scored
+
+
+def player_code(player):
+    """Kod gracza z nazwy ("krzyżyk"/"kółko") albo z kodu; nieznany gracz kończy się ValueError."""
+    if isinstance(player, str) and player in PLAYER_CODES:
+        return PLAYER_CODES[player]
+    if type(player) is int and player in (KRZYZYK, KOLKO):
+        return player
+    raise ValueError(f"Nieznany gracz: {player!r}")
+
+
+def forced_move(board, code):
+    """Ruch wymuszony, niewymagający przeszukiwania: (pole, ocena) - wygrana w jednym ruchu albo jedyna blokada - albo None."""
+    wins = board.winning_moves(code)
+    if wins:
+        return wins[0], WIN_SCORE
+    blocks = board.winning_moves(KRZYZYK if code == KOLKO else KOLKO)
+    if len(blocks) == 1:
+        return blocks[0], 0
+    return None
+
+
+def find_best_move(board, player="kółko", time_limit_ms=DEFAULT_TIME_MS, max_depth=DEFAULT_MAX_DEPTH,
+                   table=None):
+    """
+    Wyszukuje ruch dla gracza w zadanym limicie czasu (iteracyjne pogłębianie).
+
+    Przyjmuje obiekt Board albo listę wierszy. Zwraca SearchResult albo None,
+    jeśli na planszy nie ma wolnych pól. Zawsze zwraca ruch legalny - jeśli
+    limit czasu skończy się przed pierwszą iteracją, używany jest najlepiej
+    uszeregowany kandydat. Nieznany gracz kończy się ValueError.
+    """
+    start = time.perf_counter()
+    if not isinstance(board, Board):
+        board = Board.from_rows(board)
+    else:
+        board = board.copy()
+    code = player_code(player)
+    other = KRZYZYK if code == KOLKO else KOLKO
+    size = board.size
+    if board.is_full():
+        return None
+
+    def result(idx, score, depth, nodes):
+        row, col = divmod(idx, size)
+        return SearchResult(row, col, score, depth, nodes, (time.perf_counter() - start) * 1000)
+
+    # Ruchy wymuszone nie wymagają przeszukiwania
+    forced = forced_move(board, code)
+    if forced is not None:
+        return result(forced[0], forced[1], 0, 0)
+    blocks = board.winning_moves(other)
+
+    table = table if table is not None else default_table
+    table.new_search()
+    searcher = Searcher(board, code, start + time_limit_ms / 1000.0, table)
+    moves = blocks or searcher.ordered_moves(code, None)
+    best_move, best_score, best_depth = moves[0], 0, 0
+
+    for depth in range(1, max_depth + 1):
+        try:
+            move, score, scored = searcher.search_root(depth, moves)
+        except SearchTimeout:
+            break
+        best_move, best_score, best_depth = move, score, depth
+        # Najlepsze ruchy z poprzedniej iteracji sprawdzamy jako pierwsze
+        scored.sort(key=lambda item: -item[0])
+        moves = [idx for _, idx in scored]
+        if abs(score) >= WIN_SCORE - max_depth * 2:
+            break
+        if time.perf_counter() > searcher.deadline:
+            break
+
+    return result(best_move, best_score, best_depth, searcher.nodes)
@@ -1,7 +1,7 @@
 import * as THREE from 'three';
 import { OrbitControls } from 'three/addons/controls/OrbitControls.js';
 
-// Główny skrypt gry Kółko i Krzyżyk 3D 10x10
+// Główny skrypt gry Kółko i Krzyżyk 3D NxN (domyślnie 10x10, 5 w rzędzie)
 document.addEventListener('DOMContentLoaded', () => {
     // Add loading screen element
     const loadingScreen = document.createElement('div');
@@ -9,8 +9,11 @@ document.addEventListener('DOMContentLoaded', () => {
     loadingScreen.style.display = 'none';
     document.body.appendChild(loadingScreen);
 
-    // Konfiguracja gry
-    const BOARD_SIZE = 10;
+    // Konfiguracja gry - wariant z adresu strony, np. ?size=15&win=5 (serwer przyjmuje plansze do 25x25)
+    const gameParams = new URLSearchParams(window.location.search);
+    const BOARD_SIZE = readIntParam('size', 10, 3, 25);
+    const WIN_LENGTH = readIntParam('win', 5, 3, BOARD_SIZE); // Liczba znaków w rzędzie potrzebna do wygranej
+    const VIEW_SCALE = BOARD_SIZE / 10; // Odległość kamery rośnie z rozmiarem planszy
     const CELL_SIZE = 1;
     const CELL_GAP = 0.2;
     const BOARD_WIDTH = BOARD_SIZE * (CELL_SIZE + CELL_GAP) - CELL_GAP;
@@ -19,6 +22,12 @@ document.addEventListener('DOMContentLoaded', () => {
         KRZYŻYK: 'krzyżyk',
         KÓŁKO: 'kółko'
     };
+    // Komentarz AI strumieniowany przez SSE (tekst pojawia się na bieżąco, ruch zaraz po odczytaniu)
+    const AI_STREAMING = true;
+    // Ruch od razu z silnika serwera, komentarz AI dopływa w tle
+    const AI_ENGINE_FIRST = false;
+    // Sesja gry na serwerze - w każdej turze wysyłany jest tylko ostatni ruch gracza
+    const AI_SESSIONS = true;
 
     // Zmienne globalne
     let scene, camera, renderer, controls;
@@ -34,6 +43,14 @@ document.addEventListener('DOMContentLoaded', () => {
     let computerMoveInProgress = false; // Flaga blokująca interakcję podczas ruchu komputera
     let aiErrorCount = 0; // Licznik błędów AI
     let aiCommentaryEnabled = true; // Flaga wskazująca, czy AI jest włączone
+    let sessionId = null; // Identyfikator sesji gry na serwerze
+    let lastHumanMove = null; // Ostatni ruch gracza, jeszcze niewysłany do sesji
+
+    // Liczba całkowita z parametru adresu strony (poza zakresem - wartość domyślna)
+    function readIntParam(name, fallback, min, max) {
+        const value = parseInt(gameParams.get(name), 10);
+        return Number.isInteger(value) && value >= min && value <= max ? value : fallback;
+    }
 
     // Funkcja do ukrywania ekranu ładowania
     function hideLoadingScreen() {
@@ -67,7 +84,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // Kamera
         camera = new THREE.PerspectiveCamera(60, window.innerWidth / window.innerHeight, 0.1, 1000);
-        camera.position.set(0, 15, 20);
+        camera.position.set(0, 15 * VIEW_SCALE, 20 * VIEW_SCALE);
         camera.lookAt(0, 0, 0);
 
         // Renderer
@@ -275,6 +292,9 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Aktualizacja stanu planszy
         board[row][col] = currentPlayer;
+        if (currentPlayer === PLAYERS.KRZYŻYK) {
+            lastHumanMove = { row, col };
+        }
         
         // Dodanie modelu gracza
         const cell = getCellMesh(row, col);
@@ -304,18 +324,18 @@ document.addEventListener('DOMContentLoaded', () => {
             if (!aiUnavailable) {
                 if (currentPlayer === PLAYERS.KRZYŻYK) {
                     const messages = [
-                        `Kurwa! Przegrałem z takim noobem! Gracz KRZYŻYK (ten debil) właśnie wygrał. ${getBoardStateForAI()}`,
-                        `Ja pierdolę, jak mogłem przegrać z kimś tak beznadziejnym! ${getBoardStateForAI()}`,
-                        `Chuj ci w dupę KRZYŻYK, miałeś szczęście! Następnym razem cię rozjebię! ${getBoardStateForAI()}`
+                        `Kurwa! Przegrałem z takim noobem! Gracz KRZYŻYK (ten debil) właśnie wygrał.`,
+                        `Ja pierdolę, jak mogłem przegrać z kimś tak beznadziejnym!`,
+                        `Chuj ci w dupę KRZYŻYK, miałeś szczęście! Następnym razem cię rozjebię!`
                     ];
-                    getAICommentary(messages[Math.floor(Math.random() * messages.length)]);
+                    getAICommentary(messages[Math.floor(Math.random() * messages.length)], true);
                 } else {
                     const messages = [
-                        `HAHA! Wygrałem! Ssij pałę KRZYŻYK! ${getBoardStateForAI()}`,
-                        `Co jest kurwa?! Nie umiesz grać KRZYŻYK? Wracaj do piaskownicy! ${getBoardStateForAI()}`,
-                        `EZ! Get rekt nobie! Nawet moja babcia gra lepiej! ${getBoardStateForAI()}`
+                        `HAHA! Wygrałem! Ssij pałę KRZYŻYK!`,
+                        `Co jest kurwa?! Nie umiesz grać KRZYŻYK? Wracaj do piaskownicy!`,
+                        `EZ! Get rekt nobie! Nawet moja babcia gra lepiej!`
                     ];
-                    getAICommentary(messages[Math.floor(Math.random() * messages.length)]);
+                    getAICommentary(messages[Math.floor(Math.random() * messages.length)], true);
                 }
             } else {
                 const messages = [
@@ -333,9 +353,9 @@ document.addEventListener('DOMContentLoaded', () => {
             // Pobierz komentarz AI jeśli jest dostępne
             if (!aiUnavailable) {
                 const messages = [
-                    `Remis! Ciekawie toczy się ta gra! ${getBoardStateForAI()}`
+                    `Remis! Ciekawie toczy się ta gra!`
                 ];
-                getAICommentary(messages[Math.floor(Math.random() * messages.length)]);
+                getAICommentary(messages[Math.floor(Math.random() * messages.length)], true);
             } else {
                 document.getElementById('ai-message').textContent = "Remis! Dobra gra, obaj jesteście ciekawymi przeciwnikami!";
             }
@@ -355,14 +375,14 @@ document.addEventListener('DOMContentLoaded', () => {
                     if (currentPlayer === PLAYERS.KÓŁKO) {
                         // Kolej AI (KÓŁKO)
                         const messages = [
-                            `Ten debil KRZYŻYK wykonał ruch na [${row},${col}]. Teraz pokażę mu jak się gra! ${getBoardStateForAI()}`,
-                            `Co za chujowy ruch na [${row},${col}]! Zaraz go zajebię! ${getBoardStateForAI()}`,
-                            `HAHA! Co za noob! Postawił na [${row},${col}]! Teraz go wyrucha! ${getBoardStateForAI()}`
+                            `Ten debil KRZYŻYK wykonał ruch na [${row},${col}]. Teraz pokażę mu jak się gra!`,
+                            `Co za chujowy ruch na [${row},${col}]! Zaraz go zajebię!`,
+                            `HAHA! Co za noob! Postawił na [${row},${col}]! Teraz go wyrucha!`
                         ];
                         aiPrompt = messages[Math.floor(Math.random() * messages.length)];
                     }
                     
-                    getAICommentary(aiPrompt);
+                    getAICommentary(aiPrompt, true);
                 } else {
                     // Jeśli to jest ruch gracza, resetujemy flagę
                     computerMoveInProgress = false;
@@ -494,8 +514,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Sprawdzenie wygranej
     function checkWinner() {
-        const WIN_LENGTH = 5; // Liczba znaków w rzędzie potrzebna do wygranej
-        
         // Sprawdzenie poziomo
         for (let row = 0; row < BOARD_SIZE; row++) {
             for (let col = 0; col <= BOARD_SIZE - WIN_LENGTH; col++) {
@@ -625,6 +643,13 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         playerMarkers = [];
         
+        // Stara sesja na serwerze nie jest już potrzebna
+        if (sessionId) {
+            fetch(`/session/${sessionId}`, { method: 'DELETE' }).catch(() => {});
+        }
+        sessionId = null;
+        lastHumanMove = null;
+
         // Resetowanie stanu gry
         board = createEmptyBoard();
         currentPlayer = PLAYERS.KRZYŻYK;
@@ -655,9 +680,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // Przełączanie kamery
     function toggleCamera() {
         const positions = [
-            { x: 0, y: 15, z: 20 },
-            { x: 20, y: 5, z: 0 },
-            { x: 0, y: 20, z: 0 }
+            { x: 0, y: 15 * VIEW_SCALE, z: 20 * VIEW_SCALE },
+            { x: 20 * VIEW_SCALE, y: 5 * VIEW_SCALE, z: 0 },
+            { x: 0, y: 20 * VIEW_SCALE, z: 0 }
         ];
         
         const currentPosition = positions.shift();
@@ -675,63 +700,31 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    // Konwersja stanu planszy do formatu dla AI
-    function getBoardStateForAI() {
-        let state = "Stan planszy (KRZYŻYK - przeciwnik, KÓŁKO - Ty (kółko), . - puste pole):\n";
-        
-        // Dodanie nagłówka kolumn
-        state += "  ";
-        for (let col = 0; col < BOARD_SIZE; col++) {
-            state += col + " ";
-        }
-        state += "\n";
+    // Kompaktowy zapis planszy dla serwera: BOARD_SIZE*BOARD_SIZE znaków wierszami (. - puste, X, O)
+    // skip - pole zapisywane jako puste (plansza sprzed ruchu)
+    function getBoardStringForAI(skip = null) {
+        let state = "";
         
         for (let row = 0; row < BOARD_SIZE; row++) {
-            // Dodanie numeru wiersza
-            state += row + " ";
-            
             for (let col = 0; col < BOARD_SIZE; col++) {
-                state += board[row][col] || "." + " ";
-            }
-            state += "\n";
-        }
-        
-        // Analiza krytycznych zagrożeń
-        const criticalThreat = findCriticalThreats(PLAYERS.KRZYŻYK);
-        if (criticalThreat) {
-            state += "\nKRYTYCZNE ZAGROŻENIE: ";
-            
-            if (criticalThreat.criticalType === "sequence") {
-                state += `Przeciwnik ma ${criticalThreat.count} krzyżyków w rzędzie! Musisz zablokować ruch na (${criticalThreat.row},${criticalThreat.col}).`;
-            } else if (criticalThreat.criticalType === "gap_pattern") {
-                state += `Przeciwnik tworzy niebezpieczny wzorzec ${criticalThreat.pattern}! Musisz zablokować ruch na (${criticalThreat.row},${criticalThreat.col}).`;
-            }
-        }
-        
-        // Dodanie informacji o dostępnych ruchach
-        state += "\nDostępne ruchy (wiersz,kolumna):\n";
-        let availableMoves = [];
-        
-        for (let row = 0; row < BOARD_SIZE; row++) {
-            for (let col = 0; col < BOARD_SIZE; col++) {
-                if (board[row][col] === PLAYERS.NONE) {
-                    availableMoves.push(`${row},${col}`);
+                if (skip && skip.row === row && skip.col === col) {
+                    state += ".";
+                } else if (board[row][col] === PLAYERS.KRZYŻYK) {
+                    state += "X";
+                } else if (board[row][col] === PLAYERS.KÓŁKO) {
+                    state += "O";
+                } else {
+                    state += ".";
                 }
             }
         }
         
-        state += availableMoves.join(" | ");
-        
-        // Dodanie instrukcji dla AI
-        state += "\n\nPodaj swój ruch w formacie RUCH:[wiersz],[kolumna], np. RUCH:1,2";
-        state += "\nPamiętaj, że mówisz jako kółko (KÓŁKO) i obrażasz swojego przeciwnika (KRZYŻYK). Twój komentarz ma być zabawny, wulgarny i obraźliwy wobec gracza KRZYŻYK.";
-        state += "\nPAMIĘTAJ: Nawiąż w swoim komentarzu do polskich polityków i aktualnych wydarzeń politycznych w Polsce! Twórz porównania z politykami i partiami.";
-        
         return state;
     }
 
     // Funkcja pobierająca komentarz od AI
-    function getAICommentary(prompt) {
+    // withBoard - dołącz stan planszy (serwer sam zbuduje z niego opis planszy w prompcie)
+    function getAICommentary(prompt, withBoard = false) {
         if (aiUnavailable) {
             console.warn("AI jest niedostępne lub wyłączone.");
             // Ukryj spinner ładowania
@@ -764,13 +757,29 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         
         // Wywołaj API serwera
-        fetch('/get-ai-commentary', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ prompt: prompt }),
-        })
+        let sendRequest;
+        if (withBoard && AI_SESSIONS && lastHumanMove) {
+            // Sesja na serwerze: wysyłamy tylko ostatni ruch gracza
+            const move = lastHumanMove;
+            lastHumanMove = null;
+            sendRequest = (stream) => postSessionMove(prompt, move, stream);
+        } else {
+            const payload = { prompt: prompt };
+            if (withBoard) {
+                payload.board = getBoardStringForAI();
+                payload.win_length = WIN_LENGTH;
+            }
+            sendRequest = (stream) => stream
+                ? postJSON('/get-ai-commentary-stream', Object.assign({ engine_first: AI_ENGINE_FIRST }, payload))
+                : postJSON('/get-ai-commentary', payload);
+        }
+
+        if (AI_STREAMING && window.ReadableStream) {
+            streamAICommentary(sendRequest(true));
+            return;
+        }
+
+        sendRequest(false)
         .then(response => {
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
@@ -809,32 +818,168 @@ document.addEventListener('DOMContentLoaded', () => {
             // Zakończenie ruchu komputera
             computerMoveInProgress = false;
         })
-        .catch(error => {
-            console.error('Błąd podczas pobierania komentarza AI:', error);
-            
-            // Ukryj spinner ładowania
+        .catch(handleAIError);
+    }
+
+    function postJSON(url, body) {
+        return fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(body),
+        });
+    }
+
+    // Ruch gracza w sesji serwera. Gdy sesji nie ma (nowa gra, wygasła, plansza się rozjechała),
+    // tworzymy nową z planszy sprzed ruchu i ponawiamy ruch
+    function postSessionMove(prompt, move, stream, retry = true) {
+        const body = { row: move.row, col: move.col, prompt: prompt, stream: stream, engine_first: AI_ENGINE_FIRST };
+        const ready = sessionId
+            ? Promise.resolve(sessionId)
+            : postJSON('/session', { board: getBoardStringForAI(move), win_length: WIN_LENGTH })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! Status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(data => (sessionId = data.session_id));
+        return ready
+            .then(id => postJSON(`/session/${id}/move`, body))
+            .then(response => {
+                if ((response.status === 404 || response.status === 409) && retry) {
+                    console.warn("Sesja gry wygasła lub jest nieaktualna - tworzę nową.");
+                    sessionId = null;
+                    return postSessionMove(prompt, move, stream, false);
+                }
+                return response;
+            });
+    }
+
+    // Obsługa błędu komunikacji z AI - komputer gra samodzielnie
+    function handleAIError(error) {
+        console.error('Błąd podczas pobierania komentarza AI:', error);
+
+        // Ukryj spinner ładowania
+        document.getElementById('loading-indicator').style.display = 'none';
+
+        // Ustawienie komunikatu o błędzie
+        document.getElementById('ai-message').textContent = "Błąd komunikacji z AI. Gram samodzielnie!";
+
+        // Wykonaj ruch komputera lokalnie w przypadku błędu
+        if (currentPlayer === PLAYERS.KÓŁKO && gameActive) {
+            simpleComputerMove();
+        }
+
+        // Oznacz AI jako niedostępne po kilku nieudanych próbach
+        aiErrorCount++;
+        if (aiErrorCount >= 3) {
+            console.warn("Zbyt wiele błędów AI. Przełączanie na lokalne obliczenia.");
+            aiUnavailable = true;
+        }
+
+        // Zakończenie ruchu komputera
+        computerMoveInProgress = false;
+    }
+
+    // Strumieniowa wersja getAICommentary: komentarz dopisywany na bieżąco (zdarzenia "token"),
+    // ruch wykonywany od razu po zdarzeniu "move", bez czekania na koniec odpowiedzi
+    function streamAICommentary(responsePromise) {
+        const messageElement = document.getElementById('ai-message');
+        let moveHandled = false;
+        let finished = false;
+
+        // Wykonaj ruch AI (albo ruch lokalny, jeśli AI nie podało poprawnego ruchu)
+        const handleMove = (aiMove) => {
+            if (moveHandled) {
+                return;
+            }
+            moveHandled = true;
             document.getElementById('loading-indicator').style.display = 'none';
-            
-            // Ustawienie komunikatu o błędzie
-            document.getElementById('ai-message').textContent = "Błąd komunikacji z AI. Gram samodzielnie!";
-            
-            // Wykonaj ruch komputera lokalnie w przypadku błędu
-            if (currentPlayer === PLAYERS.KÓŁKO && gameActive) {
-                simpleComputerMove();
+            if (currentPlayer !== PLAYERS.KÓŁKO || !gameActive) {
+                computerMoveInProgress = false;
+                return;
             }
-            
-            // Oznacz AI jako niedostępne po kilku nieudanych próbach
-            aiErrorCount++;
-            if (aiErrorCount >= 3) {
-                console.warn("Zbyt wiele błędów AI. Przełączanie na lokalne obliczenia.");
-                aiUnavailable = true;
+            if (aiMove && isValidMove(aiMove.row, aiMove.col)) {
+                console.log("Wykonuję ruch AI:", aiMove);
+                makeMove(aiMove.row, aiMove.col);
+            } else {
+                console.warn("AI nie podało prawidłowego ruchu:", aiMove);
+                simpleComputerMove();
             }
-            
-            // Zakończenie ruchu komputera
             computerMoveInProgress = false;
+        };
+
+        const handleEvent = (event, data) => {
+            if (event === 'token') {
+                if (!messageElement.dataset.streaming) {
+                    messageElement.dataset.streaming = '1';
+                    messageElement.textContent = '';
+                }
+                messageElement.textContent += data.text;
+            } else if (event === 'move') {
+                console.log(`Ruch AI (${data.source}) po otrzymaniu strumienia:`, data);
+                handleMove(data);
+            } else if (event === 'done') {
+                finished = true;
+                console.log(`Komentarz AI: pierwszy token ${data.ttft_ms} ms, ruch ${data.time_to_move_ms} ms`);
+                delete messageElement.dataset.streaming;
+                messageElement.textContent = data.commentary || "Nie mam komentarza...";
+                handleMove(data.ai_move);
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        };
+
+        responsePromise
+        .then(async response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! Status: ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                // Zdarzenia SSE są rozdzielone pustą linią
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let event = 'message';
+                    let data = '';
+                    for (const line of block.split('\n')) {
+                        if (line.startsWith('event:')) {
+                            event = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            data += line.slice(5).trim();
+                        }
+                    }
+                    if (data) {
+                        handleEvent(event, JSON.parse(data));
+                    }
+                }
+            }
+            if (!finished) {
+                throw new Error("Strumień AI zakończył się przedwcześnie");
+            }
+        })
+        .catch(error => {
+            delete messageElement.dataset.streaming;
+            if (moveHandled) {
+                // Ruch już wykonany - brakuje tylko komentarza
+                console.error('Błąd podczas strumieniowania komentarza AI:', error);
+                return;
+            }
+            handleAIError(error);
         });
     }
-    
+
     // Sprawdź czy ruch jest prawidłowy
     function isValidMove(row, col) {
         return row >= 0 && row < BOARD_SIZE && 
@@ -854,6 +999,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         
         computerMoveInProgress = true;
+        // Ruch lokalny nie trafia do sesji na serwerze - w następnej turze powstanie nowa
+        sessionId = null;
         
         // Opóźnienie ruchu komputera dla lepszego efektu
         setTimeout(() => {
@@ -875,8 +1022,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     return;
                 }
                 
-                // Sprawdź, czy są potencjalne zagrożenia (linie z 3 znakami przeciwnika)
-                const threatMove = findThreatsToBlock(PLAYERS.KRZYŻYK, 3);
+                // Sprawdź, czy są potencjalne zagrożenia (linie z 3 znakami przeciwnika, ogólnie WIN_LENGTH - 2)
+                const threatMove = findThreatsToBlock(PLAYERS.KRZYŻYK, WIN_LENGTH - 2);
                 if (threatMove) {
                     console.log("Blokuję zagrożenie 3+ znaków w rzędzie!", threatMove);
                     // Dodaj informację o zablokowaniu do komentarza AI
@@ -893,15 +1040,15 @@ document.addEventListener('DOMContentLoaded', () => {
                     return;
                 }
                 
-                // Sprawdź, czy można stworzyć linię 4 własnych znaków
-                const fourInARowMove = findPotentialLines(PLAYERS.KÓŁKO, 4);
+                // Sprawdź, czy można stworzyć linię 4 własnych znaków (jeden ruch przed wygraną)
+                const fourInARowMove = findPotentialLines(PLAYERS.KÓŁKO, WIN_LENGTH - 1);
                 if (fourInARowMove) {
                     makeMove(fourInARowMove.row, fourInARowMove.col);
                     return;
                 }
                 
                 // Sprawdź zagrożenia liniami z 2 znakami przeciwnika z otwartymi końcami
-                const earlyThreatMove = findThreatsToBlock(PLAYERS.KRZYŻYK, 2, true);
+                const earlyThreatMove = findThreatsToBlock(PLAYERS.KRZYŻYK, Math.max(2, WIN_LENGTH - 3), true);
                 if (earlyThreatMove) {
                     makeMove(earlyThreatMove.row, earlyThreatMove.col);
                     return;
@@ -1075,7 +1222,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     let count = 1; // Zaczynamy od 1 dla aktualnej pozycji
                     
                     // Sprawdź ile jest symboli w rzędzie w tym kierunku
-                    for (let i = 1; i < 5; i++) {
+                    for (let i = 1; i < WIN_LENGTH; i++) {
                         const r = row + dir.dr * i;
                         const c = col + dir.dc * i;
                         
@@ -1088,8 +1235,8 @@ document.addEventListener('DOMContentLoaded', () => {
                         }
                     }
                     
-                    // Jeśli mamy 3 lub więcej, sprawdź czy możemy zablokować na końcu
-                    if (count >= 3) {
+                    // Jeśli mamy 3 lub więcej (ogólnie WIN_LENGTH - 2), sprawdź czy możemy zablokować na końcu
+                    if (count >= Math.max(2, WIN_LENGTH - 2)) {
                         // Sprawdź miejsce po sekwencji
                         const blockRow = row + dir.dr * count;
                         const blockCol = col + dir.dc * count;
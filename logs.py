@@ -0,0 +1,99 @@
+"""
+Konfiguracja logowania serwera.
+
+LOG_LEVEL (domyślnie INFO) ustala poziom - treść promptów i odpowiedzi AI
+trafia do logów tylko na poziomie DEBUG. LOG_FORMAT=json zapisuje każdy wpis
+jako jeden obiekt JSON (czas, poziom, logger, komunikat i pola przekazane
+w extra=...), domyślny format "text" dopisuje te pola jako klucz=wartość.
+
+Wpisy trafiają do kolejki, a na stderr zapisuje je wątek w tle, więc
+obsługa zapytania nie czeka na wypisanie logów.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+
+# Standardowe atrybuty wpisu - pozostałe pochodzą z extra=...
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def formatMessage(self, record):
+        # Pola z extra=... przed ewentualnym śladem wyjątku
+        text = super().formatMessage(record)
+        extra = _extra_fields(record)
+        if extra:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in extra.items())
+        return text
+
+
+class _StderrHandler(logging.StreamHandler):
+    """Pisze do bieżącego sys.stderr (także podmienionego, np. w benchmarkach)."""
+
+    def __init__(self):
+        super().__init__(sys.stderr)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Formatowanie (także wyjątku) należy do wątku w tle - wpis trafia do kolejki bez zmian
+        return record
+
+
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Ustawia logowanie przez kolejkę i wątek w tle (wywołania po pierwszym są ignorowane)."""
+    global _listener
+    if _listener is not None:
+        return
+    handler = _StderrHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root = logging.getLogger()
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level)
+    # httpx loguje każde zapytanie do AI na poziomie INFO - zostawiamy to dla DEBUG
+    if root.getEffectiveLevel() > logging.DEBUG:
+        logging.getLogger('httpx').setLevel(logging.WARNING)
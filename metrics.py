@@ -0,0 +1,160 @@
+"""
+Metryki serwera w formacie tekstowym Prometheusa (/metrics).
+
+Histogramy czasów etapów obsługi zapytania i liczniki są trzymane w procesie
+(bez prometheus_client). Wartości liczone przez inne moduły (cache pozycji,
+tokeny, sesje, limit zapytań do AI) są odczytywane przy każdym odczycie
+/metrics przez zarejestrowane funkcje - add_collector(funkcja), gdzie funkcja
+zwraca krotki (nazwa, typ, opis, [(etykiety, wartość), ...]).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Granice przedziałów histogramu czasów (s): od 0,1 ms (analiza planszy) do minuty (odpowiedź AI)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+    """Licznik (rosnący) z etykietami."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram:
+    """Histogram wartości (np. czasów w sekundach) z etykietami i stałymi granicami przedziałów."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Etykiety -> [liczności przedziałów (bez kumulacji), suma, liczba]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mierzy czas wykonania bloku (także zakończonego wyjątkiem)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items())
+        result = []
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                result.append((self.name + '_bucket', dict(labels, le=_format_value(float(bound))), cumulative))
+            result.append((self.name + '_sum', labels, total))
+            result.append((self.name + '_count', labels, count))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        """Wszystkie metryki w formacie tekstowym Prometheusa (wersja 0.0.4)."""
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+
+        for metric in self.metrics:
+            family(metric.name, metric.kind, metric.help, metric.samples())
+        for collect in self.collectors:
+            for name, kind, help, values in collect():
+                family(name, kind, help, [(name, labels, value) for labels, value in values])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'ttt_request_seconds', 'Czas odpowiedzi z komentarzem AI (s) według trybu (json, stream) i źródła ruchu',
+    ('mode', 'source'))
+STAGE_SECONDS = registry.histogram(
+    'ttt_stage_seconds', 'Czas etapów obsługi zapytania (s)', ('stage',))
+UPSTREAM_ERRORS = registry.counter(
+    'ttt_upstream_errors_total', 'Błędy zapytań do AI według rodzaju', ('error',))
+FALLBACK_MOVES = registry.counter(
+    'ttt_fallback_moves_total', 'Ruchy awaryjne: engine - ruch silnika, center - pole 5,5 (brak planszy)', ('kind',))
+
+
+def stage(name):
+    """Kontekst mierzący czas etapu name w histogramie ttt_stage_seconds."""
+    return STAGE_SECONDS.time(stage=name)
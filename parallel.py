@@ -0,0 +1,227 @@
+"""
+Przeszukiwanie i analiza zagrożeń na puli procesów.
+
+Silnik (engine.py) i find_threats to obliczenia CPU, a w jednym procesie
+serwera GIL pozwala im korzystać tylko z jednego rdzenia. SearchPool
+uruchamia SEARCH_WORKERS procesów i rozgrzewa je przy starcie (importy,
+geometria planszy, tablica transpozycji), więc koszt startu nie trafia do
+zapytań.
+
+Przeszukiwanie dzieli ruchy korzenia między procesy: każda iteracja
+pogłębiania rozsyła ruchy (na zmianę, od najlepszych z poprzedniej iteracji),
+procesy dzielą przez pamięć współdzieloną najlepszą dotąd ocenę jako dolne
+ograniczenie okna alpha-beta, a wyniki są scalane. Iteracja niedokończona
+przed upływem limitu czasu jest odrzucana, jak w find_best_move.
+
+SEARCH_WORKERS=0 (domyślnie) wyłącza pulę - serwer liczy wszystko w swoim procesie.
+Analiza zagrożeń do promptu trafia do puli tylko z SEARCH_ANALYSIS_IN_POOL=1.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from board import BOARD_SIZE, KOLKO, KRZYZYK, Board, find_threats
+from engine import (DEFAULT_MAX_DEPTH, DEFAULT_TIME_MS, WIN_SCORE, SearchResult, SearchTimeout, Searcher,
+                    default_table, find_best_move, forced_move, player_code)
+
+log = logging.getLogger(__name__)
+
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', 0))
+# forkserver: procesy powstają z czystego procesu pomocniczego, a nie z wielowątkowego serwera
+SEARCH_START_METHOD = os.getenv('SEARCH_START_METHOD', 'forkserver')
+# Analiza zagrożeń do promptu w puli - pojedyncza analiza trwa krócej niż przesłanie planszy
+# między procesami, więc opłaca się tylko przy wielu rdzeniach i dużej współbieżności
+SEARCH_ANALYSIS_IN_POOL = os.getenv('SEARCH_ANALYSIS_IN_POOL', '0') == '1'
+
+# Liczba jednoczesnych przeszukiwań - każde ma własne miejsce na wspólne ograniczenie
+BOUND_SLOTS = 64
+NO_BOUND = -WIN_SCORE - 1
+# Zapas na przesłanie wyników z procesów po upływie limitu czasu (s)
+RESULT_SLACK_S = 0.05
+
+_bounds = None  # W procesie roboczym: współdzielona tablica ograniczeń
+
+
+def _init_worker(bounds):
+    global _bounds
+    _bounds = bounds
+
+
+def _warm_up(size):
+    board = Board(size)
+    board.apply(size // 2, size // 2, 'krzyżyk')
+    find_best_move(board, 'kółko', time_limit_ms=50, max_depth=2)
+    return os.getpid()
+
+
+def _search_moves(board_text, win_length, code, moves, depth, time_ms, slot):
+    """Ocenia ruchy korzenia na głębokość depth; zwraca (oceny, węzły, czy zdążono przed limitem)."""
+    board = Board.from_string(board_text, win_length)
+    other = KRZYZYK if code == KOLKO else KOLKO
+    default_table.new_search()
+    searcher = Searcher(board, code, time.perf_counter() + time_ms / 1000.0, default_table)
+    size = board.size
+    beta = WIN_SCORE + 1
+    best = NO_BOUND
+    scored = []
+    try:
+        for idx in moves:
+            # Okno zawężone najlepszą oceną ze wszystkich procesów; -1, żeby ruch równy
+            # najlepszemu dostał dokładną ocenę, a nie ograniczenie z góry
+            alpha = max(best, _bounds[slot]) - 1
+            board.apply(idx // size, idx % size, code)
+            try:
+                score = -searcher.negamax(depth - 1, -beta, -alpha, other, 1)
+            finally:
+                board.undo()
+            scored.append((score, idx))
+            if score > best:
+                best = score
+                with _bounds.get_lock():
+                    if score > _bounds[slot]:
+                        _bounds[slot] = score
+    except SearchTimeout:
+        return scored, searcher.nodes, False
+    return scored, searcher.nodes, True
+
+
+def _analyse(board_text, win_length, limit):
+    board = Board.from_string(board_text, win_length)
+    return find_threats(board, 'krzyżyk')[:limit], find_threats(board, 'kółko')[:limit]
+
+
+class SearchPool:
+    """Pula procesów do przeszukiwania (podział ruchów korzenia) i analizy zagrożeń."""
+
+    def __init__(self, workers=SEARCH_WORKERS, start_method=SEARCH_START_METHOD):
+        context = multiprocessing.get_context(start_method)
+        self.workers = workers
+        self._bounds = context.Array('q', BOUND_SLOTS)
+        self._free_slots = list(range(BOUND_SLOTS))
+        self._slots_available = threading.Semaphore(BOUND_SLOTS)
+        self._slots_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._bounds,))
+        # Zlecone zadania - shutdown anuluje te, które jeszcze czekają
+        self._tasks = weakref.WeakSet()
+
+    def _submit(self, fn, *args):
+        task = self._executor.submit(fn, *args)
+        self._tasks.add(task)
+        return task
+
+    def warm_up(self, size=BOARD_SIZE):
+        """Uruchamia procesy i wykonuje w nich krótkie przeszukiwanie; zwraca liczbę gotowych procesów."""
+        tasks = [self._submit(_warm_up, size) for _ in range(self.workers)]
+        return len({task.result() for task in tasks})
+
+    def analyse(self, board, limit):
+        """Zagrożenia obu graczy (top limit) policzone w procesie roboczym - jak analyse_board w serwerze."""
+        return self._submit(_analyse, board.to_string(), board.win_length, limit).result()
+
+    def find_best_move(self, board, player='kółko', time_limit_ms=DEFAULT_TIME_MS, max_depth=DEFAULT_MAX_DEPTH):
+        """Odpowiednik engine.find_best_move z ruchami korzenia rozdzielonymi między procesy."""
+        start = time.perf_counter()
+        deadline = start + time_limit_ms / 1000.0
+        if not isinstance(board, Board):
+            board = Board.from_rows(board)
+        code = player_code(player)
+        other = KRZYZYK if code == KOLKO else KOLKO
+        size = board.size
+        if board.is_full():
+            return None
+
+        def result(idx, score, depth, nodes):
+            row, col = divmod(idx, size)
+            return SearchResult(row, col, score, depth, nodes, (time.perf_counter() - start) * 1000)
+
+        forced = forced_move(board, code)
+        if forced is not None:
+            return result(forced[0], forced[1], 0, 0)
+        moves = board.winning_moves(other) or Searcher(board, code, deadline, default_table).ordered_moves(code, None)
+        best_move, best_score, best_depth, nodes = moves[0], 0, 0, 0
+        board_text = board.to_string()
+
+        slot = self._acquire_slot()
+        try:
+            for depth in range(1, max_depth + 1):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._bounds[slot] = NO_BOUND
+                order = {idx: i for i, idx in enumerate(moves)}
+                chunks = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+                tasks = [self._submit(_search_moves, board_text, board.win_length, code, chunk, depth,
+                                      remaining * 1000, slot)
+                         for chunk in chunks]
+                done, pending = wait(tasks, timeout=remaining + RESULT_SLACK_S)
+                for task in pending:
+                    task.cancel()
+                results = [task.result() for task in done]
+                nodes += sum(result_nodes for _, result_nodes, _ in results)
+                if pending or not all(complete for _, _, complete in results):
+                    break
+                # Remisy rozstrzyga kolejność ruchów, jak w przeszukiwaniu w jednym procesie
+                scored = sorted((item for chunk_scores, _, _ in results for item in chunk_scores),
+                                key=lambda item: (-item[0], order[item[1]]))
+                best_score, best_move = scored[0]
+                best_depth = depth
+                moves = [idx for _, idx in scored]
+                if abs(best_score) >= WIN_SCORE - max_depth * 2:
+                    break
+        finally:
+            self._release_slot(slot)
+
+        return result(best_move, best_score, best_depth, nodes)
+
+    def _acquire_slot(self):
+        self._slots_available.acquire()
+        with self._slots_lock:
+            return self._free_slots.pop()
+
+    def _release_slot(self, slot):
+        with self._slots_lock:
+            self._free_slots.append(slot)
+        self._slots_available.release()
+
+    def shutdown(self):
+        # Executor.shutdown(cancel_futures=True) jest dopiero od Pythona 3.9
+        for task in list(self._tasks):
+            task.cancel()
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_search_pool():
+    """Zwraca wspólną pulę (tworzoną i rozgrzewaną przy pierwszym użyciu) albo None, gdy SEARCH_WORKERS=0."""
+    global _pool
+    if SEARCH_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = SearchPool()
+                started = time.perf_counter()
+                ready = pool.warm_up()
+                log.info("Pula przeszukiwania: %d/%d procesów gotowych w %.0f ms",
+                         ready, pool.workers, (time.perf_counter() - started) * 1000)
+                atexit.register(pool.shutdown)
+                _pool = pool
+    return _pool
+
+
+def search_move(board, player='kółko', time_limit_ms=DEFAULT_TIME_MS):
+    """Ruch silnika - na puli procesów, jeśli jest włączona, w przeciwnym razie w bieżącym procesie."""
+    pool = get_search_pool()
+    if pool is not None:
+        return pool.find_best_move(board, player, time_limit_ms)
+    return find_best_move(board, player, time_limit_ms=time_limit_ms)
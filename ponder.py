@@ -0,0 +1,291 @@
+"""
+Przewidywanie odpowiedzi gracza ("ponder"), zanim gracz wykona ruch.
+
+Po ruchu AI serwer szereguje najbardziej prawdopodobne odpowiedzi krzyżyka
+(analizą zagrożeń find_threats) i w wątkach w tle liczy odpowiedź AI dla
+PONDER_TOP_K z nich - ruchem silnika, a z PONDER_LLM=1 zapytaniem do modelu
+(tylko gdy serwer nie jest zajęty). Jeśli gracz zagra przewidziany ruch,
+odpowiedź jest gotowa od razu.
+
+Zadanie przewidywania należy do pozycji po ruchu AI (jednej na grę), więc
+działa tak samo dla sesji, jak i dla /get-ai-commentary z planszą. Kolejny
+ruch w tej grze kończy zadanie i anuluje resztę pracy. Liczbę zadań ogranicza
+PONDER_MAX_JOBS (najstarsze są anulowane), a liczbę pozycji w kolejce -
+PONDER_MAX_PENDING.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from board import EMPTY, KOLKO, KRZYZYK, find_threats
+
+# Liczba przewidywanych odpowiedzi gracza po każdym ruchu AI (0 wyłącza przewidywanie)
+PONDER_TOP_K = int(os.getenv('PONDER_TOP_K', 0))
+# Odpowiedzi z modelu zamiast samego ruchu silnika (kosztuje zapytania do AI)
+PONDER_LLM = os.getenv('PONDER_LLM', '0') == '1'
+# Limit czasu silnika dla przewidywanej pozycji (ms)
+PONDER_MOVE_TIME_MS = int(os.getenv('PONDER_MOVE_TIME_MS', 200))
+# Wątki liczące odpowiedzi w tle (silnik liczy w puli procesów, jeśli SEARCH_WORKERS > 0 -
+# wtedy przewidywanie nie zabiera GIL-a obsłudze zapytań)
+PONDER_THREADS = int(os.getenv('PONDER_THREADS', 1))
+# Maksymalna liczba gier z zadaniem przewidywania i pozycji czekających na obliczenie
+PONDER_MAX_JOBS = int(os.getenv('PONDER_MAX_JOBS', 256))
+PONDER_MAX_PENDING = int(os.getenv('PONDER_MAX_PENDING', 64))
+
+# Komentarze do ruchu silnika, gdy gracz zagrał przewidziany ruch
+PONDER_COMMENTS = (
+    "Wiedziałem, że tak zagrasz - jesteś przewidywalny jak orędzie prezydenta w Sylwestra!",
+    "Ten ruch miałem policzony, zanim w ogóle kliknąłeś. Myślisz wolniej niż Sejm uchwala budżet.",
+    "Przewidziałem to szybciej niż sondaże wynik wyborów. Masz tu gotową odpowiedź!",
+    "Grasz według schematu jak rzecznik rządu na konferencji - odpowiedź czekała na Ciebie.",
+)
+
+log = logging.getLogger(__name__)
+
+# Odpowiedź policzona z wyprzedzeniem i czas jej liczenia - przy trafieniu ten czas nie obciąża zapytania
+PonderedReply = namedtuple('PonderedReply', 'commentary ai_move source compute_ms')
+
+
+def ponder_comment(board):
+    return PONDER_COMMENTS[board.hash % len(PONDER_COMMENTS)]
+
+
+def predict_replies(board, k):
+    """
+    Najbardziej prawdopodobne ruchy krzyżyka (indeksy pól) - od najpewniejszego.
+
+    Najpierw blokada wygranej kółka, potem pola blokady i kontynuacji linii
+    z find_threats - najpierw najdłuższej linii, przy równych liniach według
+    sumy wag (jak w porządkowaniu ruchów silnika), a na koniec pola najbliżej
+    ostatniego ruchu. Ruchy, po których krzyżyk wygrywa, są pomijane - po nich
+    AI już nie odpowiada.
+    """
+    size = board.size
+    cells = board.cells
+    wins = set(board.winning_moves(KRZYZYK))
+    longest = {}
+    weights = {}
+    order = {}
+
+    def add(idx, count, weight):
+        if idx not in wins and cells[idx] == EMPTY:
+            order.setdefault(idx, len(order))
+            longest[idx] = max(longest.get(idx, 0), count)
+            weights[idx] = weights.get(idx, 0) + weight
+
+    for idx in board.winning_moves(KOLKO):
+        add(idx, board.win_length, 0)
+    for threat in find_threats(board, 'krzyżyk'):
+        add(threat['block_row'] * size + threat['block_col'], threat['count'], 12 * threat['count'] ** 2)
+    for threat in find_threats(board, 'kółko'):
+        add(threat['block_row'] * size + threat['block_col'], threat['count'], 10 * threat['count'] ** 2)
+    ranked = sorted(order, key=lambda idx: (-longest[idx], -weights[idx], order[idx]))[:k]
+
+    if len(ranked) < k:
+        # Brak zagrożeń (np. w otwarciu) - gracz zwykle gra obok ostatniego ruchu
+        anchor = board.moves[-1] if board.moves else (size // 2) * size + size // 2
+        row, col = divmod(anchor, size)
+        near = [r * size + c
+                for r in range(max(0, row - 2), min(size, row + 3))
+                for c in range(max(0, col - 2), min(size, col + 3))]
+        near.sort(key=lambda idx: (max(abs(idx // size - row), abs(idx % size - col)), idx))
+        for idx in near:
+            if len(ranked) >= k:
+                break
+            if idx not in order and idx not in wins and cells[idx] == EMPTY:
+                ranked.append(idx)
+    return ranked
+
+
+class PonderJob:
+    """Przewidywanie dla jednej pozycji po ruchu AI: przewidziane pozycje i gotowe odpowiedzi."""
+
+    __slots__ = ('origin', 'predicted', 'replies', 'cancelled')
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.predicted = set()  # Zawartości plansz po przewidzianych ruchach gracza
+        self.replies = {}       # Zawartość planszy -> PonderedReply
+        self.cancelled = False
+
+
+class Ponderer:
+    """
+    Zadania przewidywania odpowiedzi i ich wyniki.
+
+    compute(plansza) liczy odpowiedź AI dla pozycji po ruchu gracza i zwraca
+    (komentarz, ruch, źródło) albo None; busy() zwraca True, gdy serwer jest
+    zajęty - wtedy praca w tle jest pomijana. Oba ustawia serwer.
+    """
+
+    def __init__(self, top_k=PONDER_TOP_K, max_jobs=PONDER_MAX_JOBS, max_pending=PONDER_MAX_PENDING,
+                 threads=PONDER_THREADS):
+        self.top_k = top_k
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.threads = threads
+        self.compute = None
+        self.busy = lambda: False
+        self.jobs = OrderedDict()  # (zawartość planszy po ruchu AI, długość wygranej) -> PonderJob, od najstarszego
+        self.lock = threading.Lock()
+        self.tasks = queue.SimpleQueue()
+        self.workers = []
+        self.pending = 0
+        self.scheduled = 0
+        self.computed = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.hits = 0
+        self.late = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    @property
+    def enabled(self):
+        return self.top_k > 0 and self.compute is not None
+
+    def schedule(self, board):
+        """Zleca przewidywanie odpowiedzi gracza w pozycji board (po ruchu AI)."""
+        if not self.enabled:
+            return
+        board = board.copy()
+        origin = (bytes(board.cells), board.win_length)
+        with self.lock:
+            if origin in self.jobs:
+                self.jobs.move_to_end(origin)
+                return
+            job = self.jobs[origin] = PonderJob(origin)
+            self.scheduled += 1
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)[1].cancelled = True
+            self._start_workers()
+        # Szeregowanie ruchów też odbywa się w tle - poza obsługą zapytania
+        self.tasks.put((self._plan, job, board))
+
+    def take(self, board):
+        """
+        Gotowa odpowiedź dla pozycji po ruchu gracza albo None.
+
+        Kończy zadanie gry, z której pochodzi pozycja (reszta pracy jest
+        anulowana), i liczy trafienia: hit - odpowiedź gotowa, late - ruch
+        przewidziany, ale jeszcze nie policzony, miss - ruch nieprzewidziany.
+        """
+        if not self.jobs:
+            return None
+        cells = bytearray(board.cells)
+        key = bytes(cells)
+        win_length = board.win_length
+        # Pozycja sprzed ruchu gracza: plansza bez jednego z krzyżyków (najpierw ostatniego ruchu)
+        candidates = [board.moves[-1]] if board.moves else []
+        candidates += [idx for idx, value in enumerate(cells) if value == KRZYZYK]
+        with self.lock:
+            job = None
+            for idx in candidates:
+                if cells[idx] != KRZYZYK:
+                    continue
+                cells[idx] = EMPTY
+                job = self.jobs.pop((bytes(cells), win_length), None)
+                cells[idx] = KRZYZYK
+                if job is not None:
+                    break
+            if job is None:
+                return None
+            job.cancelled = True
+            reply = job.replies.get(key)
+            if reply is not None:
+                self.hits += 1
+                self.saved_ms += reply.compute_ms
+            elif key in job.predicted:
+                self.late += 1
+            else:
+                self.misses += 1
+        return reply
+
+    def discard(self, board):
+        """Anuluje przewidywanie dla pozycji board (np. usunięta sesja)."""
+        with self.lock:
+            job = self.jobs.pop((bytes(board.cells), board.win_length), None)
+            if job is not None:
+                job.cancelled = True
+
+    def _start_workers(self):
+        while len(self.workers) < self.threads:
+            worker = threading.Thread(target=self._work, name=f'ponder-{len(self.workers)}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _work(self):
+        while True:
+            task, job, board = self.tasks.get()
+            try:
+                task(job, board)
+            except Exception:
+                log.exception("Błąd podczas przewidywania odpowiedzi")
+
+    def _plan(self, job, board):
+        if job.cancelled:
+            return
+        for idx in predict_replies(board, self.top_k):
+            after = board.copy()
+            after.apply(*divmod(idx, board.size), KRZYZYK)
+            with self.lock:
+                if job.cancelled:
+                    return
+                if self.pending >= self.max_pending:
+                    self.skipped += 1
+                    continue
+                self.pending += 1
+                job.predicted.add(bytes(after.cells))
+            self.tasks.put((self._compute, job, after))
+
+    def _compute(self, job, board):
+        try:
+            if job.cancelled:
+                with self.lock:
+                    self.cancelled += 1
+                return
+            if self.busy():
+                with self.lock:
+                    self.skipped += 1
+                return
+            started = time.perf_counter()
+            reply = self.compute(board)
+            if reply is None:
+                return
+            reply = PonderedReply(*reply, compute_ms=(time.perf_counter() - started) * 1000)
+            with self.lock:
+                if job.cancelled:
+                    self.cancelled += 1
+                else:
+                    job.replies[bytes(board.cells)] = reply
+                    self.computed += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.late + self.misses
+            return {
+                'top_k': self.top_k,
+                'llm': PONDER_LLM,
+                'jobs': len(self.jobs),
+                'pending': self.pending,
+                'scheduled': self.scheduled,
+                'computed': self.computed,
+                'cancelled': self.cancelled,
+                'skipped': self.skipped,
+                'hits': self.hits,
+                'late': self.late,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'saved_ms': round(self.saved_ms, 1),
+                'avg_saved_ms': round(self.saved_ms / self.hits, 1) if self.hits else 0.0,
+            }
+
+
+ponderer = Ponderer()
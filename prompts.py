@@ -0,0 +1,71 @@
+"""
+Budowanie promptu dla AI na podstawie planszy przesłanej w formie strukturalnej.
+
+Opis planszy generuje serwer (zamiast parsować tekst wygenerowany przez
+przeglądarkę), dzięki czemu format jest zawsze spójny z parserem.
+
+Plansza jest zapisywana zwięźle - jeden wiersz tekstu na wiersz planszy
+(.XO), bez listy wolnych pól, którą model może odczytać z samej planszy.
+Reguły stylu i strategii są w komunikacie systemowym (ai_client.SYSTEM_PROMPT),
+więc prompt ich nie powtarza - poza wierszem z zasadami partii, gdy rozmiar
+planszy albo długość wygranej różni się od domyślnych 10x10 i 5 w rzędzie.
+"""
+
+import re
+
+from board import BOARD_SIZE, WIN_LENGTH, Board
+
+BOARD_MARKER = "Plansza (X"
+BOARD_HEADER = "Plansza (X - przeciwnik, O - Ty, . - puste; wiersz, potem pola w kolumnach 0-{last}):"
+RULES_LINE = "Zasady tej partii: plansza {size}x{size}, wygrywa {win} w rzędzie."
+RULES_PATTERN = re.compile(r"Zasady tej partii: plansza \d+x\d+, wygrywa (\d+) w rzędzie\.")
+CELL_SYMBOLS = ".XO?"
+
+MOVE_INSTRUCTIONS = "\nNa końcu podaj ruch: RUCH:wiersz,kolumna"
+
+
+def format_board_state(board):
+    """Zwraca zwięzły opis planszy: nagłówek i po jednym wierszu tekstu na wiersz planszy."""
+    size = board.size
+    cells = board.cells
+    lines = [BOARD_HEADER.format(last=size - 1)]
+    if size != BOARD_SIZE or board.win_length != WIN_LENGTH:
+        lines.insert(0, RULES_LINE.format(size=size, win=board.win_length))
+    for row in range(size):
+        base = row * size
+        lines.append(f"{row} " + "".join(CELL_SYMBOLS[code] for code in cells[base:base + size]))
+    return "\n".join(lines)
+
+
+def read_board_state(prompt):
+    """
+    Odczytuje planszę zapisaną przez format_board_state: zwraca (napis .XO, długość wygranej
+    jako napis z wiersza zasad albo WIN_LENGTH) albo None, jeśli planszy nie ma.
+
+    Wartości nie są sprawdzane - zakresy rozmiaru i długości wygranej sprawdza wywołujący.
+    """
+    start = prompt.find(BOARD_MARKER)
+    if start == -1:
+        return None
+    rules = RULES_PATTERN.search(prompt, 0, start)
+    rows = []
+    for line in prompt[start:].split("\n")[1:]:
+        number, _, cells = line.partition(" ")
+        if not number.isdigit() or int(number) != len(rows) or not cells:
+            break
+        rows.append(cells.strip())
+    return "".join(rows), rules.group(1) if rules else WIN_LENGTH
+
+
+def parse_board_state(prompt):
+    """Odczytuje planszę zapisaną przez format_board_state; zwraca Board albo None, jeśli jej nie ma."""
+    state = read_board_state(prompt)
+    if state is None:
+        return None
+    text, win_length = state
+    return Board.from_string(text, int(win_length))
+
+
+def build_prompt(intro, board):
+    """Łączy wstęp (komentarz sytuacji z przeglądarki) z opisem planszy i instrukcjami ruchu."""
+    return f"{intro}\n{format_board_state(board)}{MOVE_INSTRUCTIONS}"
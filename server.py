@@ -1,7 +1,39 @@
-from flask import Flask, request, jsonify, send_from_directory
+from logs import configure_logging
+# Logowanie przed importem modułów, które piszą do logu już przy imporcie (klient AI, księga otwarć)
+configure_logging()
+
+from flask import Flask, Response, request, jsonify, send_from_directory
+import logging
 import os
-import sys
-from ai_client import get_ai_response
+import time
+from collections import namedtuple
+from ai_client import FALLBACK_MOVE, get_ai_response, latency, stream_ai_response, token_usage
+from board import BOARD_SIZE, EMPTY, MIN_WIN_LENGTH, PLAYER_CODES, WIN_LENGTH, Board, find_threats
+from book import book_comment, opening_book
+from cache import position_cache
+from metrics import FALLBACK_MOVES, REQUEST_SECONDS, registry, stage
+from parallel import SEARCH_ANALYSIS_IN_POOL, get_search_pool, search_move
+from ponder import PONDER_LLM, PONDER_MOVE_TIME_MS, ponder_comment, ponderer
+from prompts import BOARD_MARKER, build_prompt, read_board_state
+from sessions import ACTIVE, AI_PLAYER, HUMAN_PLAYER, sessions
+from streaming import LockedStream, MoveMarkerScanner, prefetch, sse_event
+
+# Limit czasu silnika ruchów (ms) - używany w /ai-move i jako ruch awaryjny
+AI_MOVE_TIME_MS = int(os.getenv('AI_MOVE_TIME_MS', 300))
+# Zakres limitu czasu, o który może poprosić klient /ai-move (pole time_ms)
+MIN_MOVE_TIME_MS = 1
+MAX_MOVE_TIME_MS = 5000
+
+# Wstęp promptu, gdy przeglądarka przysłała samą planszę
+DEFAULT_INTRO = "Twój ruch!"
+
+# Liczba zagrożeń i możliwości (każdego gracza) opisywanych w prompcie
+PROMPT_TOP_THREATS = int(os.getenv('PROMPT_TOP_THREATS', 3))
+
+# Największa plansza przyjmowana w zapytaniach i sesjach (NxN)
+MAX_BOARD_SIZE = int(os.getenv('MAX_BOARD_SIZE', 25))
+
+log = logging.getLogger(__name__)
 
 # Utwórz aplikację Flask z prawidłową konfiguracją dla plików statycznych
 app = Flask(__name__, static_folder='.', static_url_path='')
@@ -16,194 +48,681 @@ def static_files(path):
 
 @app.route('/get-ai-commentary', methods=['POST'])
 def get_ai_commentary():
+    started = time.perf_counter()
+    try:
+        try:
+            ai_request = prepare_ai_request(request.json or {})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        body, status = answer_ai_request(ai_request)
+        log_answer('/get-ai-commentary', body, status, started)
+        if status == 200:
+            ponder_after(ai_request.board, body['ai_move'])
+        return jsonify(body), status
+    except Exception as e:
+        error_details = f"Błąd podczas przetwarzania zapytania AI: {str(e)}"
+        log.exception(error_details)
+        return jsonify({'error': error_details}), 500
+
+def log_answer(path, body, status, started):
+    """Jeden wpis w logu (i pomiar czasu) na odpowiedź z komentarzem AI."""
+    source = 'error' if status != 200 else body.get('source', 'ai')
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(elapsed, mode='json', source=source)
+    log.info("%s %d", path, status, extra={'source': source, 'elapsed_ms': round(elapsed * 1000, 1)})
+
+def answer_ai_request(ai_request):
+    """Pobiera odpowiedź AI (albo z cache) i ustala ruch; zwraca (dane odpowiedzi, status HTTP)."""
+    if ai_request.cached is not None:
+        return cached_answer(ai_request)
+    
+    # Użycie funkcji z ai_client.py do pobrania odpowiedzi od AI
+    usage = {}
+    commentary = get_ai_response(ai_request.prompt, usage)
+    return finish_ai_answer(ai_request, commentary, usage)
+
+def cached_answer(ai_request):
+    """Odpowiedź bez zapytania do AI (księga otwarć, cache pozycji albo ruch awaryjny)."""
+    log.debug("Odpowiedź bez zapytania do AI (źródło: %s)", ai_request.source)
+    return {
+        'commentary': ai_request.cached[0],
+        'ai_move': ai_request.cached[1],
+        'source': ai_request.source
+    }, 200
+
+def finish_ai_answer(ai_request, commentary, usage):
+    """Ustala ruch z odpowiedzi AI i zapisuje ją w cache; zwraca (dane odpowiedzi, status HTTP)."""
+    board = ai_request.board
+    # Do cache trafiają tylko prawdziwe odpowiedzi modelu (nie komunikaty o błędach)
+    cacheable = board is not None and "Błąd:" not in commentary
+    
+    # Sprawdzenie, czy odpowiedź zawiera informację o błędzie
+    if "Błąd:" in commentary and "RUCH:" not in commentary:
+        error_details = commentary
+        log.error("Błąd AI: %s", error_details)
+        return {'error': error_details}, 500
+    
+    # Parsowanie ruchu z odpowiedzi AI
+    commentary, move_text = split_move_marker(commentary)
+    if move_text is not None:
+        cacheable = cacheable and move_text != FALLBACK_MOVE
+        ai_move, source = resolve_move(move_text, board)
+    else:
+        # Jeśli nie znaleziono markera RUCH:, ruch wybiera silnik
+        log.warning("Nie znaleziono markera RUCH: w odpowiedzi AI, ruch wybiera silnik")
+        ai_move, source = fallback_move(board), 'engine'
+    
+    # Jeśli commentary zawiera "Błąd", ale mamy ruch, usuń informację o błędzie z komentarza
+    if "Błąd:" in commentary and ai_move:
+        commentary = "Coś się zjebało z API, ale i tak zagram!"
+    
+    if cacheable:
+        position_cache.put_reply(board, commentary, ai_move, ai_request.canonical)
+    
+    return {
+        'commentary': commentary,
+        'ai_move': ai_move,
+        'source': source,
+        'usage': usage or None
+    }, 200
+
+@app.route('/get-ai-commentary-stream', methods=['POST'])
+def get_ai_commentary_stream():
+    """
+    Strumieniowa wersja /get-ai-commentary (Server-Sent Events).
+
+    Zdarzenia: "token" (fragment komentarza), "move" (ruch - wysyłany, gdy tylko
+    marker RUCH: zostanie odczytany, albo od razu z silnika przy "engine_first"),
+    "done" (pełny komentarz, ruch i czasy) oraz "error".
+    """
+    data = request.json or {}
+    try:
+        ai_request = prepare_ai_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events = generate_commentary_events(ai_request, bool(data.get('engine_first')))
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+class CommentaryEvents:
+    """
+    Zdarzenia SSE z komentarzem i ruchem AI, budowane z kolejnych fragmentów odpowiedzi.
+
+    Nie zależy od sposobu pobierania fragmentów - korzysta z niej generator
+    generate_commentary_events (wątki) i tryb asynchroniczny (asgi.py). Metody
+    zwracają listy zdarzeń; ustalenie ruchu (resolve_move, finish, engine_move)
+    może uruchomić silnik.
+
+    on_move(ruch, źródło) - wołane raz, gdy ruch jest znany (także None); zwraca
+    (ruch, źródło, dodatkowe pola) - może podmienić ruch, a dodatkowe pola trafiają
+    do zdarzeń "move" i "done" (np. stan gry w sesji).
+    """
+
+    def __init__(self, ai_request, on_move=None):
+        self.ai_request = ai_request
+        self.on_move = on_move
+        self.started = time.perf_counter()
+        self.extra = {}
+        self.usage = {}
+        self.scanner = MoveMarkerScanner()
+        self.ai_move = None
+        self.source = None
+        self.ttft_ms = self.time_to_move_ms = None
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def _settle(self, ai_move, source):
+        """Ustala ostateczny ruch; zwraca zdarzenie "move" (jeśli jest ruch)."""
+        if self.on_move is not None:
+            ai_move, source, fields = self.on_move(ai_move, source)
+            self.extra.update(fields)
+        else:
+            ponder_after(self.ai_request.board, ai_move)
+        self.ai_move = ai_move
+        self.source = source
+        self.time_to_move_ms = self.elapsed_ms()
+        if ai_move is None:
+            return []
+        return [sse_event('move', dict(ai_move, source=source, **self.extra))]
+
+    def cached(self):
+        """Wszystkie zdarzenia gotowej odpowiedzi (bez zapytania do AI)."""
+        commentary, ai_move = self.ai_request.cached
+        events = self._settle(ai_move, self.ai_request.source)
+        events.append(sse_event('token', {'text': commentary}))
+        events.append(sse_event('done', dict({'commentary': commentary, 'ai_move': self.ai_move,
+                                              'ttft_ms': self.elapsed_ms(), 'time_to_move_ms': self.elapsed_ms()},
+                                             **self.extra)))
+        self._log_done(self.ai_request.source)
+        return events
+
+    def _log_done(self, source):
+        elapsed_ms = self.elapsed_ms()
+        REQUEST_SECONDS.observe(elapsed_ms / 1000, mode='stream', source=source)
+        log.info("Strumień AI zakończony", extra={'source': source, 'ttft_ms': self.ttft_ms,
+                                                  'time_to_move_ms': self.time_to_move_ms, 'elapsed_ms': elapsed_ms})
+
+    def engine_move(self):
+        """Ruch z lokalnego silnika przed komentarzem (tryb "engine_first")."""
+        return self._settle(fallback_move(self.ai_request.board), 'engine')
+
+    def feed(self, chunk):
+        if self.ttft_ms is None:
+            self.ttft_ms = self.elapsed_ms()
+        visible = self.scanner.feed(chunk)
+        return [sse_event('token', {'text': visible})] if visible else []
+
+    @property
+    def move_pending(self):
+        """Marker RUCH: został odczytany, a ruch nie został jeszcze wysłany."""
+        return self.time_to_move_ms is None and self.scanner.move_text is not None
+
+    def resolve_move(self):
+        return self._settle(*resolve_move(self.scanner.move_text, self.ai_request.board))
+
+    def finish(self):
+        """Kończy strumień: reszta tekstu, ruch (jeśli jeszcze go nie było), zapis w cache i zdarzenie "done"."""
+        scanner = self.scanner
+        board = self.ai_request.board
+        events = []
+        visible = scanner.finish()
+        if visible:
+            events.append(sse_event('token', {'text': visible}))
+        if self.time_to_move_ms is None:
+            if scanner.move_text is not None:
+                events += self.resolve_move()
+            else:
+                log.warning("Nie znaleziono markera RUCH: w odpowiedzi AI, ruch wybiera silnik")
+                events += self._settle(fallback_move(board), 'engine')
+        
+        commentary = scanner.commentary
+        if board is not None and "Błąd:" not in commentary and scanner.move_text != FALLBACK_MOVE:
+            position_cache.put_reply(board, commentary, self.ai_move, self.ai_request.canonical)
+        
+        self._log_done(self.source or 'ai')
+        events.append(sse_event('done', dict({'commentary': commentary, 'ai_move': self.ai_move,
+                                              'usage': self.usage or None, 'ttft_ms': self.ttft_ms,
+                                              'time_to_move_ms': self.time_to_move_ms}, **self.extra)))
+        return events
+
+    def error(self, e):
+        error_details = f"Błąd podczas strumieniowania odpowiedzi AI: {str(e)}"
+        log.error(error_details, exc_info=e)
+        self._log_done('error')
+        return [sse_event('error', {'error': error_details, 'ai_move': self.ai_move})]
+
+def generate_commentary_events(ai_request, engine_first, on_move=None):
+    """Generator zdarzeń SSE z komentarzem i ruchem AI (on_move - jak w CommentaryEvents)."""
+    events = CommentaryEvents(ai_request, on_move)
+    if ai_request.cached is not None:
+        yield from events.cached()
+        return
+    
     try:
-        data = request.json
-        prompt = data.get('prompt', '')
+        chunks = stream_ai_response(ai_request.prompt, events.usage)
+        # Tryb "engine_first": ruch z lokalnego silnika, komentarz dalej płynie z AI
+        # (zapytanie do API startuje przed przeszukiwaniem, więc czasy się nakładają)
+        if engine_first and ai_request.board is not None:
+            chunks = prefetch(chunks)
+            yield from events.engine_move()
+        
+        for chunk in chunks:
+            yield from events.feed(chunk)
+            if events.move_pending:
+                yield from events.resolve_move()
+        yield from events.finish()
+    except Exception as e:
+        yield from events.error(e)
+
+# Dane zapytania o komentarz: gotowy prompt, plansza (jeśli znana) i ewentualna gotowa odpowiedź
+# (cached) wraz z jej źródłem ("cache" albo "book")
+AIRequest = namedtuple('AIRequest', 'prompt board canonical cached source')
+
+def prepare_ai_request(data):
+    """Buduje prompt i planszę z danych zapytania; błędne dane kończą się ValueError."""
+    prompt = data.get('prompt', '')
+    
+    # Plansza w formie strukturalnej - serwer sam buduje z niej opis w prompcie
+    board = None
+    if 'board' in data or 'moves' in data:
+        try:
+            with stage('prompt_parse'):
+                board = decode_board_payload(data)
+        except ValueError as e:
+            raise ValueError(f'Nieprawidłowa plansza: {e}')
+        with stage('prompt_build'):
+            prompt = build_prompt(prompt or DEFAULT_INTRO, board)
+    
+    if not prompt:
+        raise ValueError('Brak promptu')
+    
+    # Starszy format: plansza tylko w tekście promptu
+    if board is None and ("Stan planszy" in prompt or BOARD_MARKER in prompt):
+        with stage('prompt_parse'):
+            board = parse_board_from_prompt(prompt)
+    
+    return build_ai_request(prompt, board)
+
+def build_ai_request(prompt, board):
+    """
+    Szuka odpowiedzi w księdze otwarć i w cache pozycji, a jeśli jej nie ma - dodaje
+    do promptu analizę planszy.
+    """
+    canonical = cached = source = None
+    if board is not None:
+        canonical = board.canonical()
         
-        if not prompt:
-            return jsonify({'error': 'Brak promptu'}), 400
+        # Odpowiedź policzona z wyprzedzeniem, gdy gracz zagrał przewidziany ruch
+        pondered = ponderer.take(board)
+        # Pozycje z księgi otwarć dostają od razu ruch silnika - w otwarciu AI gra najsłabiej
+        book_move = opening_book.lookup(board, canonical) if opening_book is not None and pondered is None else None
+        if pondered is not None:
+            cached = (pondered.commentary, pondered.ai_move)
+            source = 'ponder'
+        elif book_move is not None:
+            cached = (book_comment(canonical[0]), {'row': book_move.row, 'col': book_move.col})
+            source = 'book'
+        else:
+            # Pozycje (i ich symetryczne odpowiedniki) mogły już paść w innych grach
+            cached = position_cache.get_reply(board, canonical)
+            if cached is not None and cached[1] is not None and not is_legal_move(board, cached[1]['row'], cached[1]['col']):
+                cached = None
+            if cached is not None:
+                source = 'cache'
         
         # Dodaj analityczne informacje do promptu dla lepszej strategii
-        if "Stan planszy" in prompt:
-            # Analizuj pozycję planszy i dodaj wskazówki strategiczne
-            enhanced_prompt = enhance_prompt_with_strategy(prompt)
+        if cached is None:
+            with stage('prompt_analysis'):
+                enhanced_prompt = enhance_prompt_with_strategy(prompt, board, canonical)
             # Użyj ulepszonego promptu jeśli został wygenerowany
             if enhanced_prompt:
                 prompt = enhanced_prompt
+    
+    return AIRequest(prompt, board, canonical, cached, source)
+
+# Oddziela komentarz od markera ruchu; zwraca (komentarz, tekst ruchu albo None)
+def split_move_marker(commentary):
+    move_marker = "RUCH:"
+    if move_marker not in commentary:
+        return commentary, None
+    
+    # Znajdź pozycję markera ruchu
+    move_start = commentary.find(move_marker) + len(move_marker)
+    move_end = commentary.find("\n", move_start) if "\n" in commentary[move_start:] else len(commentary)
+    move_text = commentary[move_start:move_end].strip()
+    log.debug("Znaleziono ruch AI: %s", move_text)
+    
+    # Usuń marker ruchu z komentarza
+    return commentary[:commentary.find(move_marker)].strip(), move_text
+
+# Zamienia tekst ruchu AI na ruch; zwraca (ruch, źródło: "ai" albo "engine")
+def resolve_move(move_text, board):
+    # Ruch awaryjny zgłoszony przez klienta AI - wybiera go silnik
+    if move_text == FALLBACK_MOVE:
+        return fallback_move(board), 'engine'
+    # BRAK - AI nie chce wykonać ruchu
+    if move_text == "BRAK":
+        return None, 'ai'
+    with stage('move_parse'):
+        ai_move = parse_move(move_text, board)
+    # Błędny albo nielegalny ruch AI zastępujemy ruchem silnika
+    if ai_move is None:
+        return fallback_move(board), 'engine'
+    return ai_move, 'ai'
+
+# Tekst ruchu AI ("wiersz,kolumna") jako legalny ruch albo None
+def parse_move(move_text, board):
+    try:
+        row, col = map(int, move_text.split(','))
+        log.debug("Sparsowany ruch AI: wiersz=%d, kolumna=%d", row, col)
+    except Exception as e:
+        log.warning("Błąd podczas parsowania ruchu AI: %s", e)
+        return None
+    if not is_legal_move(board, row, col):
+        log.warning("Ruch AI (%d,%d) jest nielegalny", row, col)
+        return None
+    return {'row': row, 'col': col}
+
+@app.route('/ai-move', methods=['POST'])
+def get_ai_move():
+    """Zwraca ruch silnika dla planszy przesłanej jako lista wierszy."""
+    try:
+        data = request.json or {}
+        rows = data.get('board')
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'Brak planszy'}), 400
+        try:
+            _, win_length = decode_rules(data, len(rows))
+            board = Board.from_rows(rows, win_length)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Nieprawidłowa plansza: {e}'}), 400
+        try:
+            time_ms = int(data.get('time_ms', AI_MOVE_TIME_MS))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Pole time_ms musi być liczbą całkowitą'}), 400
+        time_ms = max(MIN_MOVE_TIME_MS, min(time_ms, MAX_MOVE_TIME_MS))
+        player = data.get('player', 'kółko')
+        if not isinstance(player, str) or player not in PLAYER_CODES:
+            return jsonify({'error': 'Pole player musi mieć wartość "krzyżyk" albo "kółko"'}), 400
+
+        result = search_move(board, player, time_limit_ms=time_ms)
+        if result is None:
+            return jsonify({'ai_move': None})
+        return jsonify({
+            'ai_move': {'row': result.row, 'col': result.col},
+            'score': result.score,
+            'depth': result.depth,
+            'nodes': result.nodes,
+            'elapsed_ms': round(result.elapsed_ms, 1)
+        })
+    except Exception as e:
+        error_details = f"Błąd podczas wyszukiwania ruchu: {str(e)}"
+        log.exception(error_details)
+        return jsonify({'error': error_details}), 500
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Zwraca liczniki trafień i chybień cache pozycji (oraz księgi otwarć, jeśli jest wczytana)."""
+    stats = position_cache.stats()
+    if opening_book is not None:
+        stats['opening_book'] = opening_book.stats()
+    return jsonify(stats)
+
+@app.route('/ai-stats', methods=['GET'])
+def ai_stats():
+    """Zwraca sumy tokenów wysłanych i odebranych przez klienta AI oraz opóźnienia odpowiedzi."""
+    p50, p95 = latency.percentile(50), latency.percentile(95)
+    return jsonify(dict(token_usage.stats(),
+                        latency_p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+                        latency_p95_ms=round(p95 * 1000, 1) if p95 is not None else None))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metryki w formacie tekstowym Prometheusa: czasy etapów, błędy API, ruchy awaryjne, cache, tokeny, sesje."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def collect_server_metrics():
+    """Liczniki cache pozycji, księgi otwarć, tokenów i sesji dla /metrics."""
+    cache = position_cache.stats()
+    yield ('ttt_cache_lookups_total', 'counter', 'Wyszukiwania w cache pozycji według wyniku',
+           [({'result': 'hit'}, cache['hits']), ({'result': 'disk_hit'}, cache['disk_hits']),
+            ({'result': 'miss'}, cache['misses'])])
+    yield ('ttt_cache_entries', 'gauge', 'Liczba wpisów w cache pozycji (w pamięci)', [({}, cache['entries'])])
+    yield ('ttt_cache_evictions_total', 'counter', 'Wpisy usunięte z cache pozycji', [({}, cache['evictions'])])
+    if opening_book is not None:
+        book = opening_book.stats()
+        yield ('ttt_book_lookups_total', 'counter', 'Wyszukiwania w księdze otwarć według wyniku',
+               [({'result': 'hit'}, book['hits']), ({'result': 'miss'}, book['misses'])])
+    tokens = token_usage.stats()
+    yield ('ttt_ai_requests_total', 'counter', 'Udane zapytania do AI', [({}, tokens['requests'])])
+    yield ('ttt_ai_tokens_total', 'counter', 'Tokeny zapytań do AI według kierunku',
+           [({'direction': 'in'}, tokens['tokens_in']), ({'direction': 'out'}, tokens['tokens_out'])])
+    stats = sessions.stats()
+    yield ('ttt_sessions_active', 'gauge', 'Aktywne sesje gry', [({}, stats['active'])])
+    yield ('ttt_sessions_total', 'counter', 'Sesje gry według sposobu zakończenia (created - utworzone)',
+           [({'event': event}, stats[event]) for event in ('created', 'expired', 'evicted')])
+    stats = ponderer.stats()
+    yield ('ttt_ponder_lookups_total', 'counter',
+           'Ruchy gracza po przewidywaniu: hit - odpowiedź gotowa, late - jeszcze liczona, miss - nieprzewidziany',
+           [({'result': result}, stats[result]) for result in ('hits', 'late', 'misses')])
+    yield ('ttt_ponder_positions_total', 'counter', 'Przewidziane pozycje według wyniku pracy w tle',
+           [({'result': result}, stats[result]) for result in ('computed', 'cancelled', 'skipped')])
+    yield ('ttt_ponder_saved_seconds_total', 'counter', 'Czas liczenia odpowiedzi oszczędzony dzięki trafieniom',
+           [({}, stats['saved_ms'] / 1000)])
+    yield ('ttt_ponder_pending', 'gauge', 'Przewidziane pozycje czekające na obliczenie', [({}, stats['pending'])])
+
+registry.add_collector(collect_server_metrics)
+
+@app.route('/session', methods=['POST'])
+def create_session():
+    """
+    Tworzy sesję gry - z pustą planszą albo od podanej pozycji ("board" / "moves").
+    Opcjonalne "size" i "win_length" wybierają wariant gry (domyślnie 10x10, 5 w rzędzie).
+    """
+    data = request.json or {}
+    try:
+        if 'board' in data or 'moves' in data:
+            board = decode_board_payload(data)
+        else:
+            board = Board(*decode_rules(data))
+    except ValueError as e:
+        return jsonify({'error': f'Nieprawidłowa plansza: {e}'}), 400
+    session = sessions.create(board)
+    return jsonify(session.state()), 201
+
+@app.route('/session/<session_id>', methods=['GET'])
+def get_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Nie ma takiej sesji (mogła wygasnąć)'}), 404
+    return jsonify(session.state())
+
+@app.route('/session/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    session = sessions.get(session_id)
+    if session is not None:
+        ponderer.discard(session.board)
+    return jsonify({'deleted': sessions.delete(session_id)})
+
+@app.route('/session/<session_id>/move', methods=['POST'])
+def session_move(session_id):
+    """
+    Ruch gracza w sesji: przyjmuje tylko ostatni ruch ({"row", "col", "prompt"}).
+
+    Serwer sprawdza ruch na swojej planszy, wykrywa wygraną/remis i zwraca
+    komentarz AI razem z jej ruchem (już wykonanym w sesji) oraz stanem gry.
+    Z "stream": true odpowiedź przychodzi jako zdarzenia SSE, jak
+    w /get-ai-commentary-stream.
+    """
+    started = time.perf_counter()
+    data = request.json or {}
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Nie ma takiej sesji (mogła wygasnąć)'}), 404
+    try:
+        row, col = int(data['row']), int(data['col'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Brak lub nieprawidłowe pola row/col'}), 400
+    
+    # Jeden ruch naraz - powtórzone kliknięcie nie może zagrać dwa razy
+    if not session.lock.acquire(blocking=False):
+        return jsonify({'error': 'Poprzedni ruch w tej sesji jest jeszcze przetwarzany'}), 409
+    streaming = False
+    try:
+        try:
+            session.play(row, col, HUMAN_PLAYER)
+        except ValueError as e:
+            # Plansza przeglądarki rozjechała się z planszą sesji - klient powinien utworzyć nową sesję
+            return jsonify(dict(session.state(), error=str(e))), 409
         
-        # Użycie funkcji z ai_client.py do pobrania odpowiedzi od AI
-        commentary = get_ai_response(prompt)
-        
-        # Sprawdzenie, czy odpowiedź zawiera informację o błędzie
-        if "Błąd:" in commentary and "RUCH:" not in commentary:
-            error_details = commentary
-            print(f"Błąd AI: {error_details}", file=sys.stderr)
-            return jsonify({'error': error_details}), 500
+        board = session.board
+        with stage('prompt_build'):
+            prompt = build_prompt(data.get('prompt') or DEFAULT_INTRO, board)
+        if session.status != ACTIVE:
+            # Gra skończyła się ruchem gracza - AI już tylko komentuje
+            body = final_commentary_body(session, get_ai_response(prompt))
+            if data.get('stream'):
+                return Response(final_commentary_events(body), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            return jsonify(body)
         
-        # Parsowanie ruchu z odpowiedzi AI
-        ai_move = None
-        move_marker = "RUCH:"
+        ai_request = build_ai_request(prompt, board)
         
-        if move_marker in commentary:
-            # Znajdź pozycję markera ruchu
-            move_start = commentary.find(move_marker) + len(move_marker)
-            move_end = commentary.find("\n", move_start) if "\n" in commentary[move_start:] else len(commentary)
-            move_text = commentary[move_start:move_end].strip()
-            
-            print(f"Znaleziono ruch AI: {move_text}")
-            
-            # Jeśli nie jest to BRAK, spróbuj sparsować współrzędne
-            if move_text != "BRAK":
-                try:
-                    row, col = map(int, move_text.split(','))
-                    ai_move = {'row': row, 'col': col}
-                    print(f"Sparsowany ruch AI: wiersz={row}, kolumna={col}")
-                except Exception as e:
-                    print(f"Błąd podczas parsowania ruchu AI: {e}", file=sys.stderr)
-                    # Awaryjny ruch w przypadku błędu parsowania
-                    ai_move = {'row': 5, 'col': 5}
-                    print(f"Ustawiono awaryjny ruch AI: wiersz=5, kolumna=5")
-            
-            # Usuń marker ruchu z komentarza
-            commentary = commentary[:commentary.find(move_marker)].strip()
-        else:
-            # Jeśli nie znaleziono markera RUCH:, ustaw domyślny ruch
-            print("Nie znaleziono markera RUCH: w odpowiedzi AI, ustawiam domyślny ruch")
-            ai_move = {'row': 5, 'col': 5}
+        def on_move(ai_move, source):
+            return apply_session_move(session, ai_move, source)
         
-        # Jeśli commentary zawiera "Błąd", ale mamy ruch, usuń informację o błędzie z komentarza
-        if "Błąd:" in commentary and ai_move:
-            commentary = "Coś się zjebało z API, ale i tak zagram!"
+        if data.get('stream'):
+            events = generate_commentary_events(ai_request, bool(data.get('engine_first')), on_move)
+            streaming = True
+            # Blokada sesji jest zwalniana dopiero po zakończeniu strumienia
+            return Response(LockedStream(events, session.lock), mimetype='text/event-stream', headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
         
-        return jsonify({
-            'commentary': commentary,
-            'ai_move': ai_move
-        })
+        body, status = answer_ai_request(ai_request)
+        if status == 200:
+            ai_move, source, fields = on_move(body['ai_move'], body['source'])
+            body.update(fields, ai_move=ai_move, source=source)
+        log_answer('/session/move', body, status, started)
+        return jsonify(body), status
     except Exception as e:
-        error_details = f"Błąd podczas przetwarzania zapytania AI: {str(e)}"
-        print(error_details, file=sys.stderr)
+        error_details = f"Błąd podczas przetwarzania ruchu w sesji: {str(e)}"
+        log.exception(error_details)
         return jsonify({'error': error_details}), 500
+    finally:
+        if not streaming:
+            session.lock.release()
 
-# Funkcja do znajdowania zagrożeń na planszy
-def find_threats(board, player):
-    threats = []
-    directions = [
-        {"name": "poziomo", "dr": 0, "dc": 1},
-        {"name": "pionowo", "dr": 1, "dc": 0},
-        {"name": "ukośnie ↗", "dr": -1, "dc": 1},
-        {"name": "ukośnie ↘", "dr": 1, "dc": 1}
-    ]
-    
-    board_size = len(board)
-    min_threat = 3  # Minimalna liczba znaków w rzędzie, aby uznać za zagrożenie
-    
-    # 1. Sprawdź sekwencje znaków w rzędzie
-    for row in range(board_size):
-        for col in range(board_size):
-            if board[row][col] == player:
-                for direction in directions:
-                    # Sprawdź sekwencję w tym kierunku
-                    count = 1
-                    r, c = row, col
-                    
-                    # Sprawdź w przód
-                    for i in range(1, 5):  # Sprawdź do 5 kroków w przód
-                        r += direction["dr"]
-                        c += direction["dc"]
-                        if 0 <= r < board_size and 0 <= c < board_size and board[r][c] == player:
-                            count += 1
-                        else:
-                            break
-                    
-                    # Jeśli znaleziono wystarczająco dużo znaków, sprawdź czy jest otwarte miejsce do kontynuacji
-                    if count >= min_threat:
-                        # Sprawdź miejsce do blokady
-                        block_row = r
-                        block_col = c
-                        
-                        if 0 <= block_row < board_size and 0 <= block_col < board_size and board[block_row][block_col] is None:
-                            threats.append({
-                                "count": count,
-                                "direction": direction["name"],
-                                "start_row": row,
-                                "start_col": col,
-                                "block_row": block_row,
-                                "block_col": block_col,
-                                "type": "sequence"
-                            })
-                        
-                        # Sprawdź przeciwny koniec linii
-                        block_row = row - direction["dr"]
-                        block_col = col - direction["dc"]
-                        
-                        if 0 <= block_row < board_size and 0 <= block_col < board_size and board[block_row][block_col] is None:
-                            threats.append({
-                                "count": count,
-                                "direction": direction["name"],
-                                "start_row": row,
-                                "start_col": col,
-                                "block_row": block_row,
-                                "block_col": block_col,
-                                "type": "sequence"
-                            })
-    
-    # 2. Sprawdź wzorce z przerwami (X_XX lub XX_X)
-    for row in range(board_size):
-        for col in range(board_size):
-            if board[row][col] is None:  # Sprawdź tylko puste pola jako potencjalne przerwy
-                for direction in directions:
-                    # Sprawdź wzorzec X_XX (gdzie _ to aktualna pozycja)
-                    prev_r = row - direction["dr"]
-                    prev_c = col - direction["dc"]
-                    next1_r = row + direction["dr"]
-                    next1_c = col + direction["dc"]
-                    next2_r = row + direction["dr"] * 2
-                    next2_c = col + direction["dc"] * 2
-                    
-                    # Sprawdź, czy mamy X przed przerwą i XX po przerwie
-                    if (0 <= prev_r < board_size and 0 <= prev_c < board_size and board[prev_r][prev_c] == player and
-                        0 <= next1_r < board_size and 0 <= next1_c < board_size and board[next1_r][next1_c] == player and
-                        0 <= next2_r < board_size and 0 <= next2_c < board_size and board[next2_r][next2_c] == player):
-                        
-                        threats.append({
-                            "count": 3,  # 3 znaki z przerwą
-                            "direction": direction["name"],
-                            "start_row": prev_r,
-                            "start_col": prev_c,
-                            "block_row": row,
-                            "block_col": col,
-                            "type": "gap_pattern",
-                            "pattern": "X_XX"
-                        })
-                    
-                    # Sprawdź wzorzec XX_X (gdzie _ to aktualna pozycja)
-                    prev2_r = row - direction["dr"] * 2
-                    prev2_c = col - direction["dc"] * 2
-                    
-                    # Sprawdź, czy mamy XX przed przerwą i X po przerwie
-                    if (0 <= prev2_r < board_size and 0 <= prev2_c < board_size and board[prev2_r][prev2_c] == player and
-                        0 <= prev_r < board_size and 0 <= prev_c < board_size and board[prev_r][prev_c] == player and
-                        0 <= next1_r < board_size and 0 <= next1_c < board_size and board[next1_r][next1_c] == player):
-                        
-                        threats.append({
-                            "count": 3,  # 3 znaki z przerwą
-                            "direction": direction["name"],
-                            "start_row": prev2_r,
-                            "start_col": prev2_c,
-                            "block_row": row,
-                            "block_col": col,
-                            "type": "gap_pattern",
-                            "pattern": "XX_X"
-                        })
-    
-    # Sortuj zagrożenia - większa liczba znaków to większe zagrożenie
-    threats.sort(key=lambda x: (x["count"], 0 if x["type"] == "sequence" else -1), reverse=True)
-    
-    return threats
+@app.route('/session-stats', methods=['GET'])
+def session_stats():
+    return jsonify(sessions.stats())
 
-# Funkcja do analizy planszy i dodania wskazówek strategicznych
-def enhance_prompt_with_strategy(prompt):
+@app.route('/ponder-stats', methods=['GET'])
+def ponder_stats():
+    """Przewidywanie odpowiedzi: trafienia, policzone i anulowane pozycje oraz zaoszczędzony czas."""
+    return jsonify(ponderer.stats())
+
+def apply_session_move(session, ai_move, source):
+    """
+    Wykonuje ruch AI na planszy sesji; brak ruchu (RUCH:BRAK) zastępuje ruch silnika.
+    Zwraca (ruch, źródło, stan gry).
+    """
+    if ai_move is None or not is_legal_move(session.board, ai_move['row'], ai_move['col']):
+        ai_move, source = fallback_move(session.board), 'engine'
+    session.play(ai_move['row'], ai_move['col'], AI_PLAYER)
+    if session.status == ACTIVE:
+        ponderer.schedule(session.board)
+    return ai_move, source, {'status': session.status, 'winner': session.winner}
+
+def ponder_after(board, ai_move):
+    """Zleca przewidywanie odpowiedzi gracza na ruch AI (board - plansza przed tym ruchem)."""
+    if not ponderer.enabled or board is None or ai_move is None:
+        return
+    row, col = ai_move['row'], ai_move['col']
+    if not is_legal_move(board, row, col):
+        return
+    after = board.copy()
+    after.apply(row, col, AI_PLAYER)
+    if not after.is_win_at(row, col) and not after.is_full():
+        ponderer.schedule(after)
+
+def ponder_reply(board):
+    """Odpowiedź dla przewidywanej pozycji, liczona w tle: (komentarz, ruch, źródło) albo None."""
+    if PONDER_LLM and not ponderer.busy():
+        canonical = board.canonical()
+        prompt = build_prompt(DEFAULT_INTRO, board)
+        prompt = enhance_prompt_with_strategy(prompt, board, canonical) or prompt
+        usage = {}
+        body, status = finish_ai_answer(AIRequest(prompt, board, canonical, None, None),
+                                        get_ai_response(prompt, usage), usage)
+        if status == 200 and body['ai_move'] is not None:
+            return body['commentary'], body['ai_move'], body['source']
+    result = search_move(board, AI_PLAYER, time_limit_ms=PONDER_MOVE_TIME_MS)
+    if result is None:
+        return None
+    return ponder_comment(board), {'row': result.row, 'col': result.col}, 'engine'
+
+ponderer.compute = ponder_reply
+
+def final_commentary_body(session, reply):
+    """Odpowiedź na ruch kończący grę - sam komentarz AI, bez ruchu."""
+    commentary, _ = split_move_marker(reply)
+    if "Błąd:" in commentary:
+        commentary = "Koniec gry!"
+    return {'commentary': commentary, 'ai_move': None, 'status': session.status, 'winner': session.winner}
+
+def final_commentary_events(body):
+    """Zdarzenia SSE dla gotowej odpowiedzi (koniec gry - bez ruchu AI)."""
+    yield sse_event('token', {'text': body['commentary']})
+    yield sse_event('done', body)
+
+# Funkcja sprawdzająca legalność ruchu (bez planszy nie da się tego ocenić)
+def is_legal_move(board, row, col):
+    if board is None:
+        return True
+    return 0 <= row < board.size and 0 <= col < board.size and board.is_empty(row, col)
+
+# Ruch awaryjny - silnik jeśli znamy planszę, w przeciwnym razie środek planszy
+def fallback_move(board, time_ms=AI_MOVE_TIME_MS):
+    if board is not None:
+        try:
+            with stage('engine_fallback'):
+                result = search_move(board, 'kółko', time_limit_ms=time_ms)
+            if result is not None:
+                log.debug("Ruch silnika: wiersz=%d, kolumna=%d (głębokość %d)", result.row, result.col, result.depth)
+                FALLBACK_MOVES.inc(kind='engine')
+                return {'row': result.row, 'col': result.col}
+        except Exception as e:
+            log.error("Błąd silnika ruchów: %s", e)
+    move = emergency_move(board)
+    if move is None:
+        log.warning("Brak wolnego pola na awaryjny ruch AI")
+        return None
+    log.warning("Ustawiono awaryjny ruch AI: wiersz=%d, kolumna=%d", move['row'], move['col'])
+    FALLBACK_MOVES.inc(kind='center')
+    return move
+
+# Ruch awaryjny bez silnika: środek planszy albo (gdy jest zajęty) pierwsze wolne pole;
+# None, gdy na planszy nie ma legalnego ruchu
+def emergency_move(board):
+    if board is None:
+        # Plansza nieznana - środek planszy o domyślnym rozmiarze
+        return {'row': BOARD_SIZE // 2, 'col': BOARD_SIZE // 2}
+    size = board.size
+    idx = (size // 2) * size + size // 2
+    if board.cells[idx] != EMPTY:
+        idx = board.cells.find(EMPTY)
+        if idx == -1:
+            return None
+    return {'row': idx // size, 'col': idx % size}
+
+# Funkcja odczytująca reguły partii: rozmiar planszy ("size", o ile nie wynika z samej planszy)
+# i długość wygranej ("win_length"); zwraca (rozmiar, długość wygranej)
+def decode_rules(data, size=None):
     try:
+        size = int(data.get('size', BOARD_SIZE)) if size is None else size
+        win_length = int(data.get('win_length', WIN_LENGTH))
+    except (TypeError, ValueError):
+        raise ValueError("Pola size i win_length muszą być liczbami całkowitymi")
+    if not MIN_WIN_LENGTH <= size <= MAX_BOARD_SIZE:
+        raise ValueError(f"Plansza musi mieć rozmiar od {MIN_WIN_LENGTH}x{MIN_WIN_LENGTH} "
+                         f"do {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE}")
+    if not MIN_WIN_LENGTH <= win_length <= size:
+        raise ValueError(f"Długość wygranej musi być od {MIN_WIN_LENGTH} do {size}")
+    return size, win_length
+
+# Funkcja dekodująca planszę z napisu .XO z regułami z data (pole "win_length")
+def decode_board_text(text, data):
+    # Rozmiar wynika z długości napisu - sprawdzany, zanim powstanie geometria planszy
+    size = int(round(len(text) ** 0.5)) if isinstance(text, str) else None
+    _, win_length = decode_rules(data, size)
+    return Board.from_string(text, win_length)
+
+# Funkcja dekodująca planszę przesłaną jako napis ("board") lub lista ruchów ("moves")
+def decode_board_payload(data):
+    if 'board' in data:
+        return decode_board_text(data['board'], data)
+    moves = data['moves']
+    if not isinstance(moves, list):
+        raise ValueError("Lista ruchów musi być tablicą")
+    return Board.from_moves(moves, *decode_rules(data))
+
+# Funkcja wyodrębniająca planszę z tekstowego promptu (zwięzły zapis z prompts.py albo starszy "Stan planszy")
+def parse_board_from_prompt(prompt):
+    try:
+        if BOARD_MARKER in prompt:
+            state = read_board_state(prompt)
+            if state is None:
+                return None
+            # Reguły z tekstu promptu przechodzą te same kontrole co pola zapytania
+            text, win_length = state
+            return decode_board_text(text, {'win_length': win_length})
+        
         # Wyodrębnij stan planszy z promptu
         board_state_start = prompt.find("Stan planszy")
         if board_state_start == -1:
@@ -211,7 +730,6 @@ def enhance_prompt_with_strategy(prompt):
             
         lines = prompt[board_state_start:].split('\n')
         board = []
-        row_index = 0
         
         # Przetwarzaj linie stanu planszy
         for i, line in enumerate(lines):
@@ -225,46 +743,75 @@ def enhance_prompt_with_strategy(prompt):
             if " " in line:
                 cells = line.split(" ")[1:]  # Pierwszy element to numer wiersza
                 board.append([cell if cell != "." else None for cell in cells if cell])
-                row_index += 1
         
-        # Znajdź potencjalne zagrożenia i dobre ruchy
-        threats = find_threats(board, "krzyżyk")
-        opportunities = find_threats(board, "kółko")
+        # Rozmiar planszy z liczby wierszy - te same granice co dla planszy w polach zapytania
+        decode_rules({}, len(board))
+        return Board.from_rows(board)
+    except Exception as e:
+        log.warning("Błąd podczas odczytu planszy z promptu: %s", e)
+        return None
+
+# Zagrożenia obu graczy (top PROMPT_TOP_THREATS - tyle wykorzystuje prompt) z cache albo z find_threats
+def analyse_board(board, canonical=None):
+    cached = position_cache.get_analysis(board, canonical)
+    if cached is not None:
+        return cached
+    pool = get_search_pool() if SEARCH_ANALYSIS_IN_POOL else None
+    with stage('find_threats'):
+        if pool is not None:
+            # Analiza w procesie roboczym nie zajmuje GIL-a serwera
+            threats, opportunities = pool.analyse(board, PROMPT_TOP_THREATS)
+        else:
+            threats = find_threats(board, "krzyżyk")[:PROMPT_TOP_THREATS]
+            opportunities = find_threats(board, "kółko")[:PROMPT_TOP_THREATS]
+    position_cache.put_analysis(board, threats, opportunities, canonical)
+    return threats, opportunities
+
+# Zwięzły opis zagrożenia do promptu, np. "4 w rzędzie poziomo od (2,3)" albo "luka X_XX pionowo"
+def describe_threat(threat):
+    if threat["type"] == "sequence":
+        return f"{threat['count']} w rzędzie {threat['direction']} od ({threat['start_row']},{threat['start_col']})"
+    return f"luka {threat['pattern']} {threat['direction']}"
+
+# Funkcja do analizy planszy i dodania wskazówek strategicznych
+def enhance_prompt_with_strategy(prompt, board=None, canonical=None):
+    try:
+        if board is None:
+            board = parse_board_from_prompt(prompt)
+            if board is None:
+                return None
+        
+        # Znajdź potencjalne zagrożenia i dobre ruchy (najpierw w cache pozycji)
+        threats, opportunities = analyse_board(board, canonical)
         
-        # Dodaj analizę strategiczną do promptu
-        strategy_info = "\n\nANALIZA STRATEGICZNA:"
+        # Dodaj analizę strategiczną do promptu - tylko najważniejsze zagrożenia, po jednym wierszu
+        # (ogólne zasady strategii są w komunikacie systemowym)
+        strategy_info = ""
         
         if threats:
-            strategy_info += "\nZAGROŻENIA (wymagają blokady):"
-            for threat in threats[:3]:  # Ogranicz do top 3 zagrożeń
-                if threat["type"] == "sequence":
-                    strategy_info += f"\n- PRIORYTET! Przeciwnik ma {threat['count']} znaków w rzędzie w kierunku {threat['direction']} zaczynając od ({threat['start_row']},{threat['start_col']}). MUSISZ zablokować ruch na ({threat['block_row']},{threat['block_col']})."
-                else:  # gap_pattern
-                    strategy_info += f"\n- NIEBEZPIECZEŃSTWO! Przeciwnik ma wzorzec {threat['pattern']} w kierunku {threat['direction']} zaczynając od ({threat['start_row']},{threat['start_col']}). MUSISZ zablokować lukę na ({threat['block_row']},{threat['block_col']})."
+            strategy_info += "\nZAGROŻENIA X (blokuj):"
+            for threat in threats:
+                strategy_info += f"\n- ({threat['block_row']},{threat['block_col']}): {describe_threat(threat)}"
         
         if opportunities:
-            strategy_info += "\nMOŻLIWOŚCI (rozważ te ruchy):"
-            for opp in opportunities[:3]:  # Ogranicz do top 3 możliwości
-                if opp["type"] == "sequence":
-                    strategy_info += f"\n- Masz {opp['count']} znaków w rzędzie w kierunku {opp['direction']} zaczynając od ({opp['start_row']},{opp['start_col']}). Rozważ kontynuowanie na ({opp['block_row']},{opp['block_col']})."
-                else:  # gap_pattern
-                    strategy_info += f"\n- Masz wzorzec {opp['pattern']} w kierunku {opp['direction']}. Możesz uzupełnić lukę na ({opp['block_row']},{opp['block_col']})."
-        
-        # Dodaj ogólną poradę z naciskiem na blokowanie zagrożeń
-        strategy_info += "\nOGÓLNA STRATEGIA: NAJPIERW zablokuj wszelkie zagrożenia przeciwnika, POTEM twórz własne linie. Szukaj ruchów, które tworzą wiele zagrożeń jednocześnie."
+            strategy_info += "\nTWOJE SZANSE:"
+            for opp in opportunities:
+                strategy_info += f"\n- ({opp['block_row']},{opp['block_col']}): {describe_threat(opp)}"
         
-        # Jeśli istnieje krytyczne zagrożenie (3+ w rzędzie), dodaj mocne ostrzeżenie
-        critical_threats = [t for t in threats if t["count"] >= 3]
+        # Jeśli istnieje krytyczne zagrożenie (3+ w rzędzie, ogólnie k-2), dodaj mocne ostrzeżenie
+        critical_threats = [t for t in threats if t["count"] >= board.win_length - 2]
         if critical_threats:
-            strategy_info += "\n\nUWAGA! KRYTYCZNE ZAGROŻENIE WYKRYTE! MUSISZ natychmiast zablokować pozycję na współrzędnych " + \
-                            f"({critical_threats[0]['block_row']},{critical_threats[0]['block_col']}), " + \
-                            "inaczej przegrasz w następnym ruchu!"
+            strategy_info += "\nKRYTYCZNE ZAGROŻENIE! MUSISZ zablokować " + \
+                            f"({critical_threats[0]['block_row']},{critical_threats[0]['block_col']})."
         
         return prompt + strategy_info
     except Exception as e:
-        print(f"Błąd podczas analizy planszy: {e}", file=sys.stderr)
+        log.warning("Błąd podczas analizy planszy: %s", e)
         return None
 
 if __name__ == '__main__':
+    # Procesy puli przeszukiwania startują przed pierwszym zapytaniem
+    get_search_pool()
     port = int(os.getenv('PORT', 6000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Serwer deweloperski; tryb produkcyjny (asynchroniczny) uruchamia asgi.py
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG', '0') == '1')
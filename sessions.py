@@ -0,0 +1,156 @@
+"""
+Sesje gier po stronie serwera.
+
+Sesja trzyma autorytatywną planszę (Board), więc przeglądarka wysyła tylko
+swój ostatni ruch, a serwer sam sprawdza jego legalność, wykrywa wygraną
+lub remis i korzysta z przyrostowej analizy zagrożeń z poprzednich tur.
+
+Magazyn sesji ma ograniczoną liczbę wpisów (najdawniej używane są usuwane
+jako pierwsze), a sesje bez ruchu dłużej niż SESSION_IDLE_S wygasają.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from board import KOLKO, KRZYZYK, PLAYER_NAMES, Board
+
+SESSION_MAX = int(os.getenv('SESSION_MAX', 1000))
+SESSION_IDLE_S = float(os.getenv('SESSION_IDLE_S', 1800))
+
+# Gracz w przeglądarce i AI
+HUMAN_PLAYER = 'krzyżyk'
+AI_PLAYER = 'kółko'
+
+# Stany gry
+ACTIVE = 'active'
+WIN = 'win'
+DRAW = 'draw'
+
+
+class GameSession:
+    """Jedna gra: plansza, gracz na ruchu i wynik."""
+
+    def __init__(self, session_id, board):
+        self.id = session_id
+        self.board = board
+        # Jeden ruch naraz - zapytania o tę samą sesję nie mogą się przeplatać
+        self.lock = threading.Lock()
+        self.created = self.last_seen = time.time()
+        self.status = ACTIVE
+        self.winner = None
+        self._update_status(None)
+
+    @property
+    def to_move(self):
+        """Gracz na ruchu: krzyżyk zaczyna, więc przy równej liczbie znaków ruch ma krzyżyk."""
+        cells = self.board.cells
+        return PLAYER_NAMES[KRZYZYK if cells.count(KRZYZYK) <= cells.count(KOLKO) else KOLKO]
+
+    def play(self, row, col, player):
+        """Wykonuje ruch gracza; nielegalny ruch kończy się ValueError."""
+        if self.status != ACTIVE:
+            raise ValueError('Gra już się zakończyła')
+        if player != self.to_move:
+            raise ValueError(f'Teraz nie jest ruch gracza {player}')
+        size = self.board.size
+        if not (0 <= row < size and 0 <= col < size):
+            raise ValueError(f'Pole ({row},{col}) jest poza planszą')
+        self.board.apply(row, col, player)
+        self._update_status((row, col))
+        return self.status
+
+    def _update_status(self, last_move):
+        board = self.board
+        if last_move is not None:
+            if board.is_win_at(*last_move):
+                self.status, self.winner = WIN, PLAYER_NAMES[board.get(*last_move)]
+                return
+        else:
+            winner = board.winner()
+            if winner is not None:
+                self.status, self.winner = WIN, winner
+                return
+        if board.is_full():
+            self.status = DRAW
+
+    def state(self):
+        return {
+            'session_id': self.id,
+            'size': self.board.size,
+            'win_length': self.board.win_length,
+            'board': self.board.to_string(),
+            'moves': len(self.board.moves),
+            'to_move': self.to_move if self.status == ACTIVE else None,
+            'status': self.status,
+            'winner': self.winner,
+        }
+
+
+class SessionStore:
+    """Ograniczony magazyn sesji (LRU) z wygasaniem nieużywanych sesji."""
+
+    def __init__(self, max_sessions=SESSION_MAX, idle_s=SESSION_IDLE_S):
+        self.max_sessions = max_sessions
+        self.idle_s = idle_s
+        self.sessions = OrderedDict()  # id -> GameSession, od najdawniej używanej
+        self.lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, board=None):
+        board = board if board is not None else Board()
+        session = GameSession(secrets.token_urlsafe(12), board)
+        with self.lock:
+            self._purge_expired(session.created)
+            self.sessions[session.id] = session
+            self.created += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id):
+        """Zwraca sesję (i odświeża jej czas użycia) albo None, jeśli nie istnieje lub wygasła."""
+        now = time.time()
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_seen > self.idle_s:
+                del self.sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_seen = now
+            self.sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def _purge_expired(self, now):
+        # Najdawniej używane sesje są na początku - wystarczy sprawdzać od przodu
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_seen <= self.idle_s:
+                break
+            self.sessions.popitem(last=False)
+            self.expired += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'active': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'idle_s': self.idle_s,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
+
+
+sessions = SessionStore()
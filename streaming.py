@@ -0,0 +1,172 @@
+"""
+Pomocnicze elementy strumieniowania komentarza AI do przeglądarki (Server-Sent Events).
+"""
+
+import asyncio
+import json
+import queue
+import re
+import threading
+
+MOVE_MARKER = "RUCH:"
+
+# Ruch jest kompletny, gdy po współrzędnych pojawi się znak inny niż cyfra
+_EARLY_MOVE = re.compile(r"\s*(\d+\s*,\s*\d+)(?=[^\d\s,])")
+
+
+def sse_event(event, data):
+    """Formatuje zdarzenie SSE z danymi w JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def prefetch(chunks):
+    """
+    Pobiera fragmenty z iteratora w wątku w tle i oddaje je w tej samej kolejności.
+
+    Zapytanie do API startuje od razu, więc w tym czasie można liczyć coś innego
+    (np. ruch silnika). Wyjątek z iteratora jest zgłaszany przy odczycie.
+    """
+    buffer = queue.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    def drain():
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    # Wątek startuje od razu, a nie przy pierwszym odczycie
+    threading.Thread(target=pump, name="ai-stream-prefetch", daemon=True).start()
+    return drain()
+
+
+def aprefetch(chunks):
+    """
+    Asynchroniczny odpowiednik prefetch: fragmenty z async generatora pobiera
+    zadanie w tle. Zamknięcie zwróconego generatora anuluje zadanie (i zapytanie).
+    """
+    buffer = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                buffer.put_nowait(chunk)
+        except Exception as e:
+            buffer.put_nowait(e)
+        buffer.put_nowait(done)
+
+    task = asyncio.ensure_future(pump())
+
+    async def drain():
+        try:
+            while True:
+                item = await buffer.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            task.cancel()
+
+    return drain()
+
+
+class MoveMarkerScanner:
+    """
+    Przyrostowo wyszukuje marker RUCH: w strumieniu tekstu.
+
+    feed() zwraca tekst, który można już przekazać dalej (bez markera i tego,
+    co po nim). Końcówka, która może być początkiem markera, jest wstrzymywana
+    do czasu nadejścia kolejnego fragmentu. Gdy ruch jest kompletny, trafia
+    do move_text.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.sent = 0
+        self.marker_at = -1
+        self.move_text = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        visible = ""
+        if self.marker_at < 0:
+            pos = self.text.find(MOVE_MARKER, max(0, self.sent - len(MOVE_MARKER)))
+            if pos >= 0:
+                self.marker_at = pos
+                visible = self.text[self.sent:pos]
+                self.sent = pos
+            else:
+                safe = max(self.sent, len(self.text) - (len(MOVE_MARKER) - 1))
+                visible = self.text[self.sent:safe]
+                self.sent = safe
+        if self.marker_at >= 0 and self.move_text is None:
+            self._extract_move(final=False)
+        return visible
+
+    def finish(self):
+        """Kończy strumień: zwraca wstrzymaną resztę tekstu i ustala ruch (jeśli był marker)."""
+        visible = ""
+        if self.marker_at < 0:
+            visible = self.text[self.sent:]
+            self.sent = len(self.text)
+        elif self.move_text is None:
+            self._extract_move(final=True)
+        return visible
+
+    def _extract_move(self, final):
+        after = self.text[self.marker_at + len(MOVE_MARKER):]
+        line, newline, _ = after.partition("\n")
+        if newline or final:
+            self.move_text = line.strip()
+            return
+        match = _EARLY_MOVE.match(after)
+        if match:
+            self.move_text = match.group(1)
+
+    @property
+    def commentary(self):
+        """Pełny komentarz bez markera ruchu (jak w odpowiedzi nie-strumieniowej)."""
+        end = self.marker_at if self.marker_at >= 0 else len(self.text)
+        return self.text[:end].strip()
+
+
+class LockedStream:
+    """
+    Iterator zdarzeń trzymający blokadę do końca strumienia.
+
+    Blokada jest zwalniana po wyczerpaniu zdarzeń albo przy close() - także
+    wtedy, gdy serwer zamknie odpowiedź, zanim strumień w ogóle ruszył.
+    """
+
+    def __init__(self, events, lock):
+        self.events = events
+        self.lock = lock
+        self.released = False
+
+    def __iter__(self):
+        try:
+            yield from self.events
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            close = getattr(self.events, 'close', None)
+            if close is not None:
+                close()
+            self.lock.release()
@@ -0,0 +1,59 @@
+"""
+Liczenie tokenów promptów i odpowiedzi AI.
+
+Jeśli zainstalowany jest tiktoken (razem ze słownikiem kodowania AI_TOKENIZER),
+liczba tokenów jest dokładna. W przeciwnym razie używany jest lokalny podział
+w stylu BPE: tekst jest dzielony jak przez pre-tokenizer modeli GPT (słowa
+z poprzedzającą spacją, grupy do 3 cyfr, znaki interpunkcyjne), a dłuższe
+słowa kosztują tyle tokenów, ile mieści się w nich 4-bajtowych fragmentów
+UTF-8 - polskie znaki diakrytyczne zajmują po 2 bajty, więc słowa takie
+jak "krzyżyk" są droższe niż ich angielskie odpowiedniki.
+"""
+
+import os
+import re
+
+AI_TOKENIZER = os.getenv('AI_TOKENIZER', 'o200k_base')
+
+# Narzut formatu czatu: na każdą wiadomość i na początek odpowiedzi
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 2
+
+_PIECES = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+
+
+def _load_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(AI_TOKENIZER)
+    except Exception:
+        # Brak biblioteki albo słownika (np. serwer bez dostępu do sieci)
+        return None
+
+
+_encoding = _load_encoding()
+EXACT = _encoding is not None
+
+
+def _piece_tokens(piece):
+    if piece.isspace():
+        return 1
+    size = len(piece.encode('utf-8'))
+    if piece[-1].isalnum():
+        return (size + 3) // 4
+    # Ciągi interpunkcji (np. "..X.O", "):") łączą się rzadziej niż litery
+    return (size + 1) // 2
+
+
+def count_tokens(text):
+    """Liczba tokenów tekstu."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text))
+
+
+def count_message_tokens(messages):
+    """Liczba tokenów wejściowych zapytania czatu (lista wiadomości {"role", "content"})."""
+    return sum(count_tokens(message['content']) + MESSAGE_OVERHEAD for message in messages) + REPLY_OVERHEAD